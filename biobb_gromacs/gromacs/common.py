@@ -1,10 +1,84 @@
 """ Common functions for package biobb_gromacs.gromacs """
+import os
 import re
+import json
+import math
+import hashlib
+import itertools
+import shlex
+import shutil
+import tempfile
 import warnings
+from collections.abc import MutableMapping
+from dataclasses import dataclass
 from pathlib import Path
 from biobb_common.tools import file_utils as fu
 from biobb_common.command_wrapper import cmd_wrapper
-from typing import Mapping, Optional
+from typing import Iterator, Mapping, Optional, Sequence, Union
+import numpy as np
+from biobb_gromacs.gromacs.gro_utils import iter_gro, read_gro, read_gro_header
+from biobb_gromacs.gromacs.ndx_utils import read_ndx
+from biobb_gromacs.gromacs.trr_utils import TrrFile
+from biobb_gromacs.gromacs.xtc_utils import read_xtc, read_xtc_natoms
+
+
+# In-process cache of the ``gmx -version`` output keyed by binary signature
+_GMX_VERSION_CACHE: dict[tuple[str, int, int], str] = {}
+
+
+@dataclass(frozen=True)
+class GromacsBuildInfo:
+    """ Build capabilities of a GROMACS binary as reported by ``gmx -version``.
+
+    Args:
+        version (str): GROMACS version string, eg: "2025.2".
+        precision (str): Floating point precision: "mixed" or "double".
+        simd (str): SIMD instruction set, eg: "AVX2_256".
+        mpi_library (str): MPI library: "thread_mpi", "MPI" or "none".
+        openmp (bool): OpenMP support.
+        fft_library (str): CPU FFT library.
+        gpu_support (str): GPU support: "disabled", "CUDA", "OpenCL", "SYCL"...
+    """
+    version: str = ""
+    precision: str = "mixed"
+    simd: str = "None"
+    mpi_library: str = "none"
+    openmp: bool = False
+    fft_library: str = ""
+    gpu_support: str = "disabled"
+
+    @property
+    def thread_mpi(self) -> bool:
+        return self.mpi_library.lower() == "thread_mpi"
+
+    @property
+    def real_mpi(self) -> bool:
+        return self.mpi_library.lower() not in ("thread_mpi", "none", "")
+
+    @property
+    def double_precision(self) -> bool:
+        return self.precision.lower() == "double"
+
+    @property
+    def gpu(self) -> bool:
+        return self.gpu_support.lower() not in ("disabled", "none", "")
+
+    @classmethod
+    def from_version_output(cls, version_output: str) -> "GromacsBuildInfo":
+        """ Parses the output of ``gmx -version``. """
+        fields: dict[str, str] = {}
+        for line in version_output.splitlines():
+            key, sep, value = line.partition(":")
+            if sep and value.strip():
+                fields.setdefault(key.strip().lower(), value.strip())
+        fft_library = next((v for k, v in fields.items() if re.search(r"fftw? library$", k) and not k.startswith("gpu")), "")
+        return cls(version=fields.get("gromacs version", ""),
+                   precision=fields.get("precision", "mixed").split()[0],
+                   simd=fields.get("simd instructions", "None"),
+                   mpi_library=fields.get("mpi library", "none"),
+                   openmp=fields.get("openmp support", "disabled").startswith("enabled"),
+                   fft_library=fft_library,
+                   gpu_support=fields.get("gpu support", "disabled"))
 
 
 def get_gromacs_version(gmx: str = "gmx", minimum_version: int = 512) -> int:
@@ -12,6 +86,11 @@ def get_gromacs_version(gmx: str = "gmx", minimum_version: int = 512) -> int:
     versions older than 5.1.5 and an int(5) for 20XX versions filling the gaps
     with '0' digits.
 
+    The ``gmx -version`` output is memoized in-process and in an on-disk cache
+    keyed by the resolved binary path, modification time and size, so the
+    subprocess is only launched once per GROMACS binary. Replacing or updating
+    the binary invalidates the cached entry.
+
     Args:
         gmx (str): ('gmx') Path to the GROMACS binary.
         minimum_version (int): (512) Minimum GROMACS version required.
@@ -19,26 +98,17 @@ def get_gromacs_version(gmx: str = "gmx", minimum_version: int = 512) -> int:
     Returns:
         int: GROMACS version.
     """
-    unique_dir = fu.create_unique_dir()
-    out_log, err_log = fu.get_logs(path=unique_dir, can_write_console=False)
-    cmd = [gmx, "-version"]
-    try:
-        cmd_wrapper.CmdWrapper(cmd=cmd, out_log=out_log, err_log=err_log).launch()
-        pattern = re.compile(r"GROMACS version:\s+(.+)")
-        version_str: Optional[re.Match[str]] = None
-        with open(Path(unique_dir).joinpath('log.out')) as log_file:
-            for line in log_file:
-                version_str = pattern.match(line.strip())
-                if version_str:
-                    break
-        if not version_str:
-            warnings.warn("GROMACS version not found. Your GROMACS installation Biobb compatibility has not been tested.")
-            return 0
-        version = version_str.group(1).replace(".", "").replace("VERSION", "").strip()
-        version = "".join([c for c in version if c.isdigit()])
-    except Exception:
+    pattern = re.compile(r"GROMACS version:\s+(.+)")
+    version_str: Optional[re.Match[str]] = None
+    for line in _gmx_version_output(gmx).splitlines():
+        version_str = pattern.match(line.strip())
+        if version_str:
+            break
+    if not version_str:
         warnings.warn("GROMACS version not found. Your GROMACS installation Biobb compatibility has not been tested.")
         return 0
+    version = version_str.group(1).replace(".", "").replace("VERSION", "").strip()
+    version = "".join([c for c in version if c.isdigit()])
     if version.startswith("2"):
         while len(version) < 5:
             version += '0'
@@ -46,12 +116,219 @@ def get_gromacs_version(gmx: str = "gmx", minimum_version: int = 512) -> int:
         while len(version) < 3:
             version += '0'
 
-    fu.rm(unique_dir)
     if int(version) < minimum_version:
         warnings.warn(f"GROMACS version should be {minimum_version} or newer {version} detected")
     return int(version)
 
 
+def get_gromacs_build_info(gmx: str = "gmx") -> Optional[GromacsBuildInfo]:
+    """ Gets the build capabilities (precision, SIMD, MPI, OpenMP, FFT and GPU
+    support) of the GROMACS binary. Shares the ``gmx -version`` cache with
+    :func:`get_gromacs_version`.
+
+    Args:
+        gmx (str): ('gmx') Path to the GROMACS binary.
+
+    Returns:
+        GromacsBuildInfo: Build capabilities or None if they can not be detected.
+    """
+    version_output = _gmx_version_output(gmx)
+    if "GROMACS version:" not in version_output:
+        return None
+    return GromacsBuildInfo.from_version_output(version_output)
+
+
+def check_mdrun_build(build_info: Optional[GromacsBuildInfo], mpi_bin: Optional[str] = None, mpi_np: Optional[int] = None,
+                      num_threads_mpi: Optional[str] = None, num_threads_omp: Optional[str] = None,
+                      num_threads_omp_pme: Optional[str] = None, use_gpu: bool = False,
+                      gpu_id: Optional[str] = None, gpu_tasks: Optional[str] = None) -> None:
+    """ Checks the mdrun thread, MPI and GPU settings against the capabilities
+    of the GROMACS build. Raises a ValueError listing every incompatible setting.
+    Nothing is checked if the build capabilities are unknown. """
+    if not build_info:
+        return
+
+    def to_int(value) -> int:
+        try:
+            return int(str(value).strip() or 0)
+        except ValueError:
+            return 0
+
+    errors = []
+    if mpi_bin and to_int(mpi_np) > 1 and not build_info.real_mpi:
+        errors.append(f"mpi_bin ({mpi_bin}) with {mpi_np} processes requires an MPI enabled GROMACS build but "
+                      f"the MPI library is {build_info.mpi_library}: every process would run an independent simulation.")
+    if to_int(num_threads_mpi) > 1 and not build_info.thread_mpi:
+        errors.append(f"num_threads_mpi ({num_threads_mpi}) requires a thread-MPI GROMACS build but the MPI library "
+                      f"is {build_info.mpi_library}. Use mpi_bin and mpi_np instead.")
+    if not build_info.openmp:
+        for name, value in (("num_threads_omp", num_threads_omp), ("num_threads_omp_pme", num_threads_omp_pme)):
+            if to_int(value) > 1:
+                errors.append(f"{name} ({value}) requires a GROMACS build with OpenMP support.")
+    if not build_info.gpu:
+        gpu_settings: tuple[tuple[str, object], ...] = (("use_gpu", use_gpu), ("gpu_id", gpu_id), ("gpu_tasks", gpu_tasks))
+        for gpu_name, gpu_value in gpu_settings:
+            if gpu_value:
+                errors.append(f"{gpu_name} ({gpu_value}) requires a GROMACS build with GPU support.")
+    if errors:
+        raise ValueError("Incompatible mdrun settings for this GROMACS build:\n" + "\n".join(errors))
+
+
+MDRUN_DLB_VALUES = ('auto', 'no', 'yes')
+MDRUN_PIN_VALUES = ('auto', 'on', 'off')
+
+
+def mdrun_performance_args(maxh: Optional[float] = 0.0, dlb: Optional[str] = 'auto', tunepme: bool = True,
+                           pin: Optional[str] = 'auto', pinoffset: Optional[int] = 0, pinstride: Optional[int] = 0,
+                           nstlist: Optional[int] = 0, resethway: bool = False) -> list[str]:
+    """ Checks the mdrun performance settings and returns their command line flags (only the ones that
+    differ from the mdrun defaults). Raises a ValueError listing every wrong setting. """
+    errors = []
+
+    def to_number(name: str, value, number_type: type = int) -> float:
+        try:
+            number = number_type(value or 0)
+        except (TypeError, ValueError):
+            errors.append(f"{name} ({value}) must be a number.")
+            return 0
+        if number < 0:
+            errors.append(f"{name} ({value}) can not be negative.")
+            return 0
+        return number
+
+    maxh_hours = to_number('maxh', maxh, float)
+    pinoffset_core, pinstride_cores, nstlist_steps = (to_number(name, value) for name, value in
+                                                      (('pinoffset', pinoffset), ('pinstride', pinstride), ('nstlist', nstlist)))
+    dlb, pin = str(dlb or 'auto').lower(), str(pin or 'auto').lower()
+    if dlb not in MDRUN_DLB_VALUES:
+        errors.append(f"dlb ({dlb}) must be one of: {', '.join(MDRUN_DLB_VALUES)}.")
+    if pin not in MDRUN_PIN_VALUES:
+        errors.append(f"pin ({pin}) must be one of: {', '.join(MDRUN_PIN_VALUES)}.")
+    elif pin != 'on' and (pinoffset_core or pinstride_cores):
+        # mdrun silently ignores them unless pinning is forced
+        errors.append(f"pinoffset ({pinoffset}) and pinstride ({pinstride}) require pin on.")
+    if errors:
+        raise ValueError("Wrong mdrun performance settings:\n" + "\n".join(errors))
+
+    args = []
+    if maxh_hours:
+        args += ['-maxh', f"{maxh_hours:g}"]
+    if dlb != 'auto':
+        args += ['-dlb', dlb]
+    if not tunepme:
+        args.append('-notunepme')
+    if pin != 'auto':
+        args += ['-pin', pin]
+    if pinoffset_core:
+        args += ['-pinoffset', str(int(pinoffset_core))]
+    if pinstride_cores:
+        args += ['-pinstride', str(int(pinstride_cores))]
+    if nstlist_steps:
+        args += ['-nstlist', str(int(nstlist_steps))]
+    if resethway:
+        args.append('-resethway')
+    return args
+
+
+def _gmx_version_output(gmx: str) -> str:
+    """ Returns the cached output of ``gmx -version`` launching it if needed. """
+    signature = _gmx_binary_signature(gmx)
+    version_output = ""
+    if signature:
+        version_output = _GMX_VERSION_CACHE.get(signature) or _read_gmx_version_cache(signature)
+    if not version_output:
+        version_output = _launch_gromacs_version(gmx)
+        if signature and "GROMACS version:" in version_output:
+            _write_gmx_version_cache(signature, version_output)
+    if signature and version_output:
+        _GMX_VERSION_CACHE[signature] = version_output
+    return version_output
+
+
+def _launch_gromacs_version(gmx: str) -> str:
+    """ Launches ``gmx -version`` and returns its output. Returns an empty string if it fails. """
+    unique_dir = fu.create_unique_dir()
+    out_log, err_log = fu.get_logs(path=unique_dir, can_write_console=False)
+    cmd = [gmx, "-version"]
+    try:
+        cmd_wrapper.CmdWrapper(cmd=cmd, out_log=out_log, err_log=err_log).launch()
+        with open(Path(unique_dir).joinpath('log.out')) as log_file:
+            return log_file.read()
+    except Exception:
+        return ""
+    finally:
+        fu.rm(unique_dir)
+
+
+def _gmx_binary_signature(gmx: str) -> Optional[tuple[str, int, int]]:
+    """ Resolves the executable of a GROMACS command line (that may include extra
+    flags such as -nobackup) and returns its real path, mtime and size. Returns
+    None if the executable can not be found. """
+    try:
+        binary = shlex.split(gmx)[0]
+    except (ValueError, IndexError):
+        return None
+    resolved = shutil.which(binary)
+    if not resolved:
+        return None
+    real_path = os.path.realpath(resolved)
+    try:
+        stat = os.stat(real_path)
+    except OSError:
+        return None
+    return real_path, stat.st_mtime_ns, stat.st_size
+
+
+def gmx_cache_dir() -> Path:
+    """ Returns the directory of the on-disk biobb_gromacs caches. It can be
+    set using the BIOBB_GROMACS_CACHE_DIR environment variable. """
+    cache_dir = os.getenv("BIOBB_GROMACS_CACHE_DIR")
+    if not cache_dir:
+        cache_home = os.getenv("XDG_CACHE_HOME") or str(Path.home().joinpath(".cache"))
+        cache_dir = str(Path(cache_home).joinpath("biobb_gromacs"))
+    return Path(cache_dir)
+
+
+def _gmx_cache_path() -> Path:
+    """ Returns the path of the on-disk GROMACS version cache. """
+    return gmx_cache_dir().joinpath("gmx_version.json")
+
+
+def _load_gmx_version_cache() -> dict:
+    try:
+        with open(_gmx_cache_path()) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _read_gmx_version_cache(signature: tuple[str, int, int]) -> str:
+    real_path, mtime_ns, size = signature
+    entry = _load_gmx_version_cache().get(real_path)
+    if not isinstance(entry, dict):
+        return ""
+    if entry.get("mtime_ns") != mtime_ns or entry.get("size") != size:
+        return ""
+    return str(entry.get("version_output", ""))
+
+
+def _write_gmx_version_cache(signature: tuple[str, int, int], version_output: str) -> None:
+    real_path, mtime_ns, size = signature
+    cache_path = _gmx_cache_path()
+    cache = _load_gmx_version_cache()
+    cache[real_path] = {"mtime_ns": mtime_ns, "size": size, "version_output": version_output}
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it so concurrent steps never read a partial cache
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(cache, cache_file, indent=2)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
 # class GromacsVersionError(Exception):
 #     """ Exception Raised when the installed version of GROMACS is not
 #         compatible with the current function.
@@ -60,10 +337,20 @@ def get_gromacs_version(gmx: str = "gmx", minimum_version: int = 512) -> int:
 
 
 def gmx_check(file_a: str, file_b: str, gmx: str = 'gmx') -> bool:
+    """ Checks if two GROMACS files are equivalent. GRO, NDX, TOP/ITP and MDP files are compared
+    in-process with :func:`compare_files`, TPR and EDR files with ``gmx check``. """
     print("Comparing GROMACS files:")
     print("FILE_A: %s" % str(Path(file_a).resolve()))
     print("FILE_B: %s" % str(Path(file_b).resolve()))
-    check_result = 'check_result.out'
+    if Path(file_a).suffix.lower() in NATIVE_CHECK_FORMATS:
+        diff = compare_files(file_a, file_b)
+        for difference in diff['differences']:
+            print('Discrepance found in %s %s: %s != %s' % (difference['location'], difference['field'], difference['a'], difference['b']))
+        return diff['equal']
+
+    # Unique result file so several comparisons can run concurrently
+    result_dir = tempfile.mkdtemp(prefix='gmx_check_')
+    check_result = str(Path(result_dir).joinpath('check_result.out'))
     cmd = [gmx, 'check']
     if file_a.endswith(".tpr"):
         cmd.append('-s1')
@@ -75,22 +362,165 @@ def gmx_check(file_a: str, file_b: str, gmx: str = 'gmx') -> bool:
     else:
         cmd.append('-f2')
     cmd.append(file_b)
-    cmd.append('> check_result.out')
-    cmd_wrapper.CmdWrapper(cmd).launch()
-    print("Result file: %s" % str(Path(check_result).resolve()))
-    with open(check_result) as check_file:
-        for line_num, line in enumerate(check_file):
-            if not line.rstrip():
-                continue
-            if line.startswith("Both files read correctly"):
-                continue
-            if not line.startswith('comparing'):
-                print('Discrepance found in line %d: %s' % (line_num, line))
+    cmd.append('> ' + check_result)
+    try:
+        cmd_wrapper.CmdWrapper(cmd).launch()
+        print("Result file: %s" % check_result)
+        with open(check_result) as check_file:
+            for line_num, line in enumerate(check_file):
+                if not line.rstrip():
+                    continue
+                if line.startswith("Both files read correctly"):
+                    continue
+                if not line.startswith('comparing'):
+                    print('Discrepance found in line %d: %s' % (line_num, line))
+                    return False
+        return True
+    finally:
+        shutil.rmtree(result_dir, ignore_errors=True)
+
+
+NATIVE_CHECK_FORMATS = ('.gro', '.ndx', '.top', '.itp', '.mdp')
+# Default absolute tolerances: GRO coordinates (nm), velocities (nm/ps) and box (nm). Relative tolerance for TOP/ITP and MDP numbers
+CHECK_TOLERANCES = {'coords': 1e-3, 'velocities': 1e-4, 'box': 1e-5, 'top': 1e-6, 'mdp': 1e-6}
+
+
+def compare_files(file_a: str, file_b: str, tolerances: Optional[Mapping[str, float]] = None, early_exit: bool = True) -> dict:
+    """ Compares two GRO, NDX, TOP/ITP or MDP files in-process using per-field numeric tolerances
+    (see CHECK_TOLERANCES). The titles of GRO files and the first line and comments of TOP/ITP files are ignored.
+
+    Returns a structured diff: a dict with 'equal', 'format' and the list of 'differences', each one
+    a dict with the 'location', 'field' and values 'a' and 'b'. With early_exit only the first difference
+    is reported. """
+    tolerances = {**CHECK_TOLERANCES, **(tolerances or {})}
+    fmt = Path(file_a).suffix.lower().lstrip('.')
+    if fmt != Path(file_b).suffix.lower().lstrip('.') and {fmt, Path(file_b).suffix.lower().lstrip('.')} != {'top', 'itp'}:
+        raise ValueError(f"Can not compare files with different formats: {file_a} {file_b}")
+    if fmt == 'gro':
+        differences = _compare_gro(file_a, file_b, tolerances, early_exit)
+    elif fmt == 'ndx':
+        differences = _compare_ndx(file_a, file_b, early_exit)
+    elif fmt in ('top', 'itp'):
+        differences = _compare_top(file_a, file_b, tolerances['top'], early_exit)
+    elif fmt == 'mdp':
+        differences = _compare_mdp(file_a, file_b, tolerances['mdp'], early_exit)
+    else:
+        raise ValueError(f"Format not supported by the native comparator: {file_a}")
+    return {'equal': not differences, 'format': fmt, 'differences': differences}
+
+
+def _difference(location: str, field: str, value_a, value_b) -> dict:
+    return {'location': location, 'field': field, 'a': value_a, 'b': value_b}
+
+
+def _compare_arrays(location: str, field: str, array_a: np.ndarray, array_b: np.ndarray,
+                    tolerance: Optional[float], early_exit: bool) -> list[dict]:
+    """ Vectorized comparison of two arrays with the same shape, exact if tolerance is None. Rows are reported 1-based. """
+    if tolerance is None:
+        mismatch = array_a != array_b
+    else:
+        mismatch = np.abs(array_a - array_b) > tolerance
+    if mismatch.ndim > 1:
+        mismatch = mismatch.any(axis=tuple(range(1, mismatch.ndim)))
+    rows = np.flatnonzero(mismatch)
+    if early_exit:
+        rows = rows[:1]
+    return [_difference(f"{location} {row + 1}", field, array_a[row].tolist(), array_b[row].tolist()) for row in rows]
+
+
+def _compare_gro(file_a: str, file_b: str, tolerances: Mapping[str, float], early_exit: bool) -> list[dict]:
+    gro_a, gro_b = read_gro(file_a), read_gro(file_b)
+    if gro_a.natoms != gro_b.natoms:
+        return [_difference('header', 'natoms', gro_a.natoms, gro_b.natoms)]
+    differences = []
+    for field, tolerance in (('resid', None), ('resname', None), ('atomname', None), ('atomid', None),
+                             ('xyz', tolerances['coords']), ('v', tolerances['velocities'])):
+        column_a, column_b = getattr(gro_a, field), getattr(gro_b, field)
+        if (column_a is None) != (column_b is None):
+            differences.append(_difference('atoms', field, column_a is not None, column_b is not None))
+        elif column_a is not None:
+            differences.extend(_compare_arrays('atom', field, column_a, column_b, tolerance, early_exit))
+        if differences and early_exit:
+            return differences
+    if gro_a.box.shape != gro_b.box.shape or np.abs(gro_a.box - gro_b.box).max() > tolerances['box']:
+        differences.append(_difference('box', 'box', gro_a.box.tolist(), gro_b.box.tolist()))
+    return differences
+
+
+def _compare_ndx(file_a: str, file_b: str, early_exit: bool) -> list[dict]:
+    groups_a, groups_b = read_ndx(file_a), read_ndx(file_b)
+    if groups_a.names() != groups_b.names():
+        return [_difference('groups', 'names', groups_a.names(), groups_b.names())]
+    differences = []
+    for name, group_a in groups_a.items():
+        array_a, array_b = group_a.atoms, groups_b[name].atoms
+        if array_a.shape != array_b.shape:
+            differences.append(_difference(f"group {name}", 'size', len(array_a), len(array_b)))
+        elif (array_a != array_b).any():
+            position = int(np.flatnonzero(array_a != array_b)[0])
+            differences.append(_difference(f"group {name} position {position + 1}", 'atom', int(array_a[position]), int(array_b[position])))
+        if differences and early_exit:
+            break
+    return differences
+
+
+def _compare_top(file_a: str, file_b: str, tolerance: float, early_exit: bool) -> list[dict]:
+    lines_a, lines_b = _top_data_lines(file_a), _top_data_lines(file_b)
+    differences = []
+    for (number_a, tokens_a), (number_b, tokens_b) in itertools.zip_longest(lines_a, lines_b, fillvalue=(None, None)):
+        if tokens_a is None or tokens_b is None or not _tokens_match(tokens_a, tokens_b, tolerance):
+            differences.append(_difference(f"line {number_a or 'EOF'}/{number_b or 'EOF'}", 'line',
+                                           ' '.join(tokens_a) if tokens_a else None, ' '.join(tokens_b) if tokens_b else None))
+            if early_exit:
+                break
+    return differences
+
+
+def _compare_mdp(file_a: str, file_b: str, tolerance: float, early_exit: bool) -> list[dict]:
+    mdp_a, mdp_b = Mdp.from_file(file_a), Mdp.from_file(file_b)
+    differences = []
+    for key, (value_a, value_b) in mdp_a.diff(mdp_b).items():
+        if value_a is not None and value_b is not None and _tokens_match(value_a.split(), value_b.split(), tolerance, case_sensitive=False):
+            continue
+        differences.append(_difference(f"parameter {key}", key, value_a, value_b))
+        if early_exit:
+            break
+    return differences
+
+
+def _top_data_lines(top_path: str) -> list[tuple[int, list[str]]]:
+    """ Tokens of the non empty lines of a TOP/ITP file without comments, skipping the first line. """
+    data_lines = []
+    with open(top_path) as top_file:
+        top_file.readline()
+        for number, line in enumerate(top_file, start=2):
+            tokens = line.split(';')[0].split()
+            if tokens:
+                data_lines.append((number, tokens))
+    return data_lines
+
+
+def _tokens_match(tokens_a: Sequence[str], tokens_b: Sequence[str], tolerance: float, case_sensitive: bool = True) -> bool:
+    """ True if both token lists are equal, numbers are compared with a relative tolerance. """
+    if len(tokens_a) != len(tokens_b):
+        return False
+    for token_a, token_b in zip(tokens_a, tokens_b):
+        if token_a == token_b or (not case_sensitive and token_a.lower() == token_b.lower()):
+            continue
+        try:
+            if not math.isclose(float(token_a), float(token_b), rel_tol=tolerance, abs_tol=tolerance):
                 return False
+        except ValueError:
+            return False
     return True
 
 
 def gmx_rms(file_a: str, file_b: str, file_tpr: str, gmx: str = 'gmx', tolerance: float = 0.5):
+    """ Compares frame by frame the protein atoms of two trajectories or structures. The comparison
+    is done natively with :func:`native_rms` when all the files can be read (GRO/XTC), otherwise
+    ``gmx rms`` is used. Returns False if the RMSD of any frame is bigger than tolerance (nm). """
+    if is_native_rms_supported(file_a, file_b, file_tpr):
+        return native_rms(file_a, file_b, structure_file=file_tpr, tolerance=tolerance)
     print("Comparing GROMACS files:")
     print("FILE_A: %s" % str(Path(file_a).resolve()))
     print("FILE_B: %s" % str(Path(file_b).resolve()))
@@ -108,6 +538,172 @@ def gmx_rms(file_a: str, file_b: str, file_tpr: str, gmx: str = 'gmx', tolerance
     return True
 
 
+# Residue names of the default GROMACS Protein group (residuetypes.dat) including the usual protonation variants and caps
+PROTEIN_RESIDUES = frozenset({
+    'ABU', 'ACE', 'AIB', 'ALA', 'ARG', 'ARGN', 'ASH', 'ASN', 'ASN1', 'ASP', 'ASP1', 'ASPH', 'CT3', 'CYM', 'CYN',
+    'CYS', 'CYS1', 'CYS2', 'CYSH', 'CYX', 'DAB', 'DALA', 'GLH', 'GLN', 'GLU', 'GLUH', 'GLY', 'HID', 'HIE', 'HIP',
+    'HIS', 'HIS1', 'HISA', 'HISB', 'HISD', 'HISE', 'HISH', 'HSD', 'HSE', 'HSP', 'HYP', 'ILE', 'LEU', 'LSN', 'LYN',
+    'LYP', 'LYS', 'LYSH', 'MELEU', 'MET', 'MEVAL', 'NAC', 'NALA', 'NH2', 'NHE', 'NME', 'ORN', 'PGLU', 'PHE', 'PHEH',
+    'PHEU', 'PHL', 'PRO', 'SER', 'THR', 'TRP', 'TRPH', 'TRPU', 'TYR', 'TYRH', 'TYRU', 'VAL'})
+NATIVE_RMS_TRAJECTORY_FORMATS = ('.gro', '.xtc', '.trr')
+NATIVE_RMS_STRUCTURE_FORMATS = ('.gro',)
+# Number of frames superimposed at once by native_rms
+NATIVE_RMS_CHUNK_FRAMES = 256
+
+
+def is_native_rms_supported(file_a: str, file_b: str, structure_file: Optional[str] = None) -> bool:
+    """ True if :func:`native_rms` can read the trajectories and the atom names of the structure. """
+    return (Path(file_a).suffix.lower() in NATIVE_RMS_TRAJECTORY_FORMATS
+            and Path(file_b).suffix.lower() in NATIVE_RMS_TRAJECTORY_FORMATS
+            and _rms_names_file(file_a, file_b, structure_file) is not None)
+
+
+def _rms_names_file(file_a: str, file_b: str, structure_file: Optional[str] = None) -> Optional[str]:
+    """ First file with atom and residue names: the structure_file, file_a or file_b. """
+    for names_file in (structure_file, file_a, file_b) if structure_file else (file_a, file_b):
+        if names_file and Path(names_file).suffix.lower() in NATIVE_RMS_STRUCTURE_FORMATS:
+            return names_file
+    return None
+
+
+def native_rms(file_a: str, file_b: str, structure_file: Optional[str] = None, tolerance: float = 0.5,
+               input_ndx_path: Optional[str] = None, group: Optional[str] = None,
+               residue_names: Optional[Sequence[str]] = None, atom_names: Optional[Sequence[str]] = None) -> bool:
+    """ In-process version of :func:`gmx_rms`. Superimposes (Kabsch) each frame of file_a on the
+    corresponding frame of file_b (or on its single frame) and computes the RMSD of the selected atoms.
+
+    The atoms are selected with an NDX group (input_ndx_path and group) or with residue_names and
+    atom_names filters applied on the names of the structure_file (a GRO file, by default file_a or file_b).
+    Without a selection the default GROMACS Protein group is used, or all the atoms if there is no protein.
+    Returns False if the RMSD of any frame is bigger than tolerance (nm). """
+    print("Comparing GROMACS files:")
+    print("FILE_A: %s" % str(Path(file_a).resolve()))
+    print("FILE_B: %s" % str(Path(file_b).resolve()))
+    natoms_a, natoms_b = trajectory_natoms(file_a), trajectory_natoms(file_b)
+    if natoms_a != natoms_b:
+        print('Different number of atoms: %d and %d' % (natoms_a, natoms_b))
+        return False
+
+    names_file = _rms_names_file(file_a, file_b, structure_file)
+    if names_file is None:
+        raise ValueError(f"Atom names can not be read natively from {structure_file}, use a GRO structure")
+    selection = select_atoms(names_file, input_ndx_path=input_ndx_path, group=group,
+                             residue_names=residue_names, atom_names=atom_names)
+
+    # Both trajectories are streamed in chunks of frames so memory does not depend on their length
+    frames_a = iter_trajectory_frames(file_a, atom_indices=selection)
+    frames_b = iter_trajectory_frames(file_b, atom_indices=selection)
+    first_b = next(frames_b, None)
+    if first_b is None:
+        raise ValueError(f"No frames found in {file_b}")
+    second_b = next(frames_b, None)
+    single_reference = second_b is None
+    if second_b is not None:
+        frames_b = itertools.chain([first_b, second_b], frames_b)
+    n_frames_a, n_frames_b = 0, int(single_reference)
+    while True:
+        chunk_a = list(itertools.islice(frames_a, NATIVE_RMS_CHUNK_FRAMES))
+        chunk_b = [first_b] if single_reference else list(itertools.islice(frames_b, len(chunk_a)))
+        n_frames_a += len(chunk_a)
+        if not single_reference:
+            n_frames_b += len(chunk_b)
+        if not chunk_a or len(chunk_b) != (1 if single_reference else len(chunk_a)):
+            break
+        rmsd = kabsch_rmsd(np.stack([coords for _, coords in chunk_b]), np.stack([coords for _, coords in chunk_a]))
+        for (time_step, _), frame_rmsd in zip(chunk_a, rmsd):
+            if frame_rmsd > tolerance:
+                print('RMSD: %g bigger than tolerance %g for time step %g' % (frame_rmsd, tolerance, time_step))
+                return False
+    if not single_reference:
+        n_frames_b += sum(1 for _ in frames_b)
+    n_frames_a += sum(1 for _ in frames_a)
+    if n_frames_b not in (1, n_frames_a):
+        print('Different number of frames: %d and %d' % (n_frames_a, n_frames_b))
+        return False
+    return True
+
+
+def kabsch_rmsd(reference: np.ndarray, frames: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """ Returns the RMSD of each frame (F, N, 3) after its optimal superposition (Kabsch) on the reference
+    (N, 3) or on the corresponding reference frame (F, N, 3). All the frames are fitted at once with
+    batched matrix operations. Optional per atom weights (eg: masses) are used both for the fit and the RMSD. """
+    frames = np.asarray(frames, dtype=np.float64)
+    if frames.ndim == 2:
+        frames = frames[np.newaxis]
+    reference = np.broadcast_to(np.asarray(reference, dtype=np.float64), frames.shape)
+    w = np.ones(frames.shape[1]) if weights is None else np.asarray(weights, dtype=np.float64)
+    w = w / w.sum()
+
+    x = frames - np.einsum('n,fni->fi', w, frames)[:, np.newaxis]
+    y = reference - np.einsum('n,fni->fi', w, reference)[:, np.newaxis]
+    covariance = np.einsum('fni,n,fnj->fij', x, w, y)
+    u, s, vt = np.linalg.svd(covariance)
+    # Avoid improper rotations (reflections)
+    s[:, 2] *= np.sign(np.linalg.det(u) * np.linalg.det(vt))
+    msd = np.einsum('n,fni,fni->f', w, x, x) + np.einsum('n,fni,fni->f', w, y, y) - 2 * s.sum(axis=1)
+    return np.sqrt(np.clip(msd, 0, None))
+
+
+def select_atoms(structure_file: str, input_ndx_path: Optional[str] = None, group: Optional[str] = None,
+                 residue_names: Optional[Sequence[str]] = None, atom_names: Optional[Sequence[str]] = None) -> np.ndarray:
+    """ Returns the 0-based indices of the atoms selected by an NDX group or by residue and atom names. """
+    if input_ndx_path and group:
+        groups = read_ndx(input_ndx_path)
+        if group not in groups:
+            raise ValueError(f"Group {group} not found in {input_ndx_path}")
+        return groups[group].indices
+
+    gro = read_gro(structure_file)
+    resnames, atomnames = gro.resname, gro.atomname
+    if residue_names or atom_names:
+        mask = np.ones(len(resnames), dtype=bool)
+        if residue_names:
+            mask &= np.isin(resnames, list(residue_names))
+        if atom_names:
+            mask &= np.isin(atomnames, list(atom_names))
+    else:
+        mask = np.isin(resnames, list(PROTEIN_RESIDUES))
+        if not mask.any():
+            mask[:] = True
+    return np.flatnonzero(mask)
+
+
+def read_trajectory_coords(trajectory_file: str, atom_indices: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+    """ Returns the times (F,) and the coordinates (F, N, 3) in nm of all the frames of a GRO, XTC or TRR file. """
+    frames = list(iter_trajectory_frames(trajectory_file, atom_indices=atom_indices))
+    return np.array([time for time, _ in frames], dtype=np.float64), np.stack([coords for _, coords in frames])
+
+
+def iter_trajectory_frames(trajectory_file: str, stride: int = 1, atom_indices: Optional[np.ndarray] = None) -> Iterator[tuple[float, np.ndarray]]:
+    """ Yields the time and the coordinates (N, 3) in nm of every stride frames of a GRO, XTC or TRR file,
+    one frame at a time. GRO frames are numbered as times and TRR frames without coordinates are skipped. """
+    suffix = Path(trajectory_file).suffix.lower()
+    if suffix == '.xtc':
+        for frame in read_xtc(trajectory_file, stride=stride, atom_indices=atom_indices):
+            yield frame.time, frame.coords
+        return
+    if suffix == '.trr':
+        with TrrFile(trajectory_file) as trr:
+            frames = ((trr_frame.time, trr_frame.x) for trr_frame in (trr[index] for index in range(len(trr))))
+            for time, coords in itertools.islice(((time, x) for time, x in frames if x is not None), 0, None, stride):
+                yield time, coords if atom_indices is None else coords[atom_indices]
+        return
+    for index, gro in enumerate(iter_gro(trajectory_file)):
+        if index % stride == 0:
+            yield float(index), gro.xyz if atom_indices is None else gro.xyz[atom_indices]
+
+
+def trajectory_natoms(trajectory_file: str) -> int:
+    """ Returns the number of atoms of a GRO, XTC or TRR file reading only its first header. """
+    suffix = Path(trajectory_file).suffix.lower()
+    if suffix == '.xtc':
+        return read_xtc_natoms(trajectory_file)
+    if suffix == '.trr':
+        with TrrFile(trajectory_file) as trr:
+            return trr.headers[0].natoms if len(trr) else 0
+    return read_gro_header(trajectory_file).natoms
+
+
 def read_mdp(input_mdp_path: str) -> dict[str, str]:
     # Credit for these two reg exps to:
     # https://github.com/Becksteinlab/GromacsWrapper/blob/master/gromacs/fileformats/mdp.py
@@ -130,11 +726,23 @@ def mdp_preset(sim_type: str) -> dict[str, str]:
     if not sim_type or sim_type == 'index':
         return mdp_dict
 
+    # Production presets writing only the compressed trajectory (mdrun output_tng_path), without full precision TRR frames
+    tng = sim_type.endswith('_tng')
+    if tng:
+        sim_type = sim_type[:-len('_tng')]
+
+    # Hydrogen mass repartitioned topologies (see gromacs_extra.mass_repartition) allow 4 fs time steps
+    hmr = sim_type.endswith('_hmr')
+    if hmr:
+        sim_type = sim_type[:-len('_hmr')]
+
     minimization = (sim_type == 'minimization') or (sim_type == 'ions')
     nvt = (sim_type == 'nvt')
     npt = (sim_type == 'npt')
     free = (sim_type == 'free')
     md = (nvt or npt or free)
+    if (tng or hmr) and not md:
+        raise ValueError(f"The _hmr and _tng variants of the simulation types are only available for nvt, npt and free, not {sim_type}")
 
     # Position restrain
     if not free:
@@ -148,7 +756,7 @@ def mdp_preset(sim_type: str) -> dict[str, str]:
         mdp_dict['emstep'] = '0.01'
     if md:
         mdp_dict['integrator'] = 'md'
-        mdp_dict['dt'] = '0.002'
+        mdp_dict['dt'] = '0.004' if hmr else '0.002'
 
     # Output control
     if md:
@@ -172,13 +780,18 @@ def mdp_preset(sim_type: str) -> dict[str, str]:
             mdp_dict['nstxout-compressed'] = '1000'
             mdp_dict['compressed-x-grps'] = 'System'
             mdp_dict['compressed-x-precision'] = '1000'
+        if tng:
+            # Velocities are kept in the checkpoint, coordinates in the compressed trajectory
+            mdp_dict['nstxout'] = '0'
+            mdp_dict['nstvout'] = '0'
+            mdp_dict['nstfout'] = '0'
 
     # Bond parameters
     if md:
         mdp_dict['constraint-algorithm'] = 'lincs'
         mdp_dict['constraints'] = 'h-bonds'
         mdp_dict['lincs-iter'] = '1'
-        mdp_dict['lincs-order'] = '4'
+        mdp_dict['lincs-order'] = '6' if hmr else '4'
         if nvt:
             mdp_dict['continuation'] = 'no'
         if npt or free:
@@ -259,20 +872,19 @@ def create_mdp(output_mdp_path: str, input_mdp_path: Optional[str] = None,
                preset_dict: Optional[Mapping[str, str]] = None,
                mdp_properties_dict: Optional[Mapping[str, str]] = None) -> str:
     """Creates an MDP file using the following hierarchy  mdp_properties_dict > input_mdp_path > preset_dict"""
-    mdp_dict = {}
+    return merge_mdp(input_mdp_path, preset_dict, mdp_properties_dict).write(output_mdp_path)
+
 
-    if preset_dict:
-        for k, v in preset_dict.items():
-            mdp_dict[clean_key(k)] = v
+def merge_mdp(input_mdp_path: Optional[str] = None,
+              preset_dict: Optional[Mapping[str, str]] = None,
+              mdp_properties_dict: Optional[Mapping[str, str]] = None) -> "Mdp":
+    """Merges the MDP parameters using the following hierarchy  mdp_properties_dict > input_mdp_path > preset_dict"""
+    mdp = Mdp(preset_dict)
     if input_mdp_path:
-        input_mdp_dict = read_mdp(input_mdp_path)
-        for k, v in input_mdp_dict.items():
-            mdp_dict[clean_key(k)] = v
+        mdp.update(Mdp.from_file(input_mdp_path))
     if mdp_properties_dict:
-        for k, v in mdp_properties_dict.items():
-            mdp_dict[clean_key(k)] = v
-
-    return write_mdp(output_mdp_path, mdp_dict)
+        mdp.update(mdp_properties_dict)
+    return mdp
 
 
 def clean_key(key: str) -> str:
@@ -280,3 +892,195 @@ def clean_key(key: str) -> str:
     can only be defined once in the MDP file. """
 
     return key.lower().replace('_', '-')
+
+
+# MDP parameters whose value is a whitespace separated list with one entry per group or dimension
+MDP_ARRAY_KEYS = frozenset({
+    'tc-grps', 'tau-t', 'ref-t', 'annealing', 'annealing-npoints', 'annealing-time', 'annealing-temp',
+    'energygrps', 'energygrp-table', 'energygrp-excl', 'freezegrps', 'freezedim', 'acc-grps', 'accelerate',
+    'compressed-x-grps', 'compressibility', 'ref-p', 'deform', 'wall-atomtype', 'wall-density',
+    'user1-grps', 'user2-grps', 'qmmm-grps', 'fep-lambdas', 'mass-lambdas', 'coul-lambdas', 'vdw-lambdas',
+    'bonded-lambdas', 'restraint-lambdas', 'temperature-lambdas'})
+MDP_ARRAY_KEY_RE = re.compile(r"^pull-(coord|group)\d+-(groups|dim|origin|vec|pbcatom)$")
+# MDP parameters whose value is case sensitive (preprocessor options and paths)
+MDP_CASE_SENSITIVE_KEYS = frozenset({'define', 'include', 'title', 'tabext'})
+
+
+class Mdp(MutableMapping):
+    """ Ordered model of the parameters of a GROMACS MDP file.
+
+    Keys are normalized with :func:`clean_key` and values are stored stripped and
+    with their whitespace collapsed, so the same parameter can only be defined once.
+    Parameters that GROMACS reads as lists (tc-grps, tau-t, ref-t...) can be
+    retrieved as arrays. The canonical form used by :meth:`content_hash` and
+    :meth:`diff` also normalizes numbers (1 == 1.0 == 1e0) and the case of the
+    values that GROMACS compares case-insensitively, so two MDP files that produce
+    the same simulation settings get the same hash.
+
+    Args:
+        parameters (Mapping): (None) Initial MDP parameters.
+    """
+
+    def __init__(self, parameters: Optional[Mapping] = None) -> None:
+        self._parameters: dict[str, str] = {}
+        if parameters:
+            self.update(parameters)
+
+    @classmethod
+    def from_file(cls, input_mdp_path: str) -> "Mdp":
+        return cls(read_mdp(input_mdp_path))
+
+    def __setitem__(self, key: str, value) -> None:
+        self._parameters[clean_key(str(key).strip())] = " ".join(str(value).split())
+
+    def __getitem__(self, key: str) -> str:
+        return self._parameters[clean_key(str(key).strip())]
+
+    def __delitem__(self, key: str) -> None:
+        del self._parameters[clean_key(str(key).strip())]
+
+    def __contains__(self, key) -> bool:
+        return clean_key(str(key).strip()) in self._parameters
+
+    def __iter__(self):
+        return iter(self._parameters)
+
+    def __len__(self) -> int:
+        return len(self._parameters)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Mdp):
+            return NotImplemented
+        return self.canonical() == other.canonical()
+
+    def __repr__(self) -> str:
+        return f"Mdp({self._parameters!r})"
+
+    def to_dict(self) -> dict[str, str]:
+        return dict(self._parameters)
+
+    @staticmethod
+    def is_array(key: str) -> bool:
+        key = clean_key(str(key).strip())
+        return key in MDP_ARRAY_KEYS or bool(MDP_ARRAY_KEY_RE.match(key))
+
+    def array(self, key: str) -> list[str]:
+        """ Returns the value of the parameter split in its whitespace separated entries. """
+        return str(self.get(key, "")).split()
+
+    @staticmethod
+    def canonical_value(key: str, value: str) -> Union[str, tuple[str, ...]]:
+        key = clean_key(str(key).strip())
+        tokens = []
+        for token in str(value).split():
+            try:
+                token = format(float(token), '.12g')
+            except ValueError:
+                if key not in MDP_CASE_SENSITIVE_KEYS:
+                    token = token.lower()
+            tokens.append(token)
+        if Mdp.is_array(key):
+            return tuple(tokens)
+        return " ".join(tokens)
+
+    def canonical(self) -> dict[str, Union[str, tuple[str, ...]]]:
+        """ Returns the canonical parameters sorted by key. The 'type' key is never written to the MDP file and it is ignored. """
+        return {k: self.canonical_value(k, v) for k, v in sorted(self._parameters.items()) if k != 'type'}
+
+    def content_hash(self) -> str:
+        """ Returns a deterministic SHA-256 hash of the canonical parameters independent of their order and formatting. """
+        content = "\n".join(f"{k} = {' '.join(v) if isinstance(v, tuple) else v}" for k, v in self.canonical().items())
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def diff(self, other: Mapping) -> dict[str, tuple[Optional[str], Optional[str]]]:
+        """ Returns the minimal set of parameters that differ from other (eg: a preset)
+        as a dict of key: (self value, other value). Missing parameters are None. """
+        other_mdp = other if isinstance(other, Mdp) else Mdp(other)
+        own, theirs = self.canonical(), other_mdp.canonical()
+        differences: dict[str, tuple[Optional[str], Optional[str]]] = {}
+        for key in list(self._parameters) + [k for k in other_mdp if k not in self._parameters]:
+            if key == 'type' or own.get(key) == theirs.get(key):
+                continue
+            differences[key] = (self.get(key), other_mdp.get(key))
+        return differences
+
+    def write(self, output_mdp_path: str) -> str:
+        return write_mdp(output_mdp_path, self._parameters)
+
+
+# Integrators that advance the simulation time, the rest (minimizers, normal modes, TPI) do not have a time step
+MDP_DYNAMICAL_INTEGRATORS = frozenset({'md', 'md-vv', 'md-vv-avek', 'sd', 'bd', 'mimic'})
+# Average size of a compressed XTC coordinate with the default precision (roughly a third of the uncompressed size)
+XTC_BYTES_PER_ATOM = 4.0
+# Approximate number of terms stored in each EDR frame of a typical solvated system
+EDR_TERMS_PER_FRAME = 50
+
+
+def estimate_trajectory_io(natoms: int, mdp: Mapping, double_precision: bool = False) -> dict:
+    """ Estimates the size of the TRR, XTC and EDR files that mdrun will write for a system of natoms atoms
+    with the given MDP parameters. The XTC and EDR sizes are approximations as their frames are compressed
+    or depend on the number of energy terms.
+
+    Returns a dict with the number of frames and bytes per file, the total bytes (None if nsteps is -1),
+    the bytes written per MD step and per simulated ns (None for non dynamical integrators). """
+    mdp = mdp if isinstance(mdp, Mdp) else Mdp(mdp)
+    real_size = 8 if double_precision else 4
+
+    def to_int(key: str, default: int) -> int:
+        return int(float(mdp.get(key, str(default)) or default))
+
+    nsteps = to_int('nsteps', 0)
+    dt = float(mdp.get('dt', '0.001') or 0.001)
+    intervals = {key: max(to_int(key, default), 0) for key, default in
+                 (('nstxout', 0), ('nstvout', 0), ('nstfout', 0), ('nstxout-compressed', 0), ('nstenergy', 1000))}
+
+    # TRR: one frame per step writing x, v or f, with a header of 13 ints plus time and lambda and the box
+    trr_vector_bytes = natoms * 3 * real_size
+    trr_header_bytes = 76 + 2 * real_size + 9 * real_size
+    trr_intervals = [intervals[key] for key in ('nstxout', 'nstvout', 'nstfout') if intervals[key]]
+    # XTC: header, box and precision plus the compressed coordinates
+    xtc_frame_bytes = 92 + int(natoms * XTC_BYTES_PER_ATOM)
+    # EDR: header plus the energy term, its average and its sum
+    edr_frame_bytes = 64 + EDR_TERMS_PER_FRAME * (real_size + 16)
+
+    files: dict[str, dict] = {
+        'trr': {'frames': _count_frames(nsteps, trr_intervals),
+                'bytes_per_step': float(sum((trr_header_bytes + trr_vector_bytes) / interval for interval in trr_intervals))},
+        'xtc': {'frames': _count_frames(nsteps, [intervals['nstxout-compressed']]),
+                'bytes_per_step': xtc_frame_bytes / intervals['nstxout-compressed'] if intervals['nstxout-compressed'] else 0.0},
+        'edr': {'frames': _count_frames(nsteps, [intervals['nstenergy']]),
+                'bytes_per_step': edr_frame_bytes / intervals['nstenergy'] if intervals['nstenergy'] else 0.0},
+    }
+    for file_report in files.values():
+        file_report['bytes'] = None
+    # Unbounded runs (nsteps = -1) have no number of frames
+    if nsteps >= 0:
+        trr_vectors = sum(_count_frames(nsteps, [interval]) or 0 for interval in trr_intervals)
+        files['trr']['bytes'] = trr_header_bytes * (files['trr']['frames'] or 0) + trr_vector_bytes * trr_vectors
+        files['xtc']['bytes'] = xtc_frame_bytes * (files['xtc']['frames'] or 0)
+        files['edr']['bytes'] = edr_frame_bytes * (files['edr']['frames'] or 0)
+
+    bytes_per_step = sum(file_report['bytes_per_step'] for file_report in files.values())
+    dynamical = str(mdp.get('integrator', 'md')).lower() in MDP_DYNAMICAL_INTEGRATORS
+    return {
+        'natoms': natoms,
+        'nsteps': nsteps,
+        'dt': dt if dynamical else None,
+        'precision': 'double' if double_precision else 'single',
+        'files': files,
+        'total_bytes': sum(file_report['bytes'] or 0 for file_report in files.values()) if nsteps >= 0 else None,
+        'bytes_per_step': bytes_per_step,
+        'bytes_per_ns': bytes_per_step * 1000.0 / dt if dynamical and dt > 0 else None,
+    }
+
+
+def _count_frames(nsteps: int, intervals: list[int]) -> Optional[int]:
+    """ Number of steps in [0, nsteps] that are a multiple of any of the non zero intervals (inclusion-exclusion). """
+    intervals = [interval for interval in intervals if interval > 0]
+    if nsteps < 0:
+        return None
+    frames = 0
+    for n in range(1, len(intervals) + 1):
+        for combination in itertools.combinations(intervals, n):
+            frames += (-1) ** (n + 1) * (nsteps // math.lcm(*combination) + 1)
+    return frames
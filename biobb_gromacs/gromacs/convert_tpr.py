@@ -4,8 +4,10 @@
 from pathlib import PurePath
 from typing import Optional
 from biobb_common.generic.biobb_object import BiobbObject
+from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_gromacs.gromacs.common import get_gromacs_version
+from biobb_gromacs.gromacs.tpr_utils import read_tpr_header, read_tpr_run_control, convert_tpr_nsteps
 
 
 class ConvertTpr(BiobbObject):
@@ -95,6 +97,7 @@ class ConvertTpr(BiobbObject):
         # Setup Biobb
         if self.check_restart():
             return 0
+        self.preflight()
         self.stage_files()
 
         if self.container_path:
@@ -128,6 +131,28 @@ class ConvertTpr(BiobbObject):
         self.check_arguments(output_files_created=True, raise_exception=False)
         return self.return_code
 
+    def preflight(self) -> None:
+        """
+        Log the contents of the input TPR header and check that the new number of steps is valid before calling convert-tpr
+        """
+        input_tpr_path = self.io_dict["in"]["input_tpr_path"]
+        try:
+            header = read_tpr_header(input_tpr_path)
+            fu.log(f"Input TPR: {header.natoms} atoms, {'double' if header.precision == 8 else 'single'} precision, "
+                   f"written by GROMACS {header.gromacs_version}", self.out_log, self.global_log)
+        except (OSError, ValueError) as error:
+            fu.log(f"WARNING: The input TPR header can not be read: {error}", self.out_log, self.global_log)
+        if self.container_path or not (self.extend or self.until):
+            return
+        try:
+            run_control = read_tpr_run_control(input_tpr_path, self.binary_path)
+        except (ValueError, OSError) as error:
+            fu.log(f"WARNING: The new number of steps can not be checked: {error}", self.out_log, self.global_log)
+            return
+        new_nsteps = convert_tpr_nsteps(run_control, extend=self.extend, until=self.until, nsteps=self.nsteps)
+        fu.log(f"Run from {run_control['start_time']} ps: {run_control['nsteps']} steps will be changed to {new_nsteps} steps "
+               f"(dt {run_control['dt']} ps, ending at {run_control['start_time'] + new_nsteps * run_control['dt']:g} ps)", self.out_log, self.global_log)
+
 
 def convert_tpr(input_tpr_path: str, output_tpr_path: str, properties: Optional[dict] = None, **kwargs) -> int:
     """Create :class:`ConvertTpr <gromacs.convert_tpr.ConvertTpr>` class and
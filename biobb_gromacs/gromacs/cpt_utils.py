@@ -0,0 +1,233 @@
+""" Native reader for the header and the output file list of the GROMACS checkpoint file format CPT """
+import hashlib
+import struct
+from pathlib import Path
+from typing import BinaryIO, NamedTuple, Optional, Sequence
+
+
+CPT_MAGIC = 171817
+# Integrators in the order of the GROMACS enum
+CPT_INTEGRATORS = ('md', 'steep', 'cg', 'bd', 'sd2', 'nm', 'l-bfgs', 'tpi', 'tpic', 'sd', 'md-vv', 'md-vv-avek', 'mimic')
+# Sizes of the XDR encoded element types of the checkpoint entries: int, float, double, int64 and char
+_CPT_TYPE_SIZES = {0: 4, 1: 4, 2: 8, 3: 8, 4: 4}
+# Energy history entries stored as raw values instead of typed vectors: the step counters (int64)
+# and the number of foreign lambda energy differences (int), followed by one vector per difference
+_ENERGY_HISTORY_STEPS = (3, 5, 6, 7)
+_ENERGY_HISTORY_DELTA_H_NN = 8
+_ENERGY_HISTORY_DELTA_H_LIST = 9
+
+
+class CptHeader(NamedTuple):
+    """ Header of a CPT file: the GROMACS build that wrote it, the state of the run and the sections it contains. """
+    gromacs_version: str
+    generating_program: str
+    generation_time: str
+    file_version: int
+    double: Optional[bool]
+    natoms: int
+    ngtc: int
+    nlambda: int
+    integrator: str
+    simulation_part: int
+    step: int
+    time: float
+    pp_ranks: int
+    dd_grid: tuple[int, int, int]
+    pme_ranks: int
+    state_flags: int
+    ekin_flags: int
+    energy_history_flags: int
+    df_history_flags: int
+    ed_datasets: int
+    swap: int
+    awh_history_flags: int
+    pull_history_flags: int
+    header_size: int
+
+
+class CptOutputFile(NamedTuple):
+    """ Output file of the run recorded in a CPT file: its size when the checkpoint was written and the MD5
+    checksum of the (up to 1 MB) last part of it (None for checkpoints that do not store it). """
+    filename: str
+    offset: int
+    checksum_size: int
+    checksum: Optional[str]
+
+
+class CptResume(NamedTuple):
+    """ Checkpoint to resume a run from: its path and header, the paths of the recorded output files found intact
+    and the names of the ones missing or modified after the checkpoint was written. """
+    cpt_path: str
+    header: CptHeader
+    output_paths: dict[str, str]
+    missing_files: list[str]
+
+    @property
+    def append(self) -> bool:
+        """ The run can continue appending to its output files. """
+        return not self.missing_files
+
+
+def read_cpt_header(input_cpt_path: str) -> CptHeader:
+    """ Reads the header of a CPT file: GROMACS version, step, time, number of atoms, integrator and parallel layout.
+    Only the first few hundred bytes of the file are read. """
+    with open(input_cpt_path, 'rb') as cpt_file:
+        try:
+            return _read_header(cpt_file)
+        except struct.error:
+            raise ValueError(f"Truncated CPT header in {input_cpt_path}")
+
+
+def read_cpt_output_files(input_cpt_path: str) -> list[CptOutputFile]:
+    """ Reads the list of output files (log, energy, trajectories) of the run recorded at the end of a CPT file,
+    skipping the state of the system without reading it. Checkpoints of runs with pulling, AWH, expanded ensemble,
+    essential dynamics or ion swapping store histories before the file list that are not supported. """
+    with open(input_cpt_path, 'rb') as cpt_file:
+        try:
+            header = _read_header(cpt_file)
+            unsupported = [name for name, value in (('expanded ensemble', header.df_history_flags), ('essential dynamics', header.ed_datasets),
+                                                    ('ion swapping', header.swap), ('AWH', header.awh_history_flags),
+                                                    ('pulling', header.pull_history_flags)) if value]
+            if unsupported:
+                raise ValueError(f"The output files of {input_cpt_path} can not be read: the {', '.join(unsupported)} history is not supported")
+            for _ in range(bin(header.state_flags).count('1') + bin(header.ekin_flags).count('1')):
+                _skip_entry(cpt_file)
+            _skip_energy_history(cpt_file, header.energy_history_flags)
+            return [_read_output_file(cpt_file, header.file_version) for _ in range(_read_int(cpt_file))]
+        except struct.error:
+            raise ValueError(f"Truncated CPT file {input_cpt_path}")
+
+
+def _read_int(cpt_file: BinaryIO) -> int:
+    return struct.unpack('>i', cpt_file.read(4))[0]
+
+
+def _read_string(cpt_file: BinaryIO) -> str:
+    length = _read_int(cpt_file)
+    return cpt_file.read((length + 3) // 4 * 4)[:length].decode(errors='replace')
+
+
+def _read_header(cpt_file: BinaryIO) -> CptHeader:
+    if _read_int(cpt_file) != CPT_MAGIC:
+        raise ValueError(f"{cpt_file.name} is not a CPT file")
+    # GROMACS version, three unused build strings, generating program and generation time
+    strings = [_read_string(cpt_file) for _ in range(6)]
+    file_version = _read_int(cpt_file)
+    double = bool(_read_int(cpt_file)) if file_version >= 13 else None
+    if file_version >= 12:
+        _read_string(cpt_file)
+    natoms, ngtc = _read_int(cpt_file), _read_int(cpt_file)
+    # Nose-Hoover chain lengths
+    for version in (10, 11):
+        if file_version >= version:
+            _read_int(cpt_file)
+    nlambda = _read_int(cpt_file) if file_version >= 14 else 0
+    integrator = _read_int(cpt_file)
+    simulation_part = _read_int(cpt_file) if file_version >= 3 else 1
+    step = struct.unpack('>q', cpt_file.read(8))[0] if file_version >= 5 else _read_int(cpt_file)
+    (time,) = struct.unpack('>d', cpt_file.read(8))
+    pp_ranks, nx, ny, nz, pme_ranks, state_flags = struct.unpack('>6i', cpt_file.read(24))
+    ekin_flags, energy_history_flags = struct.unpack('>2i', cpt_file.read(8)) if file_version >= 4 else (0, 0)
+    # Optional sections added in later file versions
+    df_history_flags, ed_datasets, swap, awh_history_flags, pull_history_flags = (_read_int(cpt_file) if file_version >= version else 0
+                                                                                  for version in (14, 15, 16, 17, 20))
+    if file_version >= 22:
+        # Modular simulator checkpoint
+        _read_int(cpt_file)
+    return CptHeader(gromacs_version=strings[0].removeprefix('VERSION '), generating_program=strings[4], generation_time=strings[5],
+                     file_version=file_version, double=double, natoms=natoms, ngtc=ngtc, nlambda=nlambda,
+                     integrator=CPT_INTEGRATORS[integrator] if 0 <= integrator < len(CPT_INTEGRATORS) else str(integrator),
+                     simulation_part=simulation_part, step=step, time=float(time), pp_ranks=pp_ranks, dd_grid=(nx, ny, nz),
+                     pme_ranks=pme_ranks, state_flags=state_flags, ekin_flags=ekin_flags, energy_history_flags=energy_history_flags,
+                     df_history_flags=df_history_flags, ed_datasets=ed_datasets, swap=swap, awh_history_flags=awh_history_flags,
+                     pull_history_flags=pull_history_flags, header_size=cpt_file.tell())
+
+
+def _skip_vector(cpt_file: BinaryIO) -> None:
+    count, element_type = struct.unpack('>2i', cpt_file.read(8))
+    if element_type not in _CPT_TYPE_SIZES or count < 0:
+        raise ValueError(f"Unknown CPT entry (element type {element_type}) at byte {cpt_file.tell() - 8} of {cpt_file.name}")
+    cpt_file.seek(count * _CPT_TYPE_SIZES[element_type], 1)
+
+
+def _skip_entry(cpt_file: BinaryIO) -> None:
+    """ Skips a state or kinetic energy entry: a vector of values preceded by its length and element type,
+    or a list of matrices (eg: the half step kinetic energies) preceded by the number of matrices. """
+    _, element_type = struct.unpack('>2i', cpt_file.read(8))
+    cpt_file.seek(-8 if element_type in _CPT_TYPE_SIZES else -4, 1)
+    _skip_vector(cpt_file)
+
+
+def _skip_energy_history(cpt_file: BinaryIO, flags: int) -> None:
+    delta_h_count = 0
+    for entry in range(flags.bit_length()):
+        if not flags & (1 << entry):
+            continue
+        if entry in _ENERGY_HISTORY_STEPS:
+            cpt_file.seek(8, 1)
+        elif entry == _ENERGY_HISTORY_DELTA_H_NN:
+            delta_h_count = _read_int(cpt_file)
+        elif entry == _ENERGY_HISTORY_DELTA_H_LIST:
+            for _ in range(delta_h_count):
+                _skip_vector(cpt_file)
+        else:
+            _skip_vector(cpt_file)
+
+
+def _read_output_file(cpt_file: BinaryIO, file_version: int) -> CptOutputFile:
+    filename = _read_string(cpt_file)
+    offset_high, offset_low = struct.unpack('>iI', cpt_file.read(8))
+    checksum_size, checksum = -1, None
+    if file_version >= 8:
+        checksum_size = _read_int(cpt_file)
+        # Every byte of the checksum is XDR encoded as an unsigned int
+        checksum = bytes(struct.unpack('>16I', cpt_file.read(64))).hex()
+    return CptOutputFile(filename=filename, offset=(offset_high << 32) | offset_low, checksum_size=checksum_size, checksum=checksum)
+
+
+def verify_cpt_output_file(output_file: CptOutputFile, output_path: str) -> bool:
+    """ Checks that an output file recorded in a checkpoint is intact: at least as long as when the checkpoint was
+    written and with the same MD5 checksum of the part before that point. Without a checksum only the size is checked. """
+    path = Path(output_path)
+    if not path.is_file() or path.stat().st_size < output_file.offset:
+        return False
+    if output_file.checksum is None or output_file.checksum_size < 0:
+        return True
+    # mdrun checksums the (up to 1 MB) last part of the file before the checkpoint offset
+    with open(path, 'rb') as file:
+        file.seek(output_file.offset - output_file.checksum_size)
+        return hashlib.md5(file.read(output_file.checksum_size)).hexdigest() == output_file.checksum
+
+
+def find_resume_checkpoint(cpt_paths: Sequence[str], natoms: Optional[int] = None, search_dirs: Sequence[str] = (),
+                           required_files: Sequence[str] = ()) -> Optional[CptResume]:
+    """ Latest valid checkpoint (highest step) of cpt_paths: readable, with natoms atoms and recording the required
+    output files. Its output files are looked for next to the checkpoint and then in search_dirs. Checkpoints whose
+    file list can not be read are returned with every output file missing, so the run continues in new files. """
+    resumes = []
+    for cpt_path in dict.fromkeys(str(path) for path in cpt_paths):
+        try:
+            header = read_cpt_header(cpt_path)
+        except (OSError, ValueError):
+            continue
+        if natoms is not None and header.natoms != natoms:
+            continue
+        try:
+            output_files = read_cpt_output_files(cpt_path)
+        except ValueError:
+            resumes.append(CptResume(cpt_path, header, {}, list(required_files)))
+            continue
+        names = {Path(output_file.filename).name for output_file in output_files}
+        if not names.issuperset(Path(name).name for name in required_files):
+            continue
+        output_paths, missing_files = {}, []
+        for output_file in output_files:
+            directories = [str(Path(cpt_path).parent)] + list(search_dirs)
+            candidates = [Path(directory).joinpath(Path(output_file.filename).name) for directory in directories]
+            intact = next((str(candidate) for candidate in candidates if verify_cpt_output_file(output_file, str(candidate))), None)
+            if intact:
+                output_paths[output_file.filename] = intact
+            else:
+                missing_files.append(output_file.filename)
+        resumes.append(CptResume(cpt_path, header, output_paths, missing_files))
+    return max(resumes, key=lambda resume: (resume.header.step, resume.header.simulation_part, resume.append), default=None)
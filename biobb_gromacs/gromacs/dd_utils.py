@@ -0,0 +1,121 @@
+""" Analytic planner of the mdrun ranks, OpenMP threads, separate PME ranks and domain decomposition grid """
+from typing import NamedTuple, Optional
+import numpy as np
+from numpy.typing import ArrayLike
+
+
+# With dynamic load balancing the cells can shrink to this fraction of their average size (mdrun -dds)
+DD_DLB_CELL_SCALING = 0.8
+# mdrun only uses separate PME ranks by default above this number of ranks: the PME all-to-all communication
+# between all the ranks gets expensive
+DD_PME_RANKS_THRESHOLD = 18
+# OpenMP threads per rank beyond this number rarely scale
+DD_MAX_OMP_THREADS = 16
+# Rough weights of the cost model, relative to the halo communication (fraction of the cell imported from the neighbours):
+# OpenMP scaling losses per extra thread and PME all-to-all communication per PP rank doing PME
+DD_OMP_THREAD_COST = 0.05
+DD_PME_ALLTOALL_COST = 0.01
+
+
+class DdPlan(NamedTuple):
+    """ Parallel layout of an mdrun run: ranks (MPI processes or thread-MPI threads), OpenMP threads per rank,
+    separate PME ranks, domain decomposition grid of the PP ranks, cell sizes (nm) and the cost model values. """
+    ranks: int
+    ntomp: int
+    npme: int
+    grid: tuple[int, int, int]
+    cell_size: tuple[float, float, float]
+    halo_fraction: float
+    score: float
+
+    @property
+    def pp_ranks(self) -> int:
+        return self.ranks - self.npme
+
+
+def box_lengths(box: ArrayLike) -> np.ndarray:
+    """ Lengths of the box (nm) perpendicular to the decomposed planes. GROMACS boxes are lower triangular,
+    so they are the diagonal elements. Accepts a (3, 3) box or its (3,) diagonal. """
+    box = np.asarray(box, dtype=np.float64)
+    return np.diag(box).copy() if box.ndim == 2 else box.ravel()[:3].copy()
+
+
+def dd_grids(pp_ranks: int, box: ArrayLike, cutoff: float, dlb_scaling: float = DD_DLB_CELL_SCALING) -> list[tuple[tuple[int, int, int], float]]:
+    """ Domain decomposition grids of pp_ranks cells whose size along every decomposed dimension, shrunk by the
+    dynamic load balancing, is not smaller than the cut-off. Returned with their halo fraction, best first. """
+    lengths = box_lengths(box)
+    grids = []
+    for nx in _divisors(pp_ranks):
+        for ny in _divisors(pp_ranks // nx):
+            grid = (nx, ny, pp_ranks // nx // ny)
+            cells = lengths / np.array(grid)
+            decomposed = np.array(grid) > 1
+            if np.all(cells[decomposed] * dlb_scaling >= cutoff):
+                grids.append((grid, float(np.sum(cutoff / cells[decomposed]))))
+    return sorted(grids, key=lambda grid_halo: grid_halo[1])
+
+
+def _divisors(number: int) -> list[int]:
+    return [divisor for divisor in range(1, number + 1) if number % divisor == 0]
+
+
+def _pme_ranks_options(ranks: int, separate_pme: bool, gpu_pme: bool = False) -> list[int]:
+    # PME on the GPU (mdrun -pme gpu) runs on a single separate rank when there are several ranks
+    if gpu_pme:
+        return [1 if ranks > 1 else 0]
+    if not separate_pme or ranks < 4:
+        return [0]
+    return [0] + sorted({ranks // 4, ranks // 3})
+
+
+def plan_layout(ranks: int, ntomp: int, box: ArrayLike, cutoff: float, npme: Optional[int] = None,
+                separate_pme: bool = True, dlb_scaling: float = DD_DLB_CELL_SCALING, gpu_pme: bool = False) -> Optional[DdPlan]:
+    """ Best plan for the given number of ranks and threads (trying the usual numbers of PME ranks if npme is None,
+    or the single PME rank of several ranks with gpu_pme). None if no domain decomposition is possible. """
+    plans = []
+    for pme_ranks in ([npme] if npme is not None and npme >= 0 else _pme_ranks_options(ranks, separate_pme, gpu_pme)):
+        if ranks - pme_ranks < 1:
+            continue
+        pp_ranks = ranks - pme_ranks
+        grids = [((1, 1, 1), 0.0)] if pp_ranks == 1 else dd_grids(pp_ranks, box, cutoff, dlb_scaling)
+        if not grids:
+            continue
+        grid, halo = grids[0]
+        score = halo + DD_OMP_THREAD_COST * (ntomp - 1)
+        if not pme_ranks and pp_ranks > DD_PME_RANKS_THRESHOLD:
+            score += DD_PME_ALLTOALL_COST * pp_ranks
+        plans.append(DdPlan(ranks=ranks, ntomp=ntomp, npme=pme_ranks, grid=grid,
+                            cell_size=tuple(float(length) for length in box_lengths(box) / np.array(grid)),  # type: ignore[arg-type]
+                            halo_fraction=halo, score=score))
+    return min(plans, key=lambda plan: plan.score, default=None)
+
+
+def plan_layouts(ncores: int, box: ArrayLike, cutoff: float, threads_per_core: int = 1, separate_pme: bool = True,
+                 max_omp_threads: int = DD_MAX_OMP_THREADS, dlb_scaling: float = DD_DLB_CELL_SCALING, gpu_pme: bool = False) -> list[DdPlan]:
+    """ Feasible layouts using all the hardware threads of ncores physical cores, best first. Ranks never split
+    the hardware threads of a core (SMT) and layouts whose domain decomposition cells would be smaller than the
+    cut-off are rejected. The cost model adds the halo fraction, the OpenMP scaling losses and the PME all-to-all
+    communication when all the ranks do PME. """
+    hardware_threads = ncores * threads_per_core
+    plans = []
+    for ranks in _divisors(ncores):
+        ntomp = hardware_threads // ranks
+        if ntomp > max(max_omp_threads, threads_per_core):
+            continue
+        plan = plan_layout(ranks, ntomp, box, cutoff, separate_pme=separate_pme, dlb_scaling=dlb_scaling, gpu_pme=gpu_pme)
+        if plan:
+            plans.append(plan)
+    return sorted(plans, key=lambda plan: plan.score)
+
+
+def feasible_rank_counts(box: ArrayLike, cutoff: float, max_ranks: int, separate_pme: bool = True,
+                         dlb_scaling: float = DD_DLB_CELL_SCALING, gpu_pme: bool = False) -> list[int]:
+    """ Numbers of ranks up to max_ranks with a possible domain decomposition. """
+    return [ranks for ranks in range(1, max_ranks + 1)
+            if plan_layout(ranks, 1, box, cutoff, separate_pme=separate_pme, dlb_scaling=dlb_scaling, gpu_pme=gpu_pme)]
+
+
+def max_cutoff(cutoffs: dict) -> float:
+    """ Largest interaction distance (nm) of the TPR cut-offs (rlist, rcoulomb and rvdw), the minimum DD cell size.
+    Bonded interactions spanning longer distances (eg: long restraints) need larger cells. """
+    return float(max(cutoffs.get(name, 0.0) for name in ('rlist', 'rcoulomb', 'rvdw')))
@@ -0,0 +1,159 @@
+""" Native reader for the GROMACS energy file format EDR """
+import struct
+import time as time_module
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Sequence
+import numpy as np
+
+
+EDR_MAGIC = -55555
+EDR_FRAME_MAGIC = -7777777
+# Energy files written since GROMACS 4.5 use versions 4 and 5
+EDR_MIN_VERSION = 4
+# First real of every frame, used to detect single or double precision
+_EDR_FIRST_REAL = -2e10
+# Sizes of the XDR encoded block data types: int, float, double, int64, char (string is variable)
+_EDR_BLOCK_TYPE_SIZES = {0: 4, 1: 4, 2: 8, 3: 8, 4: 4}
+_EDR_BLOCK_STRING = 5
+
+
+class EdrTerm(NamedTuple):
+    """ Energy term of an EDR file. """
+    name: str
+    unit: str
+
+
+class EdrFrame(NamedTuple):
+    """ Frame of an EDR file with the values of the selected energy terms. """
+    step: int
+    time: float
+    energies: np.ndarray
+
+
+class _Incomplete(Exception):
+    """ The file ends in the middle of a frame. """
+
+
+def read_edr_terms(input_edr_path: str) -> list[EdrTerm]:
+    """ Returns the names and units of the energy terms of an EDR file. """
+    with open(input_edr_path, 'rb') as edr_file:
+        return _read_terms(edr_file)
+
+
+def read_edr(input_edr_path: str, terms: Optional[Sequence[str]] = None) -> dict[str, np.ndarray]:
+    """ Reads the selected energy terms (all by default, names are case insensitive) of every frame
+    of an EDR file. Returns a dict of arrays with the 'Step' and 'Time' of the frames and one entry per term. """
+    names = [term.name for term in read_edr_terms(input_edr_path)]
+    selected = [names[index] for index in _select_terms(names, terms, input_edr_path)]
+    frames = list(iter_edr(input_edr_path, terms=selected))
+    energies = np.array([frame.energies for frame in frames]).reshape(len(frames), len(selected))
+    data = {'Step': np.array([frame.step for frame in frames], dtype=np.int64),
+            'Time': np.array([frame.time for frame in frames], dtype=np.float64)}
+    data.update({name: energies[:, column] for column, name in enumerate(selected)})
+    return data
+
+
+def iter_edr(input_edr_path: str, terms: Optional[Sequence[str]] = None, follow: bool = False,
+             poll_interval: float = 1.0, timeout: Optional[float] = None) -> Iterator[EdrFrame]:
+    """ Yields the frames of an EDR file with the values of the selected energy terms in the order given.
+    Frames without energy terms and an incomplete last frame are ignored. With follow the file is tailed as it is being written (eg: by a
+    running mdrun): the incomplete frame is read again every poll_interval seconds until the file stops
+    growing for timeout seconds (forever if timeout is None). """
+    with open(input_edr_path, 'rb') as edr_file:
+        names = [term.name for term in _read_terms(edr_file)]
+        columns = _select_terms(names, terms, input_edr_path)
+        last_growth = time_module.monotonic()
+        while True:
+            frame_start = edr_file.tell()
+            try:
+                frame = _read_frame(edr_file)
+            except _Incomplete:
+                frame = None
+            if frame is not None:
+                step, frame_time, energies = frame
+                last_growth = time_module.monotonic()
+                # Frames without energies only store blocks (eg: dH/dl of free energy runs), gmx energy skips them
+                if len(energies):
+                    yield EdrFrame(step=step, time=frame_time, energies=energies[columns])
+                continue
+            if not follow or (timeout is not None and time_module.monotonic() - last_growth > timeout):
+                return
+            edr_file.seek(frame_start)
+            time_module.sleep(poll_interval)
+
+
+def _select_terms(names: list[str], terms: Optional[Sequence[str]], input_edr_path: str) -> np.ndarray:
+    if terms is None:
+        return np.arange(len(names))
+    lower_names = [name.lower() for name in names]
+    missing = [term for term in terms if term.lower() not in lower_names]
+    if missing:
+        raise ValueError(f"Energy terms {', '.join(missing)} not found in {input_edr_path}. Available terms: {', '.join(names)}")
+    return np.array([lower_names.index(term.lower()) for term in terms], dtype=np.int64)
+
+
+def _read_exactly(edr_file: BinaryIO, size: int) -> bytes:
+    data = edr_file.read(size)
+    if len(data) < size:
+        raise _Incomplete()
+    return data
+
+
+def _read_string(edr_file: BinaryIO) -> str:
+    (length,) = struct.unpack('>i', _read_exactly(edr_file, 4))
+    return _read_exactly(edr_file, (length + 3) // 4 * 4)[:length].decode(errors='replace')
+
+
+def _read_terms(edr_file: BinaryIO) -> list[EdrTerm]:
+    try:
+        magic, version, nre = struct.unpack('>3i', _read_exactly(edr_file, 12))
+        if magic != EDR_MAGIC:
+            raise ValueError(f"Wrong EDR magic number {magic} in {edr_file.name}")
+        if version < EDR_MIN_VERSION:
+            raise ValueError(f"EDR file version {version} of {edr_file.name} is not supported, convert it with a recent GROMACS version")
+        return [EdrTerm(name=_read_string(edr_file), unit=_read_string(edr_file)) for _ in range(nre)]
+    except _Incomplete:
+        raise ValueError(f"Truncated EDR header in {edr_file.name}")
+
+
+def _read_frame(edr_file: BinaryIO) -> Optional[tuple[int, float, np.ndarray]]:
+    """ Reads the frame at the current position. Returns None at the end of the file and raises _Incomplete
+    if the file ends in the middle of the frame. """
+    first = edr_file.read(4)
+    if not first:
+        return None
+    if len(first) < 4:
+        raise _Incomplete()
+    if struct.unpack('>f', first)[0] == np.float32(_EDR_FIRST_REAL):
+        real = '>f4'
+    else:
+        first += _read_exactly(edr_file, 4)
+        if struct.unpack('>d', first)[0] != _EDR_FIRST_REAL:
+            raise ValueError(f"Wrong EDR frame header in {edr_file.name}")
+        real = '>f8'
+    magic, version, frame_time, step, nsum, _, _, nre, _, nblock = struct.unpack('>2idqiqd3i', _read_exactly(edr_file, 56))
+    if magic != EDR_FRAME_MAGIC or version < EDR_MIN_VERSION:
+        raise ValueError(f"Wrong EDR frame magic number {magic} or version {version} in {edr_file.name}")
+    sub_blocks: list[tuple[int, int]] = []
+    for _ in range(nblock):
+        _, nsub = struct.unpack('>2i', _read_exactly(edr_file, 8))
+        sub_blocks.extend(struct.unpack('>2i', _read_exactly(edr_file, 8)) for _ in range(nsub))
+    # Energy size and two reserved ints
+    _read_exactly(edr_file, 12)
+
+    # Each term is stored with its average and sum if the frame has statistics
+    values_per_term = 3 if nsum > 0 else 1
+    itemsize = np.dtype(real).itemsize
+    energies = np.frombuffer(_read_exactly(edr_file, nre * values_per_term * itemsize), dtype=real)
+    energies = energies[::values_per_term].astype(np.float64)
+
+    for nr, data_type in sub_blocks:
+        if data_type == _EDR_BLOCK_STRING:
+            for _ in range(nr):
+                # Strings are stored with their length including the null character before the XDR string
+                _read_exactly(edr_file, 4)
+                _read_string(edr_file)
+        elif data_type in _EDR_BLOCK_TYPE_SIZES:
+            _read_exactly(edr_file, nr * _EDR_BLOCK_TYPE_SIZES[data_type])
+        else:
+            raise ValueError(f"Unknown EDR block data type {data_type} in {edr_file.name}")
+    return step, float(frame_time), energies
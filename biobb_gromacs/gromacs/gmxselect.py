@@ -7,6 +7,7 @@ from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_gromacs.gromacs.common import get_gromacs_version
+from biobb_gromacs.gromacs.ndx_utils import read_ndx
 
 
 class Gmxselect(BiobbObject):
@@ -131,11 +132,11 @@ class Gmxselect(BiobbObject):
         if self.io_dict["in"].get("input_ndx_path"):
             if self.append:
                 fu.log(f"Appending {self.io_dict['in'].get('input_ndx_path')} to {self.io_dict['out']['output_ndx_path']}", self.out_log, self.global_log)
-                with open(self.io_dict["out"]["output_ndx_path"], 'a') as out_ndx_file:
-                    out_ndx_file.write('\n')
-                    with open(self.io_dict["in"].get("input_ndx_path", '')) as in_ndx_file:
-                        for line in in_ndx_file:
-                            out_ndx_file.write(line)
+                # Groups with the name of a selection are not appended, GROMACS would only use the selection
+                ndx = read_ndx(self.io_dict["out"]["output_ndx_path"])
+                for name, group in read_ndx(self.io_dict["in"].get("input_ndx_path", '')).items():
+                    ndx.setdefault(name, group)
+                ndx.write(self.io_dict["out"]["output_ndx_path"])
 
         # Remove temporal files
         self.tmp_files.append(str(selection_file_path))
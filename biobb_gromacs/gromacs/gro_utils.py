@@ -0,0 +1,372 @@
+""" Native vectorized reader and writer for the GROMACS structure format GRO """
+import os
+from dataclasses import dataclass
+from typing import Iterator, NamedTuple, Optional, Union
+import numpy as np
+
+
+# Residue and atom numbers are written modulo 100000 in the fixed 5 character columns
+GRO_WRAP = 100000
+# Drops of the residue number bigger than this are considered a wraparound and not a new chain starting at 1
+GRO_RESID_WRAP_THRESHOLD = GRO_WRAP // 2
+
+
+@dataclass
+class GroStructure:
+    """ Columnar representation of a frame of a GRO file.
+
+    Args:
+        title (str): Title line.
+        resid (np.ndarray): (N,) Residue numbers (unwrapped).
+        resname (np.ndarray): (N,) Residue names.
+        atomname (np.ndarray): (N,) Atom names.
+        atomid (np.ndarray): (N,) Atom numbers (unwrapped).
+        xyz (np.ndarray): (N, 3) Coordinates in nm.
+        box (np.ndarray): (3,) or (9,) Box vectors in nm as written in the last line.
+        v (np.ndarray): (None) (N, 3) Velocities in nm/ps.
+    """
+    title: str
+    resid: np.ndarray
+    resname: np.ndarray
+    atomname: np.ndarray
+    atomid: np.ndarray
+    xyz: np.ndarray
+    box: np.ndarray
+    v: Optional[np.ndarray] = None
+
+    @property
+    def natoms(self) -> int:
+        return len(self.atomid)
+
+
+class GroHeader(NamedTuple):
+    """ Title, number of atoms and box of a GRO file, and the layout of its atom lines. """
+    title: str
+    natoms: int
+    box: np.ndarray
+    atoms_offset: int
+    line_length: int
+
+
+GRO_COLUMNS = ('resid', 'resname', 'atomname', 'atomid', 'xyz', 'v')
+
+
+def read_gro_header(input_gro_path: str) -> GroHeader:
+    """ Reads the title, the number of atoms and the box of the first frame of a GRO file without
+    reading the atoms. The box line is found seeking past natoms lines of the length of the first one. """
+    with open(input_gro_path, 'rb') as gro_file:
+        title = gro_file.readline().decode().rstrip('\r\n')
+        natoms = int(gro_file.readline().split()[0])
+        atoms_offset = gro_file.tell()
+        line_length = len(gro_file.readline())
+        box = None
+        if natoms:
+            gro_file.seek(atoms_offset + natoms * line_length - 1)
+            if gro_file.read(1) == b'\n':
+                box = _parse_box(gro_file.readline())
+        if box is None:
+            # Lines with different lengths: the box is the last line of a single frame file
+            gro_file.seek(max(0, os.path.getsize(input_gro_path) - 512))
+            box = _parse_box(gro_file.read().strip().splitlines()[-1])
+        if box is None:
+            raise ValueError(f"Box line not found in {input_gro_path}")
+    return GroHeader(title, natoms, box, atoms_offset, line_length)
+
+
+def _parse_box(line: bytes) -> Optional[np.ndarray]:
+    try:
+        box = np.array(line.split(), dtype=np.float64)
+    except ValueError:
+        return None
+    return box if len(box) in (3, 9) else None
+
+
+class GroView:
+    """ Lazy memory-mapped view of the first frame of a GRO file with fixed length atom lines.
+
+    Nothing but the header is read on creation. Atoms are parsed on demand from the mapped
+    (natoms, line length) byte matrix: ``view[i]`` parses the line of atom i, ``view[start:stop]``
+    or ``view[indices]`` a subset, and :meth:`column` a single column without parsing the rest.
+    Residue numbers are returned as written (modulo 100000), atom numbers are unwrapped assuming
+    they are consecutive.
+
+    Args:
+        input_gro_path (str): Path to the GRO file.
+    """
+
+    def __init__(self, input_gro_path: str) -> None:
+        self.input_gro_path = input_gro_path
+        self.header = read_gro_header(input_gro_path)
+        self._rows: np.ndarray
+        if self.header.natoms:
+            self._rows = np.memmap(input_gro_path, dtype=np.uint8, mode='r', offset=self.header.atoms_offset,
+                                   shape=(self.header.natoms, self.header.line_length))
+            if self._rows[0, -1] != ord('\n') or self._rows[-1, -1] != ord('\n'):
+                raise ValueError(f"Atom lines of {input_gro_path} have different lengths, use read_gro instead")
+            first_line = self._rows[0].tobytes().decode().rstrip()
+            first_dot = first_line.index('.', 20)
+            self._width = first_line.index('.', first_dot + 1) - first_dot
+            self.has_velocities = len(first_line) >= 20 + 6 * self._width
+        else:
+            self._rows = np.empty((0, 0), dtype=np.uint8)
+            self._width, self.has_velocities = 8, False
+
+    @property
+    def title(self) -> str:
+        return self.header.title
+
+    @property
+    def natoms(self) -> int:
+        return self.header.natoms
+
+    @property
+    def box(self) -> np.ndarray:
+        return self.header.box
+
+    def __len__(self) -> int:
+        return self.header.natoms
+
+    def __enter__(self) -> "GroView":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Releases the memory map. """
+        self._rows = np.empty((0, 0), dtype=np.uint8)
+
+    def column(self, name: str, index: Union[int, slice, np.ndarray, None] = None) -> np.ndarray:
+        """ Parses only the column name (one of GRO_COLUMNS) of the atoms in index (all by default). """
+        if name not in GRO_COLUMNS:
+            raise ValueError(f"Unknown GRO column {name}, valid columns: {GRO_COLUMNS}")
+        index = slice(None) if index is None else index
+        rows = self._rows[np.atleast_1d(index) if isinstance(index, (int, np.integer)) else index]
+        width = self._width
+        if name == 'resid':
+            return _parse_int(rows[:, 0:5])
+        if name == 'resname':
+            return _parse_str(rows[:, 5:10])
+        if name == 'atomname':
+            return _parse_str(rows[:, 10:15])
+        if name == 'atomid':
+            written = _parse_int(rows[:, 15:20])
+            positions = self._indices(index) + 1
+            return positions - (positions - written) % GRO_WRAP
+        start = 20 if name == 'xyz' else 20 + 3 * width
+        if name == 'v' and not self.has_velocities:
+            raise ValueError(f"{self.input_gro_path} has no velocities")
+        return _parse_decimal(rows[:, start:start + 3 * width].reshape(len(rows), 3, width), width - 5 + (name == 'v'))
+
+    def _indices(self, index: Union[int, slice, np.ndarray]) -> np.ndarray:
+        """ 0-based atom indices selected by index without materializing all the atoms. """
+        if isinstance(index, slice):
+            return np.arange(*index.indices(self.natoms))
+        index = np.atleast_1d(np.asarray(index))
+        if index.dtype == bool:
+            return np.flatnonzero(index)
+        return index % self.natoms
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]) -> GroStructure:
+        """ Parses the atoms in index as a GroStructure. """
+        return GroStructure(title=self.title, box=self.box,
+                            v=self.column('v', index) if self.has_velocities else None,
+                            **{name: self.column(name, index) for name in GRO_COLUMNS if name != 'v'})
+
+
+def read_gro(input_gro_path: str) -> GroStructure:
+    """ Reads the first frame of a GRO file. """
+    return next(iter_gro(input_gro_path))
+
+
+def iter_gro(input_gro_path: str) -> Iterator[GroStructure]:
+    """ Yields every frame of a (multi-frame) GRO file. """
+    with open(input_gro_path, 'rb') as gro_file:
+        data = gro_file.read()
+    offset = 0
+    while data[offset:offset + 4096].strip():
+        gro, offset = parse_gro_frame(data, offset)
+        yield gro
+
+
+def parse_gro_frame(data: bytes, offset: int = 0) -> tuple[GroStructure, int]:
+    """ Parses the GRO frame starting at offset of data. Returns the frame and the offset of the next one.
+    The atom lines are parsed at once as a (natoms, line length) byte matrix, a zero-copy view of data
+    when all of them have the same length (always the case for files written by GROMACS). """
+    title_end = data.index(b'\n', offset)
+    natoms_end = data.index(b'\n', title_end + 1)
+    natoms = int(data[title_end + 1:natoms_end].split()[0])
+    start = natoms_end + 1
+    first_end = data.find(b'\n', start)
+    line_length = first_end - start + 1
+    end = start + natoms * line_length
+    rows = None
+    if natoms and first_end > 0 and end <= len(data):
+        rows = np.frombuffer(data, dtype=np.uint8, count=natoms * line_length, offset=start).reshape(natoms, line_length)
+        if not (rows[:, -1] == ord('\n')).all():
+            rows = None
+    if rows is None:
+        # Lines with different lengths (trailing blanks): pad them to a common length
+        pieces = data[start:].split(b'\n', natoms)
+        if len(pieces) <= natoms:
+            raise ValueError(f"Truncated GRO frame: {natoms} atoms expected")
+        atom_lines = pieces[:natoms]
+        end = len(data) - len(pieces[natoms])
+        line_length = max((len(line) for line in atom_lines), default=0) + 1
+        rows = np.array(atom_lines, dtype=f'S{line_length}').view(np.uint8).reshape(natoms, line_length)
+    box_end = data.find(b'\n', end)
+    box_end = len(data) if box_end < 0 else box_end
+    box = np.array(data[end:box_end].split(), dtype=np.float64)
+    gro = _parse_atom_rows(data[offset:title_end].decode().rstrip('\r'), rows, box)
+    return gro, box_end + 1
+
+
+def _parse_atom_rows(title: str, rows: np.ndarray, box: np.ndarray) -> GroStructure:
+    natoms = len(rows)
+    if not natoms:
+        return GroStructure(title, np.empty(0, dtype=np.int64), np.empty(0, dtype=str), np.empty(0, dtype=str),
+                            np.empty(0, dtype=np.int64), np.empty((0, 3)), box)
+    # The coordinate fields width is the distance between the first two decimal points
+    first_line = rows[0].tobytes().decode().rstrip()
+    first_dot = first_line.index('.', 20)
+    width = first_line.index('.', first_dot + 1) - first_dot
+    decimals = width - 5
+    xyz = _parse_decimal(rows[:, 20:20 + 3 * width].reshape(natoms, 3, width), decimals)
+    v = None
+    velocity_start = 20 + 3 * width
+    # Velocities have the same width and one more decimal
+    if len(first_line) >= velocity_start + 3 * width:
+        v = _parse_decimal(rows[:, velocity_start:velocity_start + 3 * width].reshape(natoms, 3, width), decimals + 1)
+    return GroStructure(title=title,
+                        resid=unwrap_ids(_parse_int(rows[:, 0:5]), GRO_RESID_WRAP_THRESHOLD),
+                        resname=_parse_str(rows[:, 5:10]),
+                        atomname=_parse_str(rows[:, 10:15]),
+                        atomid=unwrap_ids(_parse_int(rows[:, 15:20])),
+                        xyz=xyz, box=box, v=v)
+
+
+def unwrap_ids(ids: np.ndarray, threshold: int = 0) -> np.ndarray:
+    """ Restores the numbers written modulo 100000: every drop bigger than threshold adds 100000. """
+    if len(ids) < 2:
+        return ids
+    wraps = np.concatenate(([0], np.cumsum(np.diff(ids) < -threshold)))
+    return ids + wraps * GRO_WRAP
+
+
+def _pack8(columns: np.ndarray) -> np.ndarray:
+    """ Right aligns fields of up to 8 ASCII characters in a contiguous (..., 8) byte array. """
+    packed = np.full(columns.shape[:-1] + (8,), ord(' '), dtype=np.uint8)
+    packed[..., 8 - columns.shape[-1]:] = columns
+    return packed
+
+
+def _swar_digits(packed: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Reads 8 ASCII characters as an 8 digit number at once (SIMD within a register): blanks,
+    signs and decimal points count as zero digits. Returns the numbers and the negative sign mask. """
+    words = packed.view('<u8')[..., 0]
+    minus = words ^ np.uint64(0x2D2D2D2D2D2D2D2D)
+    negative = ((minus - np.uint64(0x0101010101010101)) & ~minus & np.uint64(0x8080808080808080)) != 0
+    np.maximum(packed, ord('0'), out=packed)
+    packed -= ord('0')
+    words = (words & np.uint64(0x0F0F0F0F0F0F0F0F)) * np.uint64(2561) >> np.uint64(8)
+    words = (words & np.uint64(0x00FF00FF00FF00FF)) * np.uint64(6553601) >> np.uint64(16)
+    words = (words & np.uint64(0x0000FFFF0000FFFF)) * np.uint64(42949672960001) >> np.uint64(32)
+    return words.astype(np.float64), negative
+
+
+def _parse_int(columns: np.ndarray) -> np.ndarray:
+    """ Right aligned integer fields of up to 8 characters. """
+    values, negative = _swar_digits(_pack8(columns))
+    return np.where(negative, -values, values).astype(np.int64)
+
+
+def _parse_decimal(columns: np.ndarray, decimals: int) -> np.ndarray:
+    """ Fixed width decimal fields with the decimal point at the same position in every row. """
+    width = columns.shape[-1]
+    if width <= 8:
+        digits, negative = _swar_digits(_pack8(columns))
+        # Remove the zero digit of the decimal point
+        integer_part = np.floor(digits / 10 ** (decimals + 1))
+        values = (digits - integer_part * 9 * 10 ** decimals) / 10 ** decimals
+    else:
+        point = width - decimals - 1
+        weights = np.array([10.0 ** (point - j - 1) if j < point else 0.0 if j == point else 10.0 ** (point - j) for j in range(width)])
+        digits = np.maximum(columns, ord('0'))
+        digits -= ord('0')
+        values = digits.astype(np.float64) @ weights
+        negative = (columns == ord('-')).any(axis=-1)
+    return np.where(negative, -values, values)
+
+
+def _parse_str(columns: np.ndarray) -> np.ndarray:
+    """ Fixed width names of up to 8 characters, decoded once per unique value. """
+    packed = np.zeros((len(columns), 8), dtype=np.uint8)
+    packed[:, :columns.shape[1]] = columns
+    unique_keys, inverse = np.unique(packed.view('<u8')[:, 0], return_inverse=True)
+    names = np.array([int(key).to_bytes(8, 'little').decode().strip(' \x00') for key in unique_keys])
+    return names[inverse.ravel()]
+
+
+def write_gro(output_gro_path: str, gro: GroStructure, precision: int = 3) -> str:
+    """ Writes a GRO file. All the atom lines are formatted at once in a single (natoms, line length)
+    byte matrix. Residue and atom numbers are written modulo 100000. Returns the output path. """
+    width = precision + 5
+    natoms = gro.natoms
+    fields = [_format_int(np.asarray(gro.resid) % GRO_WRAP, 5),
+              _format_str(np.asarray(gro.resname, dtype=str), 5, left=True),
+              _format_str(np.asarray(gro.atomname, dtype=str), 5),
+              _format_int(np.asarray(gro.atomid) % GRO_WRAP, 5),
+              _format_decimal(np.asarray(gro.xyz, dtype=np.float64).reshape(natoms, 3), width, precision).reshape(natoms, 3 * width)]
+    if gro.v is not None:
+        fields.append(_format_decimal(np.asarray(gro.v, dtype=np.float64).reshape(natoms, 3), width, precision + 1).reshape(natoms, 3 * width))
+    fields.append(np.full((natoms, 1), ord('\n'), dtype=np.uint8))
+    box = "".join(f"{value:10.5f}" for value in np.asarray(gro.box, dtype=np.float64))
+    with open(output_gro_path, 'wb') as gro_file:
+        gro_file.write(f"{gro.title}\n{natoms:5d}\n".encode())
+        gro_file.write(np.concatenate(fields, axis=1).tobytes())
+        gro_file.write(f"{box}\n".encode())
+    return output_gro_path
+
+
+def _format_int(values: np.ndarray, width: int) -> np.ndarray:
+    """ Right aligned non negative integers as a (..., width) ASCII array. """
+    values = np.asarray(values)
+    values = values.astype(np.int32 if values.size == 0 or values.max() < 2 ** 31 else np.int64)
+    digits = np.empty(values.shape + (width,), dtype=np.uint8)
+    remaining = values.copy()
+    for j in range(width - 1, -1, -1):
+        digits[..., j] = remaining % 10
+        remaining //= 10
+    digits += ord('0')
+    # Blank the leading zeros, the last digit is always written
+    for j in range(width - 1):
+        digits[..., j][values < 10 ** (width - 1 - j)] = ord(' ')
+    return digits
+
+
+def _format_decimal(values: np.ndarray, width: int, decimals: int) -> np.ndarray:
+    """ printf %width.decimalsf as a (..., width) ASCII array. """
+    scaled = np.rint(np.abs(values) * 10 ** decimals).astype(np.int64)
+    negative = np.signbit(values)
+    integer_digits = width - decimals - 1
+    limit = 10 ** (integer_digits - 1) * 10 ** decimals
+    if (scaled >= np.where(negative, limit, 10 * limit)).any():
+        raise ValueError(f"Values do not fit in the %{width}.{decimals}f GRO format, use a lower precision")
+    integer_part, fraction = np.divmod(scaled, 10 ** decimals)
+    out = np.empty(values.shape + (width,), dtype=np.uint8)
+    out[..., :integer_digits] = _format_int(integer_part, integer_digits)
+    out[..., integer_digits] = ord('.')
+    out[..., integer_digits + 1:] = _format_int(fraction + 10 ** decimals, decimals + 1)[..., 1:]
+    # The sign goes just before the first digit
+    negative_fields = out[negative]
+    negative_fields[np.arange(len(negative_fields)), (negative_fields[:, :integer_digits] == ord(' ')).sum(axis=1) - 1] = ord('-')
+    out[negative] = negative_fields
+    return out
+
+
+def _format_str(values: np.ndarray, width: int, left: bool = False) -> np.ndarray:
+    """ Names truncated to width, left or right aligned, as a (N, width) ASCII array. """
+    unique_values, inverse = np.unique(values, return_inverse=True)
+    unique_rows = np.array([list((value[:width].ljust(width) if left else value[:width].rjust(width)).encode()) for value in unique_values],
+                           dtype=np.uint8).reshape(len(unique_values), width)
+    return unique_rows[inverse.ravel()]
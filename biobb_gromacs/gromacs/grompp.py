@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 
 """Module containing the Grompp class and the command line interface."""
+import json
 from typing import Optional
 from pathlib import Path, PurePath
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_gromacs.gromacs.common import get_gromacs_version
-from biobb_gromacs.gromacs.common import create_mdp
+from biobb_gromacs.gromacs.common import get_gromacs_build_info
+from biobb_gromacs.gromacs.common import estimate_trajectory_io
+from biobb_gromacs.gromacs.gro_utils import read_gro_header
+from biobb_gromacs.gromacs.common import merge_mdp
 from biobb_gromacs.gromacs.common import mdp_preset
 
 
@@ -26,8 +30,9 @@ class Grompp(BiobbObject):
         input_mdp_path (str) (Optional): Path to the input GROMACS `MDP file <http://manual.gromacs.org/current/user-guide/mdp-options.html>`_. File type: input. Accepted formats: mdp (edam:format_2330).
         properties (dict - Python dictionary object containing the tool parameters, not input/output files):
             * **mdp** (*dict*) - ({}) MDP options specification.
-            * **simulation_type** (*str*) - (None) Default options for the mdp file. Each one creates a different mdp file. Values: `minimization <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Energy minimization using steepest descent algorithm is used), `nvt <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/nvt.mdp>`_ (substance N Volume V and Temperature T are conserved), `npt <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/npt.mdp>`_ (substance N pressure P and Temperature T are conserved), `free <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/free.mdp>`_ (No design constraints applied; Free MD), `ions <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Synonym of minimization), index (Creates an empty mdp file).
+            * **simulation_type** (*str*) - (None) Default options for the mdp file. Each one creates a different mdp file. Values: `minimization <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Energy minimization using steepest descent algorithm is used), `nvt <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/nvt.mdp>`_ (substance N Volume V and Temperature T are conserved), `npt <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/npt.mdp>`_ (substance N pressure P and Temperature T are conserved), `free <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/free.mdp>`_ (No design constraints applied; Free MD), `ions <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Synonym of minimization), nvt_hmr (nvt with a 4 fs time step for hydrogen mass repartitioned topologies), npt_hmr (npt with a 4 fs time step for hydrogen mass repartitioned topologies), free_hmr (free with a 4 fs time step for hydrogen mass repartitioned topologies), nvt_tng (nvt writing only the compressed trajectory, meant for a TNG output file), npt_tng (npt writing only the compressed trajectory, meant for a TNG output file), free_tng (free writing only the compressed trajectory, meant for a TNG output file), nvt_hmr_tng (nvt_hmr writing only the compressed trajectory, meant for a TNG output file), npt_hmr_tng (npt_hmr writing only the compressed trajectory, meant for a TNG output file), free_hmr_tng (free_hmr writing only the compressed trajectory, meant for a TNG output file), index (Creates an empty mdp file).
             * **maxwarn** (*int*) - (0) [0~1000|1] Maximum number of allowed warnings. If simulation_type is index default is 10.
+            * **max_trajectory_size** (*float*) - (None) [0~100000|0.1] Maximum estimated size in GB of the TRR, XTC and EDR files written by the simulation. If the estimate is bigger the TPR file is not created.
             * **gmx_lib** (*str*) - (None) Path set GROMACS GMXLIB environment variable.
             * **binary_path** (*str*) - ("gmx") Path to the GROMACS executable binary.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
@@ -90,6 +95,8 @@ class Grompp(BiobbObject):
         if self.simulation_type and self.simulation_type != 'index':
             self.maxwarn = str(properties.get('maxwarn', 10))
         self.mdp = {k: str(v) for k, v in properties.get('mdp', dict()).items()}
+        self.max_trajectory_size = properties.get('max_trajectory_size')
+        self.io_report: Optional[dict] = None
 
         # Properties common in all GROMACS BB
         self.gmx_lib = properties.get('gmx_lib', None)
@@ -120,10 +127,37 @@ class Grompp(BiobbObject):
         top_file = fu.unzip_top(zip_file=self.input_top_zip_path, out_log=self.out_log, unique_dir=self.stage_io_dict.get("unique_dir", ""))
 
         # Create MDP file
-        self.output_mdp_path = create_mdp(output_mdp_path=str(Path(self.stage_io_dict.get("unique_dir", "")).joinpath(self.output_mdp_path)),
-                                          input_mdp_path=self.io_dict["in"]["input_mdp_path"],
-                                          preset_dict=mdp_preset(str(self.simulation_type)),
-                                          mdp_properties_dict=self.mdp)
+        preset_dict = mdp_preset(str(self.simulation_type))
+        mdp = merge_mdp(input_mdp_path=self.io_dict["in"]["input_mdp_path"],
+                        preset_dict=preset_dict,
+                        mdp_properties_dict=self.mdp)
+        self.mdp_hash = mdp.content_hash()
+        fu.log(f'MDP content hash: {self.mdp_hash}', self.out_log, self.global_log)
+        if preset_dict:
+            for key, (value, preset_value) in mdp.diff(preset_dict).items():
+                fu.log(f'MDP {key} = {value} (preset {self.simulation_type}: {preset_value})', self.out_log)
+
+        # Estimate the trajectory I/O of the simulation
+        build_info = get_gromacs_build_info(self.binary_path) if not self.container_path else None
+        try:
+            self.io_report = estimate_trajectory_io(natoms=read_gro_header(self.stage_io_dict["in"]["input_gro_path"]).natoms, mdp=mdp,
+                                                    double_precision=bool(build_info and build_info.double_precision))
+            fu.log(f'Trajectory I/O estimate: {json.dumps(self.io_report)}', self.out_log, self.global_log)
+        except (OSError, ValueError, UnicodeDecodeError, IndexError) as error:
+            # The estimate is only needed to check max_trajectory_size, grompp reads more structure formats
+            if self.max_trajectory_size is not None:
+                self.remove_tmp_files()
+                raise ValueError(f"The trajectory size can not be estimated to check max_trajectory_size: {error}")
+            fu.log(f"WARNING: The trajectory I/O can not be estimated: {error}", self.out_log, self.global_log)
+        if self.max_trajectory_size is not None and self.io_report is not None:
+            max_bytes = float(self.max_trajectory_size) * 1e9
+            total_bytes = self.io_report['total_bytes']
+            if total_bytes is None or total_bytes > max_bytes:
+                self.remove_tmp_files()
+                estimate = "unbounded (nsteps = -1)" if total_bytes is None else f"{total_bytes / 1e9:.2f} GB"
+                raise ValueError(f"Estimated trajectory size {estimate} exceeds max_trajectory_size ({self.max_trajectory_size} GB). "
+                                 "Increase nstxout/nstvout/nstfout/nstxout-compressed/nstenergy or max_trajectory_size.")
+        self.output_mdp_path = mdp.write(str(Path(self.stage_io_dict.get("unique_dir", "")).joinpath(self.output_mdp_path)))
 
         if self.container_path:
             working_dir = self.container_volume_path if self.container_volume_path else "/data"
@@ -29,10 +29,12 @@ class GromppMdrun(BiobbObject):
         output_xtc_path (str) (Optional): Path to the GROMACS compressed trajectory file XTC. File type: output. Accepted formats: xtc (edam:format_3875).
         output_cpt_path (str) (Optional): Path to the output GROMACS checkpoint file CPT. File type: output. Accepted formats: cpt (edam:format_2333).
         output_dhdl_path (str) (Optional): Path to the output dhdl.xvg file only used when free energy calculation is turned on. File type: output. Accepted formats: xvg (edam:format_2033).
+        output_tng_path (str) (Optional): Path to the GROMACS compressed trajectory file TNG, written instead of the XTC file (only one compressed trajectory can be written). File type: output. Accepted formats: tng (edam:format_3876).
         properties (dict - Python dictionary object containing the tool parameters, not input/output files):
             * **mdp** (*dict*) - ({}) MDP options specification.
-            * **simulation_type** (*str*) - ("minimization") Default options for the mdp file. Each creates a different mdp file. Values: `minimization <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Energy minimization using steepest descent algorithm is used), `nvt <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/nvt.mdp>`_ (substance N Volume V and Temperature T are conserved), `npt <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/npt.mdp>`_ (substance N pressure P and Temperature T are conserved), `free <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/free.mdp>`_ (No design constraints applied; Free MD), `ions <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Synonym of minimization), index (Creates an empty mdp file).
+            * **simulation_type** (*str*) - ("minimization") Default options for the mdp file. Each creates a different mdp file. Values: `minimization <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Energy minimization using steepest descent algorithm is used), `nvt <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/nvt.mdp>`_ (substance N Volume V and Temperature T are conserved), `npt <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/npt.mdp>`_ (substance N pressure P and Temperature T are conserved), `free <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/free.mdp>`_ (No design constraints applied; Free MD), `ions <https://biobb-gromacs.readthedocs.io/en/latest/_static/mdp/minimization.mdp>`_ (Synonym of minimization), nvt_hmr (nvt with a 4 fs time step for hydrogen mass repartitioned topologies), npt_hmr (npt with a 4 fs time step for hydrogen mass repartitioned topologies), free_hmr (free with a 4 fs time step for hydrogen mass repartitioned topologies), nvt_tng (nvt writing only the compressed trajectory, meant for a TNG output file), npt_tng (npt writing only the compressed trajectory, meant for a TNG output file), free_tng (free writing only the compressed trajectory, meant for a TNG output file), nvt_hmr_tng (nvt_hmr writing only the compressed trajectory, meant for a TNG output file), npt_hmr_tng (npt_hmr writing only the compressed trajectory, meant for a TNG output file), free_hmr_tng (free_hmr writing only the compressed trajectory, meant for a TNG output file), index (Creates an empty mdp file).
             * **maxwarn** (*int*) - (10) [0~1000|1] Maximum number of allowed warnings.
+            * **max_trajectory_size** (*float*) - (None) [0~100000|0.1] Maximum estimated size in GB of the TRR, XTC and EDR files written by the simulation. If the estimate is bigger the TPR file is not created.
             * **mpi_bin** (*str*) - (None) Path to the MPI runner. Usually "mpirun" or "srun".
             * **mpi_np** (*str*) - (None) Number of MPI processes. Usually an integer bigger than 1.
             * **mpi_hostlist** (*str*) - (None) Path to the MPI hostlist file.
@@ -44,6 +46,19 @@ class GromppMdrun(BiobbObject):
             * **use_gpu** (*bool*) - (False) Use settings appropriate for GPU. Adds: -nb gpu -pme gpu
             * **gpu_id** (*str*) - (None) list of unique GPU device IDs available to use.
             * **gpu_tasks** (*str*) - (None) list of GPU device IDs, mapping each PP task on each node to a device.
+            * **maxh** (*float*) - (0.0) [0~10000|0.01] Terminate the run and write a checkpoint at 99% of this number of hours, so it stops cleanly before the queue walltime. 0 runs all the steps.
+            * **dlb** (*str*) - ("auto") Dynamic load balancing of the domain decomposition cells. Values: auto (when the imbalance slows down the run), no (never), yes (always).
+            * **tunepme** (*bool*) - (True) Tune the PME grid and cut-off to balance the work between the PP and PME ranks or the GPU at the start of the run.
+            * **pin** (*str*) - ("auto") Pin the threads to the cores. Values: auto (only when mdrun uses all the cores of the node), on (always, needed to place several runs sharing a node), off (never).
+            * **pinoffset** (*int*) - (0) [0~1000|1] Logical core where the pinning of the threads starts, to keep them off the cores of other runs on the same node. Requires pin on.
+            * **pinstride** (*int*) - (0) [0~64|1] Distance between the logical cores of consecutive threads, eg: 2 to place one thread per physical core with 2 hardware threads per core. 0 selects it automatically. Requires pin on.
+            * **nstlist** (*int*) - (0) [0~1000|1] Neighbour list update interval overriding the one of the TPR (the Verlet buffer is adjusted to keep the accuracy). 0 lets mdrun choose.
+            * **resethway** (*bool*) - (False) Reset the performance counters halfway through the run, so the ns/day of the log excludes the setup and the load balancing.
+            * **autotune** (*bool*) - (False) Benchmark short runs splitting the cores in different numbers of thread-MPI ranks, OpenMP threads and separate PME ranks and run the simulation with the fastest layout. The best layout is cached by number of atoms, box, cut-offs, host CPU and GROMACS version, so similar systems skip the benchmark. Only for thread-MPI GROMACS builds without mpi_bin.
+            * **autotune_nsteps** (*int*) - (2000) [100~100000|100] Number of MD steps of each autotune trial. The timings of the first half of the steps are discarded.
+            * **autotune_cores** (*int*) - (0) [0~1000|1] Number of cores split by the autotune layouts. 0 uses all the cores available to the process.
+            * **plan_layout** (*bool*) - (False) Plan the parallel layout before the run from the number of atoms, box and cut-offs of the TPR and the cores available to the process (not splitting the hardware threads of a core). Given numbers of ranks (num_threads_mpi, or mpi_np with mpi_bin) are checked to allow a domain decomposition whose cells are not smaller than the cut-off, failing before the run otherwise. With mpi_bin the number of processes is never changed. Otherwise the thread-MPI ranks, OpenMP threads and separate PME ranks with the lowest communication cost are used, limited to num_threads hardware threads and num_threads_omp threads per rank if given. With use_gpu layouts of several ranks have a single PME rank.
+            * **auto_resume** (*bool*) - (False) Continue the run from the latest valid checkpoint of the step: output_cpt_path, its _prev.cpt backup or the checkpoints left in the sandboxes of killed runs of the same step (with an identical input TPR). The output files recorded in the checkpoint are verified with their checksums: the run appends to them if they are intact and writes new part files (noappend) otherwise. Combined with maxh, a run stopped at the walltime continues when the step is submitted again, even with restart enabled. Requires output_cpt_path.
             * **gmx_lib** (*str*) - (None) Path set GROMACS GMXLIB environment variable.
             * **binary_path** (*str*) - ("gmx") Path to the GROMACS executable binary.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
@@ -89,7 +104,7 @@ class GromppMdrun(BiobbObject):
                  output_gro_path: str, output_edr_path: str, output_log_path: str,
                  input_cpt_path: Optional[str] = None, input_ndx_path: Optional[str] = None, input_mdp_path: Optional[str] = None,
                  output_xtc_path: Optional[str] = None, output_cpt_path: Optional[str] = None, output_dhdl_path: Optional[str] = None,
-                 output_tpr_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> None:
+                 output_tpr_path: Optional[str] = None, output_tng_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> None:
         # Properties management
         properties = properties or {}
 
@@ -97,8 +112,8 @@ class GromppMdrun(BiobbObject):
         super().__init__(properties)
         self.locals_var_dict = locals().copy()
 
-        grompp_properties_keys = ['mdp', 'maxwarn', 'simulation_type']
-        mdrun_properties_keys = ['mpi_bin', 'mpi_np', 'mpi_hostlist', 'checkpoint_time', 'num_threads', 'num_threads_mpi', 'num_threads_omp', 'num_threads_omp_pme', 'use_gpu', 'gpu_id', 'gpu_tasks', 'dev']
+        grompp_properties_keys = ['mdp', 'maxwarn', 'simulation_type', 'max_trajectory_size']
+        mdrun_properties_keys = ['mpi_bin', 'mpi_np', 'mpi_hostlist', 'checkpoint_time', 'num_threads', 'num_threads_mpi', 'num_threads_omp', 'num_threads_omp_pme', 'use_gpu', 'gpu_id', 'gpu_tasks', 'dev', 'autotune', 'autotune_nsteps', 'autotune_cores', 'plan_layout', 'maxh', 'dlb', 'tunepme', 'pin', 'pinoffset', 'pinstride', 'nstlist', 'resethway', 'auto_resume']
         self.properties_grompp = {}
         self.properties_mdrun = {}
         if properties:
@@ -129,6 +144,7 @@ class GromppMdrun(BiobbObject):
         self.output_xtc_path = output_xtc_path
         self.output_cpt_path = output_cpt_path
         self.output_dhdl_path = output_dhdl_path
+        self.output_tng_path = output_tng_path
 
     @launchlogger
     def launch(self) -> int:
@@ -147,7 +163,7 @@ class GromppMdrun(BiobbObject):
                                       output_gro_path=self.output_gro_path, output_edr_path=self.output_edr_path,
                                       output_log_path=self.output_log_path, output_xtc_path=self.output_xtc_path,
                                       output_cpt_path=self.output_cpt_path, output_dhdl_path=self.output_dhdl_path,
-                                      properties=self.properties_mdrun)
+                                      output_tng_path=self.output_tng_path, properties=self.properties_mdrun)
             fu.log(f'MDRun return code: {mdrun_return_code}', self.out_log, self.global_log)
         else:
             return 1
@@ -164,7 +180,7 @@ def grompp_mdrun(input_gro_path: str, input_top_zip_path: str, output_trr_path:
                  output_gro_path: str, output_edr_path: str, output_log_path: str,
                  input_cpt_path: Optional[str] = None, input_ndx_path: Optional[str] = None, input_mdp_path: Optional[str] = None,
                  output_xtc_path: Optional[str] = None, output_cpt_path: Optional[str] = None, output_dhdl_path: Optional[str] = None,
-                 output_tpr_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> int:
+                 output_tpr_path: Optional[str] = None, output_tng_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> int:
     return GromppMdrun(**dict(locals())).launch()
 
 
@@ -0,0 +1,173 @@
+""" Parser of the performance information of the GROMACS mdrun log file """
+import json
+import re
+from pathlib import Path
+from typing import Optional
+
+
+_PERFORMANCE_RE = re.compile(r"^Performance:\s+([\d.]+)\s+([\d.]+)")
+_TIME_RE = re.compile(r"^\s+Time:\s+([\d.]+)\s+([\d.]+)\s+([\d.]+)")
+_NODES_RE = re.compile(r"^Running on (\d+) nodes? with total (\d+) cores, (\d+) (?:logical cores|processing units)(?:, (\d+) compatible GPUs?)?")
+_RANKS_RE = re.compile(r"^Using (\d+) MPI (?:threads?|process(?:es)?)")
+_OPENMP_RE = re.compile(r"^Using (\d+) OpenMP threads?(?: per (?:tMPI thread|MPI process))?")
+_PME_RANKS_RE = re.compile(r"^Using (\d+) separate PME ranks?")
+_DD_GRID_RE = re.compile(r"^Domain decomposition grid (\d+) x (\d+) x (\d+)(?:, separate PME ranks (\d+))?")
+_CHANGING_NSTLIST_RE = re.compile(r"^Changing nstlist from (\d+) to (\d+), rlist from ([\d.]+) to ([\d.]+)")
+_OUTER_LIST_RE = re.compile(r"^\s+outer list: updated every (\d+) steps, buffer ([\d.]+) nm, rlist ([\d.]+) nm")
+_INPUTREC_RE = re.compile(r"^\s+(nstlist|rlist)\s+=\s+(\S+)")
+_PME_TUNING_RE = re.compile(r"^\s+optimal pme grid (\d+) (\d+) (\d+), coulomb cutoff ([\d.]+)")
+_DD_IMBALANCE_RE = re.compile(r"^\s*Average load imbalance: ([\d.]+) ?%")
+_DD_LOSS_RE = re.compile(r"^\s*Part of the total run time spent waiting due to load imbalance: ([\d.]+) ?%")
+_PME_LOAD_RE = re.compile(r"^\s*Average PME mesh/force load: ([\d.]+)")
+_PME_LOSS_RE = re.compile(r"^\s*Part of the total run time spent waiting due to PP/PME imbalance: ([\d.]+) ?%")
+_VERSION_RE = re.compile(r"^GROMACS version:\s+(\S+)")
+_BRAND_RE = re.compile(r"^\s+Brand:\s+(.+)")
+_SIMD_RE = re.compile(r"^\s+SIMD instructions (?:selected at (?:GROMACS )?compile time|most likely to fit this hardware):\s+(\S+)")
+_GPUS_RE = re.compile(r"^\s+Number of (?:compatible )?GPUs detected: (\d+)")
+_ACCOUNTING_TITLE = 'R E A L   C Y C L E   A N D   T I M E   A C C O U N T I N G'
+
+
+def read_mdrun_log(input_log_path: str) -> dict:
+    """ Parses the performance information of a GROMACS mdrun log file: ns/day and hours/ns, core and wall
+    times, the cycle and time accounting table by task (and its breakdowns), PP/PME and domain decomposition
+    load balance, the initial and final nstlist and rlist and the detected hardware and thread layout.
+    Missing information (eg: an unfinished run) is reported as None. """
+    with open(input_log_path, errors='replace') as log_file:
+        lines = log_file.read().splitlines()
+
+    report: dict = {
+        'gromacs_version': None,
+        'finished': False,
+        'performance': {'ns_per_day': None, 'hours_per_ns': None},
+        'time': {'core_s': None, 'wall_s': None, 'core_wall_ratio_percent': None},
+        'accounting': {'layout': None, 'tasks': [], 'breakdowns': {}},
+        'load_balance': {'dd_average_imbalance_percent': None, 'dd_time_lost_percent': None,
+                         'pme_mesh_force_load': None, 'pme_time_lost_percent': None, 'pme_tuning': None},
+        'neighbor_search': {'nstlist_input': None, 'rlist_input': None, 'nstlist': None, 'rlist': None},
+        'hardware': {'nodes': None, 'cores': None, 'logical_cores': None, 'gpus': None, 'cpu_brand': None, 'simd': None},
+        'parallelization': {'mpi_ranks': None, 'openmp_threads': None, 'pme_ranks': 0, 'dd_grid': None},
+    }
+    load_balance, neighbor_search = report['load_balance'], report['neighbor_search']
+    hardware, parallelization = report['hardware'], report['parallelization']
+    accounting_start = None
+    for number, line in enumerate(lines):
+        if match := _VERSION_RE.match(line):
+            report['gromacs_version'] = match.group(1)
+        elif match := _PERFORMANCE_RE.match(line):
+            report['performance'] = {'ns_per_day': float(match.group(1)), 'hours_per_ns': float(match.group(2))}
+        elif match := _TIME_RE.match(line):
+            report['time'] = {'core_s': float(match.group(1)), 'wall_s': float(match.group(2)), 'core_wall_ratio_percent': float(match.group(3))}
+        elif line.startswith('Finished mdrun'):
+            report['finished'] = True
+        elif _ACCOUNTING_TITLE in line:
+            accounting_start = number
+        elif match := _NODES_RE.match(line):
+            hardware.update(nodes=int(match.group(1)), cores=int(match.group(2)), logical_cores=int(match.group(3)))
+            if match.group(4) is not None:
+                hardware['gpus'] = int(match.group(4))
+        elif match := _GPUS_RE.match(line):
+            hardware['gpus'] = int(match.group(1))
+        elif (match := _BRAND_RE.match(line)) and hardware['cpu_brand'] is None:
+            hardware['cpu_brand'] = match.group(1).strip()
+        elif match := _SIMD_RE.match(line):
+            hardware['simd'] = match.group(1)
+        elif match := _RANKS_RE.match(line):
+            parallelization['mpi_ranks'] = int(match.group(1))
+        elif match := _OPENMP_RE.match(line):
+            parallelization['openmp_threads'] = int(match.group(1))
+        elif match := _PME_RANKS_RE.match(line):
+            parallelization['pme_ranks'] = int(match.group(1))
+        elif match := _DD_GRID_RE.match(line):
+            parallelization['dd_grid'] = [int(match.group(axis)) for axis in (1, 2, 3)]
+            if match.group(4) is not None:
+                parallelization['pme_ranks'] = int(match.group(4))
+        elif (match := _INPUTREC_RE.match(line)) and neighbor_search[f'{match.group(1)}_input'] is None:
+            value = match.group(2)
+            neighbor_search[f'{match.group(1)}_input'] = int(value) if match.group(1) == 'nstlist' else float(value)
+        elif match := _CHANGING_NSTLIST_RE.match(line):
+            neighbor_search['nstlist'], neighbor_search['rlist'] = int(match.group(2)), float(match.group(4))
+        elif (match := _OUTER_LIST_RE.match(line)) and neighbor_search['nstlist'] is None:
+            # The first outer list line of the dual pair-list setup is the one of the run
+            neighbor_search['nstlist'], neighbor_search['rlist'] = int(match.group(1)), float(match.group(3))
+        elif match := _PME_TUNING_RE.match(line):
+            load_balance['pme_tuning'] = {'grid': [int(match.group(axis)) for axis in (1, 2, 3)], 'coulomb_cutoff': float(match.group(4))}
+        elif match := _DD_IMBALANCE_RE.match(line):
+            load_balance['dd_average_imbalance_percent'] = float(match.group(1))
+        elif match := _DD_LOSS_RE.match(line):
+            load_balance['dd_time_lost_percent'] = float(match.group(1))
+        elif match := _PME_LOAD_RE.match(line):
+            load_balance['pme_mesh_force_load'] = float(match.group(1))
+        elif match := _PME_LOSS_RE.match(line):
+            load_balance['pme_time_lost_percent'] = float(match.group(1))
+
+    if neighbor_search['nstlist'] is None:
+        neighbor_search['nstlist'], neighbor_search['rlist'] = neighbor_search['nstlist_input'], neighbor_search['rlist_input']
+    if accounting_start is not None:
+        report['accounting'] = _parse_accounting(lines[accounting_start + 1:])
+    return report
+
+
+def _parse_accounting(lines: list[str]) -> dict:
+    """ Parses the cycle and time accounting table: the main task table and the breakdown tables
+    (eg: PME mesh, GPU) that follow it, up to the Core t / Wall t summary. """
+    accounting: dict = {'layout': None, 'tasks': [], 'breakdowns': {}}
+    layout: list[str] = []
+    tasks = accounting['tasks']
+    in_table = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('Core t (s)') or stripped.startswith('Time:'):
+            break
+        if not in_table and stripped.startswith('On '):
+            layout.append(stripped)
+        elif stripped.startswith('Computing:'):
+            in_table = True
+        elif stripped.startswith('Breakdown of '):
+            tasks = accounting['breakdowns'].setdefault(stripped[len('Breakdown of '):], [])
+        elif in_table and stripped and not stripped.startswith(('-', 'Ranks', '(')) and 'Ranks Threads' not in stripped:
+            task = _parse_accounting_row(stripped)
+            if task is not None:
+                tasks.append(task)
+        elif layout and not in_table and stripped:
+            # Continuation of the rank layout sentence
+            layout.append(stripped)
+    accounting['layout'] = ' '.join(layout) or None
+    return accounting
+
+
+def _parse_accounting_row(row: str) -> Optional[dict]:
+    """ Row of an accounting table: task name, [ranks, threads, call count,] wall time (s), giga-cycles and %. """
+    tokens = row.split()
+    numbers: list[str] = []
+    while tokens and re.fullmatch(r"[\d.]+", tokens[-1]) and len(numbers) < 6:
+        numbers.insert(0, tokens.pop())
+    if len(numbers) < 3 or not tokens:
+        return None
+    counts = numbers[:-3]
+    # Rows without ranks and threads (eg: Rest, Total) only have the last three columns
+    ranks_threads_calls: list[Optional[int]] = [None, None, None]
+    if len(counts) == 3:
+        ranks_threads_calls = [int(float(value)) for value in counts]
+    else:
+        tokens.extend(counts)
+    wall, giga_cycles, percent = (float(value) for value in numbers[-3:])
+    ranks, threads, calls = ranks_threads_calls
+    return {'task': ' '.join(tokens), 'ranks': ranks, 'threads': threads, 'calls': calls,
+            'wall_s': wall, 'giga_cycles': giga_cycles, 'percent': percent}
+
+
+def performance_report_path(output_log_path: str) -> str:
+    """ Path of the JSON performance report written next to a GROMACS log file. """
+    log_path = Path(output_log_path)
+    return str(log_path.with_name(f"{log_path.stem}_performance.json"))
+
+
+def write_performance_report(output_log_path: str) -> dict:
+    """ Parses a GROMACS mdrun log and writes its performance report next to it (see :func:`performance_report_path`).
+    Returns the report, or an empty dict if the log file does not exist. """
+    if not output_log_path or not Path(output_log_path).exists():
+        return {}
+    report = read_mdrun_log(output_log_path)
+    with open(performance_report_path(output_log_path), 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    return report
@@ -1,19 +1,30 @@
 #!/usr/bin/env python3
 
 """Module containing the MDrun class and the command line interface."""
+import filecmp
+import shutil
 from typing import Optional
-from pathlib import PurePath
+from pathlib import Path, PurePath
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_gromacs.gromacs.common import get_gromacs_version
+from biobb_gromacs.gromacs.common import get_gromacs_build_info
+from biobb_gromacs.gromacs.common import check_mdrun_build
+from biobb_gromacs.gromacs.common import mdrun_performance_args
+from biobb_gromacs.gromacs.log_utils import performance_report_path, write_performance_report
+from biobb_gromacs.gromacs.cpt_utils import CptResume, find_resume_checkpoint, read_cpt_header
+from biobb_gromacs.gromacs.tpr_utils import read_tpr_cutoffs, read_tpr_header, read_tpr_run_control
+from biobb_gromacs.gromacs.tune_utils import (autotune_mdrun, available_cores, cpu_topology, host_cpu_signature, read_tuned_layout,
+                                              tuning_key, tuning_layouts, write_tuned_layout)
+from biobb_gromacs.gromacs.dd_utils import feasible_rank_counts, max_cutoff, plan_layout, plan_layouts
 
 
 class Mdrun(BiobbObject):
     """
     | biobb_gromacs Mdrun
     | Wrapper of the `GROMACS mdrun <http://manual.gromacs.org/current/onlinehelp/gmx-mdrun.html>`_ module.
-    | MDRun is the main computational chemistry engine within GROMACS. It performs Molecular Dynamics simulations, but it can also perform Stochastic Dynamics, Energy Minimization, test particle insertion or (re)calculation of energies.
+    | MDRun is the main computational chemistry engine within GROMACS. It performs Molecular Dynamics simulations, but it can also perform Stochastic Dynamics, Energy Minimization, test particle insertion or (re)calculation of energies. After the run, a JSON performance report parsed from the log file (ns/day, time accounting by task, load balance, final nstlist and rlist and hardware layout) is written next to it as <log name>_performance.json.
 
     Args:
         input_tpr_path (str): Path to the portable binary run input file TPR. File type: input. `Sample file <https://github.com/bioexcel/biobb_gromacs/raw/master/biobb_gromacs/test/data/gromacs/mdrun.tpr>`_. Accepted formats: tpr (edam:format_2333).
@@ -25,12 +36,14 @@ class Mdrun(BiobbObject):
         output_xtc_path (str) (Optional): Path to the GROMACS compressed trajectory file XTC. File type: output. Accepted formats: xtc (edam:format_3875).
         output_cpt_path (str) (Optional): Path to the output GROMACS checkpoint file CPT. File type: output. Accepted formats: cpt (edam:format_2333).
         output_dhdl_path (str) (Optional): Path to the output dhdl.xvg file only used when free energy calculation is turned on. File type: output. Accepted formats: xvg (edam:format_2033).
+        output_tng_path (str) (Optional): Path to the GROMACS compressed trajectory file TNG, written instead of the XTC file (only one compressed trajectory can be written). File type: output. Accepted formats: tng (edam:format_3876).
         properties (dict - Python dictionary object containing the tool parameters, not input/output files):
             * **mpi_bin** (*str*) - (None) Path to the MPI runner. Usually "mpirun" or "srun".
             * **mpi_np** (*int*) - (0) [0~1000|1] Number of MPI processes. Usually an integer bigger than 1.
             * **mpi_flags** (*str*) - (None) Path to the MPI hostlist file.
             * **checkpoint_time** (*int*) - (15) [0~1000|1] Checkpoint writing interval in minutes. Only enabled if an output_cpt_path is provided.
             * **noappend** (*bool*) - (False) Include the noappend flag to open new output files and add the simulation part number to all output file names
+            * **auto_resume** (*bool*) - (False) Continue the run from the latest valid checkpoint of the step: output_cpt_path, its _prev.cpt backup or the checkpoints left in the sandboxes of killed runs of the same step (with an identical input TPR). The output files recorded in the checkpoint are verified with their checksums: the run appends to them if they are intact and writes new part files (noappend) otherwise. Combined with maxh, a run stopped at the walltime continues when the step is submitted again, even with restart enabled. Requires output_cpt_path.
             * **num_threads** (*int*) - (0) [0~1000|1] Let GROMACS guess. The number of threads that are going to be used.
             * **num_threads_mpi** (*int*) - (0) [0~1000|1] Let GROMACS guess. The number of GROMACS MPI threads that are going to be used.
             * **num_threads_omp** (*int*) - (0) [0~1000|1] Let GROMACS guess. The number of GROMACS OPENMP threads that are going to be used.
@@ -38,6 +51,18 @@ class Mdrun(BiobbObject):
             * **use_gpu** (*bool*) - (False) Use settings appropriate for GPU. Adds: -nb gpu -pme gpu
             * **gpu_id** (*str*) - (None) list of unique GPU device IDs available to use.
             * **gpu_tasks** (*str*) - (None) list of GPU device IDs, mapping each PP task on each node to a device.
+            * **maxh** (*float*) - (0.0) [0~10000|0.01] Terminate the run and write a checkpoint at 99% of this number of hours, so it stops cleanly before the queue walltime. 0 runs all the steps.
+            * **dlb** (*str*) - ("auto") Dynamic load balancing of the domain decomposition cells. Values: auto (when the imbalance slows down the run), no (never), yes (always).
+            * **tunepme** (*bool*) - (True) Tune the PME grid and cut-off to balance the work between the PP and PME ranks or the GPU at the start of the run.
+            * **pin** (*str*) - ("auto") Pin the threads to the cores. Values: auto (only when mdrun uses all the cores of the node), on (always, needed to place several runs sharing a node), off (never).
+            * **pinoffset** (*int*) - (0) [0~1000|1] Logical core where the pinning of the threads starts, to keep them off the cores of other runs on the same node. Requires pin on.
+            * **pinstride** (*int*) - (0) [0~64|1] Distance between the logical cores of consecutive threads, eg: 2 to place one thread per physical core with 2 hardware threads per core. 0 selects it automatically. Requires pin on.
+            * **nstlist** (*int*) - (0) [0~1000|1] Neighbour list update interval overriding the one of the TPR (the Verlet buffer is adjusted to keep the accuracy). 0 lets mdrun choose.
+            * **resethway** (*bool*) - (False) Reset the performance counters halfway through the run, so the ns/day of the log excludes the setup and the load balancing.
+            * **autotune** (*bool*) - (False) Benchmark short runs splitting the cores in different numbers of thread-MPI ranks, OpenMP threads and separate PME ranks and run the simulation with the fastest layout. The best layout is cached by number of atoms, box, cut-offs, host CPU and GROMACS version, so similar systems skip the benchmark. Only for thread-MPI GROMACS builds without mpi_bin.
+            * **autotune_nsteps** (*int*) - (2000) [100~100000|100] Number of MD steps of each autotune trial. The timings of the first half of the steps are discarded.
+            * **autotune_cores** (*int*) - (0) [0~1000|1] Number of cores split by the autotune layouts. 0 uses all the cores available to the process.
+            * **plan_layout** (*bool*) - (False) Plan the parallel layout before the run from the number of atoms, box and cut-offs of the TPR and the cores available to the process (not splitting the hardware threads of a core). Given numbers of ranks (num_threads_mpi, or mpi_np with mpi_bin) are checked to allow a domain decomposition whose cells are not smaller than the cut-off, failing before the run otherwise. With mpi_bin the number of processes is never changed. Otherwise the thread-MPI ranks, OpenMP threads and separate PME ranks with the lowest communication cost are used, limited to num_threads hardware threads and num_threads_omp threads per rank if given. With use_gpu layouts of several ranks have a single PME rank.
             * **gmx_lib** (*str*) - (None) Path set GROMACS GMXLIB environment variable.
             * **binary_path** (*str*) - ("gmx") Path to the GROMACS executable binary.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
@@ -77,7 +102,8 @@ class Mdrun(BiobbObject):
     def __init__(self, input_tpr_path: str, output_gro_path: str, output_edr_path: str,
                  output_log_path: str, output_trr_path: Optional[str] = None, input_cpt_path: Optional[str] = None,
                  output_xtc_path: Optional[str] = None, output_cpt_path: Optional[str] = None,
-                 output_dhdl_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> None:
+                 output_dhdl_path: Optional[str] = None, output_tng_path: Optional[str] = None,
+                 properties: Optional[dict] = None, **kwargs) -> None:
         properties = properties or {}
 
         # Call parent class constructor
@@ -90,9 +116,13 @@ class Mdrun(BiobbObject):
             "out": {"output_trr_path": output_trr_path, "output_gro_path": output_gro_path,
                     "output_edr_path": output_edr_path, "output_log_path": output_log_path,
                     "output_xtc_path": output_xtc_path, "output_cpt_path": output_cpt_path,
-                    "output_dhdl_path": output_dhdl_path}
+                    "output_dhdl_path": output_dhdl_path, "output_tng_path": output_tng_path}
         }
 
+        # mdrun writes a single compressed trajectory, in XTC or TNG format
+        if output_xtc_path and output_tng_path:
+            raise ValueError("output_xtc_path and output_tng_path are mutually exclusive: mdrun writes a single compressed trajectory")
+
         # Properties specific for BB
         # general mpi properties
         self.mpi_bin = properties.get('mpi_bin')
@@ -109,9 +139,28 @@ class Mdrun(BiobbObject):
             'use_gpu', False)  # Adds: -nb gpu -pme gpu
         self.gpu_id = str(properties.get('gpu_id', ''))
         self.gpu_tasks = str(properties.get('gpu_tasks', ''))
+        # gromacs empirical tuning of the parallel layout
+        self.autotune = properties.get('autotune', False)
+        self.autotune_nsteps = int(properties.get('autotune_nsteps', 2000))
+        self.autotune_cores = int(properties.get('autotune_cores', 0))
+        # gromacs analytic planning of the parallel layout
+        self.plan_layout = properties.get('plan_layout', False)
+        self.num_pme_ranks = ''
+        # gromacs performance
+        self.maxh = properties.get('maxh', 0.0)
+        self.dlb = properties.get('dlb', 'auto')
+        self.tunepme = properties.get('tunepme', True)
+        self.pin = properties.get('pin', 'auto')
+        self.pinoffset = properties.get('pinoffset', 0)
+        self.pinstride = properties.get('pinstride', 0)
+        self.nstlist = properties.get('nstlist', 0)
+        self.resethway = properties.get('resethway', False)
         # gromacs
         self.checkpoint_time = properties.get('checkpoint_time')
         self.noappend = properties.get('noappend', False)
+        self.auto_resume = properties.get('auto_resume', False)
+        # Performance report parsed from the GROMACS log after the run
+        self.performance_report: dict = {}
 
         # Properties common in all GROMACS BB
         self.gmx_lib = properties.get('gmx_lib', None)
@@ -124,6 +173,16 @@ class Mdrun(BiobbObject):
             self.binary_path += ' -nocopyright'
         if (not self.mpi_bin) and (not self.container_path):
             self.gmx_version = get_gromacs_version(self.binary_path)
+        if not self.container_path:
+            # Fail before staging any file if the settings are not supported by the GROMACS build
+            self.gmx_build_info = get_gromacs_build_info(self.binary_path)
+            check_mdrun_build(self.gmx_build_info, mpi_bin=self.mpi_bin, mpi_np=self.mpi_np,
+                              num_threads_mpi=self.num_threads_mpi, num_threads_omp=self.num_threads_omp,
+                              num_threads_omp_pme=self.num_threads_omp_pme, use_gpu=self.use_gpu,
+                              gpu_id=self.gpu_id, gpu_tasks=self.gpu_tasks)
+
+        # Fail before staging any file if the performance settings are wrong
+        self.performance_args()
 
         # Check the properties
         self.check_properties(properties)
@@ -134,9 +193,23 @@ class Mdrun(BiobbObject):
         """Execute the :class:`Mdrun <gromacs.mdrun.Mdrun>` object."""
 
         # Setup Biobb
-        if self.check_restart():
+        # A step stopped by maxh has all its output files: resume it instead of skipping it
+        resume = self.find_resume_checkpoint() if self.auto_resume else None
+        if not resume and self.check_restart():
             return 0
 
+        if self.io_dict["in"].get("input_cpt_path"):
+            try:
+                checkpoint = read_cpt_header(self.io_dict["in"]["input_cpt_path"])
+                fu.log(f"Input checkpoint: step {checkpoint.step}, time {checkpoint.time:g} ps, simulation part {checkpoint.simulation_part}, "
+                       f"written by GROMACS {checkpoint.gromacs_version}", self.out_log, self.global_log)
+                natoms = read_tpr_header(self.io_dict["in"]["input_tpr_path"]).natoms
+            except (OSError, ValueError) as error:
+                fu.log(f"WARNING: The input checkpoint can not be checked against the input TPR: {error}", self.out_log, self.global_log)
+            else:
+                if checkpoint.natoms != natoms:
+                    raise ValueError(f"The input checkpoint has {checkpoint.natoms} atoms but the input TPR has {natoms} atoms")
+
         # Optional output files (if not added mrun will create them using a generic name)
         if not self.stage_io_dict["out"].get("output_trr_path"):
             self.stage_io_dict["out"]["output_trr_path"] = fu.create_name(
@@ -145,6 +218,14 @@ class Mdrun(BiobbObject):
 
         self.stage_files()
 
+        if resume:
+            self.stage_resume_checkpoint(resume)
+
+        if self.autotune:
+            self.autotune_layout()
+        elif self.plan_layout:
+            self.plan_dd_layout()
+
         if self.container_path:
             working_dir = self.container_volume_path if self.container_volume_path else "/data"
         else:
@@ -163,6 +244,9 @@ class Mdrun(BiobbObject):
         if self.stage_io_dict["out"].get("output_xtc_path"):
             self.cmd.append('-x')
             self.cmd.append(PurePath(self.stage_io_dict["out"]["output_xtc_path"]).name)
+        elif self.stage_io_dict["out"].get("output_tng_path"):
+            self.cmd.append('-x')
+            self.cmd.append(PurePath(self.stage_io_dict["out"]["output_tng_path"]).name)
         else:
             self.tmp_files.append('traj_comp.xtc')
         if self.stage_io_dict["out"].get("output_cpt_path"):
@@ -208,6 +292,9 @@ class Mdrun(BiobbObject):
                 f'User added number of gmx omp_pme threads: {self.num_threads_omp_pme}', self.out_log)
             self.cmd.append('-ntomp_pme')
             self.cmd.append(self.num_threads_omp_pme)
+        if self.num_pme_ranks:
+            self.cmd.append('-npme')
+            self.cmd.append(self.num_pme_ranks)
         # GMX gpu properties
         if self.use_gpu:
             fu.log('Adding GPU specific settings adds: -nb gpu -pme gpu', self.out_log)
@@ -226,6 +313,12 @@ class Mdrun(BiobbObject):
         if self.noappend:
             self.cmd.append('-noappend')
 
+        # GMX performance properties
+        performance_args = self.performance_args()
+        if performance_args:
+            fu.log(f'Adding mdrun performance settings: {" ".join(performance_args)}', self.out_log)
+            self.cmd += performance_args
+
         if self.gmx_lib:
             self.env_vars_dict['GMXLIB'] = self.gmx_lib
 
@@ -235,12 +328,200 @@ class Mdrun(BiobbObject):
         # Copy files to host
         self.copy_to_host()
 
+        # Performance report of the GROMACS log
+        self.performance_report = write_performance_report(self.io_dict["out"].get("output_log_path", ""))
+        if self.performance_report:
+            ns_per_day = self.performance_report["performance"]["ns_per_day"]
+            if ns_per_day is not None:
+                fu.log(f'Performance: {ns_per_day} ns/day', self.out_log, self.global_log)
+            fu.log(f'Performance report written to: {performance_report_path(self.io_dict["out"]["output_log_path"])}', self.out_log, self.global_log)
+
         # Remove temporal files
         self.remove_tmp_files()
 
         self.check_arguments(output_files_created=True, raise_exception=False)
         return self.return_code
 
+    def performance_args(self, maxh: bool = True, resethway: bool = True) -> list[str]:
+        """ Validated mdrun flags of the performance properties. """
+        return mdrun_performance_args(maxh=self.maxh if maxh else 0, dlb=self.dlb, tunepme=self.tunepme, pin=self.pin, pinoffset=self.pinoffset,
+                                      pinstride=self.pinstride, nstlist=self.nstlist, resethway=self.resethway and resethway)
+
+    def autotune_layout(self) -> None:
+        """
+        Sets the number of thread-MPI ranks, OpenMP threads and separate PME ranks of the run
+        to the fastest layout of short benchmark runs of the staged TPR, or to the cached
+        layout of a similar system run on the same host.
+        """
+        if self.container_path or self.mpi_bin or (self.gmx_build_info and not self.gmx_build_info.thread_mpi):
+            fu.log('Autotune requires a thread-MPI GROMACS build run without container or mpi_bin, using the given layout', self.out_log, self.global_log)
+            return
+        input_tpr_path = self.stage_io_dict["in"]["input_tpr_path"]
+        header = read_tpr_header(input_tpr_path)
+        try:
+            cutoffs = read_tpr_cutoffs(input_tpr_path, self.binary_path)
+        except (OSError, ValueError) as error:
+            fu.log(f'Autotune disabled: {error}', self.out_log, self.global_log)
+            return
+        ncores = self.autotune_cores or available_cores()
+        mdrun_args = ["-nb", "gpu", "-pme", "gpu"] if self.use_gpu else []
+        if self.gpu_id:
+            mdrun_args += ['-gpu_id', self.gpu_id]
+        # The trials reset the timers halfway and are too short to hit maxh
+        mdrun_args += self.performance_args(maxh=False, resethway=False)
+        key = tuning_key(header.natoms, header.box, cutoffs, ncores, host_cpu_signature(),
+                         self.gmx_build_info.version if self.gmx_build_info else '', mdrun_args)
+
+        layout = read_tuned_layout(key)
+        if layout:
+            fu.log(f'Autotune: using the cached layout {layout.ntmpi} ranks x {layout.ntomp} threads, {layout.npme} PME ranks', self.out_log, self.global_log)
+        else:
+            layouts = tuning_layouts(ncores, gpu_pme=self.use_gpu)
+            # Do not benchmark layouts without a possible domain decomposition
+            cutoff = max_cutoff(cutoffs)
+            feasible = [layout for layout in layouts if header.box is None or plan_layout(layout.ntmpi, layout.ntomp, header.box, cutoff, npme=layout.npme)]
+            if len(feasible) < len(layouts):
+                fu.log(f'Autotune: skipping {len(layouts) - len(feasible)} layouts with domain decomposition cells smaller than the {cutoff} nm cut-off', self.out_log)
+                layouts = feasible or layouts
+            fu.log(f'Autotune: benchmarking {len(layouts)} layouts of {ncores} cores with {self.autotune_nsteps} steps', self.out_log, self.global_log)
+            trials_dir = str(Path(str(self.stage_io_dict.get("unique_dir", ""))).joinpath('autotune'))
+            self.tmp_files.append(trials_dir)
+            best, trials = autotune_mdrun(input_tpr_path, layouts, trials_dir, self.autotune_nsteps, self.binary_path, mdrun_args)
+            for trial in trials:
+                result = f'{trial.ns_per_day} ns/day' if trial.ns_per_day is not None else f'failed: {trial.error}'
+                fu.log(f'Autotune: {trial.layout.ntmpi} ranks x {trial.layout.ntomp} threads, {trial.layout.npme} PME ranks: {result}', self.out_log)
+            if not best:
+                fu.log('Autotune: every trial failed, using the given layout', self.out_log, self.global_log)
+                return
+            layout = best.layout
+            write_tuned_layout(key, layout, best.ns_per_day or 0.0, {'natoms': header.natoms, 'ncores': ncores, 'cutoffs': cutoffs})
+            fu.log(f'Autotune: fastest layout {layout.ntmpi} ranks x {layout.ntomp} threads, {layout.npme} PME ranks ({best.ns_per_day} ns/day)', self.out_log, self.global_log)
+
+        self.num_threads = ''
+        self.num_threads_mpi, self.num_threads_omp, self.num_pme_ranks = str(layout.ntmpi), str(layout.ntomp), str(layout.npme)
+
+    def plan_dd_layout(self) -> None:
+        """
+        Checks that the given number of ranks allows a domain decomposition of the staged TPR,
+        or sets the ranks, OpenMP threads and separate PME ranks of the best planned layout
+        of the cores available to the process.
+        """
+        if self.container_path:
+            fu.log('The layout planner is not available for containers, using the given layout', self.out_log, self.global_log)
+            return
+        input_tpr_path = self.stage_io_dict["in"]["input_tpr_path"]
+        header = read_tpr_header(input_tpr_path)
+        try:
+            cutoff = max_cutoff(read_tpr_cutoffs(input_tpr_path, self.binary_path))
+        except (OSError, ValueError) as error:
+            fu.log(f'Layout planner disabled: {error}', self.out_log, self.global_log)
+            return
+        if header.box is None:
+            fu.log('Layout planner disabled: the TPR has no box', self.out_log, self.global_log)
+            return
+
+        # With mpi_bin the launcher owns the number of processes: it is only checked
+        if self.mpi_bin or int(self.num_threads_mpi or 0):
+            ranks = int(self.mpi_np or 0) if self.mpi_bin else int(self.num_threads_mpi)
+            if not ranks:
+                fu.log('Layout planner: the number of MPI processes is set by the mpi_bin launcher and can not be checked', self.out_log, self.global_log)
+                return
+            plan = plan_layout(ranks, int(self.num_threads_omp or 1), header.box, cutoff, gpu_pme=self.use_gpu)
+            if not plan:
+                feasible = feasible_rank_counts(header.box, cutoff, max(ranks, 2 * available_cores()), gpu_pme=self.use_gpu)
+                raise ValueError(f"No domain decomposition of {ranks} ranks is possible: the cells would be smaller than the {cutoff} nm cut-off "
+                                 f"(box {', '.join(f'{length:.3f}' for length in header.box.diagonal())} nm). "
+                                 f"Feasible numbers of ranks: {', '.join(map(str, feasible[-20:]))}")
+            fu.log(f'Layout planner: {ranks} ranks, {plan.npme} PME ranks, domain decomposition grid {plan.grid[0]}x{plan.grid[1]}x{plan.grid[2]}', self.out_log, self.global_log)
+            if self.use_gpu and plan.npme:
+                # mdrun -pme gpu with several ranks requires -npme 1
+                self.num_pme_ranks = str(plan.npme)
+            return
+
+        topology = cpu_topology()
+        ncores, threads_per_core = topology.ncores, topology.threads_per_core
+        num_threads = int(self.num_threads or 0)
+        if num_threads:
+            if num_threads > ncores * threads_per_core:
+                raise ValueError(f"num_threads ({num_threads}) is larger than the {ncores * threads_per_core} hardware threads available to the process")
+            # Keep the hardware threads of a core together when the number of threads allows it
+            if num_threads % threads_per_core:
+                ncores, threads_per_core = num_threads, 1
+            else:
+                ncores = num_threads // threads_per_core
+        plans = plan_layouts(ncores, header.box, cutoff, threads_per_core, gpu_pme=self.use_gpu)
+        if self.gmx_build_info and not self.gmx_build_info.thread_mpi:
+            # A single rank of library MPI builds run without mpi_bin
+            plans = [plan for plan in plans if plan.ranks == 1]
+        if int(self.num_threads_omp or 0):
+            plans = [plan for plan in plans if plan.ntomp == int(self.num_threads_omp)]
+        if not plans:
+            fu.log('Layout planner: no feasible layout found, using the given layout', self.out_log, self.global_log)
+            return
+        plan = plans[0]
+        fu.log(f'Layout planner: {plan.ranks} ranks x {plan.ntomp} threads, {plan.npme} PME ranks, domain decomposition grid '
+               f'{plan.grid[0]}x{plan.grid[1]}x{plan.grid[2]} of {ncores} cores with {threads_per_core} hardware threads', self.out_log, self.global_log)
+        self.num_threads = ''
+        self.num_threads_mpi, self.num_threads_omp = str(plan.ranks), str(plan.ntomp)
+        self.num_pme_ranks = str(plan.npme) if plan.ranks > 1 else ''
+
+    def find_resume_checkpoint(self) -> Optional[CptResume]:
+        """
+        Finds the latest valid checkpoint of the step, if the run it belongs to has not
+        reached the last step of the TPR.
+        """
+        output_cpt_path = self.io_dict["out"].get("output_cpt_path")
+        if self.container_path or not output_cpt_path:
+            fu.log('Auto resume requires an output_cpt_path and no container, starting from the input files', self.out_log, self.global_log)
+            return None
+        cpt_path = Path(output_cpt_path)
+        prev_name = f"{cpt_path.stem}_prev{cpt_path.suffix}"
+        cpt_paths = [cpt_path, cpt_path.with_name(prev_name)]
+        input_tpr_path = self.io_dict["in"]["input_tpr_path"]
+        # Checkpoints left in the sandboxes of runs of this step killed before copying their outputs: the
+        # sandbox is shared by every step, only the ones with the same input TPR staged belong to this step
+        for name in (cpt_path.name, prev_name):
+            for sandbox_cpt_path in sorted(Path(str(self.sandbox_path)).glob(f"sandbox_*/{name}")):
+                staged_tpr_path = sandbox_cpt_path.with_name(Path(input_tpr_path).name)
+                if staged_tpr_path.is_file() and filecmp.cmp(staged_tpr_path, input_tpr_path, shallow=False):
+                    cpt_paths.append(sandbox_cpt_path)
+        if self.io_dict["in"].get("input_cpt_path"):
+            cpt_paths.append(Path(self.io_dict["in"]["input_cpt_path"]))
+        output_dirs = list(dict.fromkeys(str(Path(path).parent) for path in self.io_dict["out"].values() if path))
+        resume = find_resume_checkpoint([str(path) for path in cpt_paths], read_tpr_header(input_tpr_path).natoms, output_dirs,
+                                        required_files=[Path(self.io_dict["out"]["output_log_path"]).name])
+        if not resume:
+            fu.log('Auto resume: no valid checkpoint found, starting from the input files', self.out_log, self.global_log)
+            return None
+        try:
+            run_control = read_tpr_run_control(input_tpr_path, self.binary_path)
+            if 0 <= run_control['nsteps'] and run_control['init_step'] + run_control['nsteps'] <= resume.header.step:
+                fu.log(f'Auto resume: the checkpoint {resume.cpt_path} is at the last step ({resume.header.step}), the run is complete', self.out_log, self.global_log)
+                return None
+        except (OSError, ValueError) as error:
+            fu.log(f'Auto resume: the last step of the run is unknown ({error})', self.out_log)
+        return resume
+
+    def stage_resume_checkpoint(self, resume: CptResume) -> None:
+        """
+        Copies the checkpoint to resume from (and its output files, to append to them)
+        to the sandbox and sets the -cpi and -noappend flags of the run.
+        """
+        unique_dir = Path(str(self.stage_io_dict["unique_dir"]))
+        staged_cpt_path = unique_dir.joinpath(f"resume_{Path(resume.cpt_path).name}")
+        shutil.copy2(resume.cpt_path, staged_cpt_path)
+        self.tmp_files.append(str(staged_cpt_path))
+        self.stage_io_dict["in"]["input_cpt_path"] = str(staged_cpt_path)
+        if resume.append:
+            for filename, output_path in resume.output_paths.items():
+                staged_path = unique_dir.joinpath(Path(filename).name)
+                if Path(output_path).resolve() != staged_path.resolve():
+                    shutil.copy2(output_path, staged_path)
+        self.noappend = self.noappend or not resume.append
+        mode = 'appending to its output files' if not self.noappend else 'in new output files' if resume.append else f"in new output files, not intact: {', '.join(resume.missing_files)}"
+        fu.log(f'Auto resume: continuing from {resume.cpt_path} (step {resume.header.step}, time {resume.header.time:g} ps, '
+               f'simulation part {resume.header.simulation_part}) {mode}', self.out_log, self.global_log)
+
     def copy_to_host(self):
         """
         Updates the path to the original output files in the sandbox,
@@ -298,7 +579,8 @@ class Mdrun(BiobbObject):
 def mdrun(input_tpr_path: str, output_gro_path: str, output_edr_path: str,
           output_log_path: str, output_trr_path: Optional[str] = None, input_cpt_path: Optional[str] = None,
           output_xtc_path: Optional[str] = None, output_cpt_path: Optional[str] = None,
-          output_dhdl_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> int:
+          output_dhdl_path: Optional[str] = None, output_tng_path: Optional[str] = None,
+          properties: Optional[dict] = None, **kwargs) -> int:
     """Create :class:`Mdrun <gromacs.mdrun.Mdrun>` class and
     execute the :meth:`launch() <gromacs.mdrun.Mdrun.launch>` method."""
     return Mdrun(**dict(locals())).launch()
@@ -9,13 +9,17 @@ from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_gromacs.gromacs.common import get_gromacs_version
+from biobb_gromacs.gromacs.common import get_gromacs_build_info
+from biobb_gromacs.gromacs.common import check_mdrun_build
+from biobb_gromacs.gromacs.common import mdrun_performance_args
+from biobb_gromacs.gromacs.log_utils import performance_report_path, write_performance_report
 
 
 class MdrunPlumed(BiobbObject):
     """
     | biobb_gromacs MdrunPlumed
     | Wrapper of the `GROMACS mdrun <http://manual.gromacs.org/current/onlinehelp/gmx-mdrun.html>`_ module.
-    | MDRun is the main computational chemistry engine within GROMACS. It performs Molecular Dynamics simulations, but it can also perform Stochastic Dynamics, Energy Minimization, test particle insertion or (re)calculation of energies.
+    | MDRun is the main computational chemistry engine within GROMACS. It performs Molecular Dynamics simulations, but it can also perform Stochastic Dynamics, Energy Minimization, test particle insertion or (re)calculation of energies. After the run, a JSON performance report parsed from the log file (ns/day, time accounting by task, load balance, final nstlist and rlist and hardware layout) is written next to it as <log name>_performance.json.
 
     Args:
         input_tpr_path (str): Path to the portable binary run input file TPR. File type: input. `Sample file <https://github.com/bioexcel/biobb_gromacs/raw/master/biobb_gromacs/test/data/gromacs/mdrun.tpr>`_. Accepted formats: tpr (edam:format_2333).
@@ -30,6 +34,7 @@ class MdrunPlumed(BiobbObject):
         input_plumed_path (str) (Optional): Path to the main PLUMED input file. If provided, PLUMED will be used during the simulation. All files used by the main PLUMED input file must exist in the input_plumed_folder and be called with just their name. Make sure to provide a GROMACS version with the PLUMED patch. File type: input. Accepted formats: dat (edam:format_2330).
         input_plumed_folder (dir) (Optional): Path to the folder with all files needed by the main PLUMED input file, see input_plumed_path. File type: input. Accepted formats: directory (edam:format_1915)
         output_plumed_folder (dir) (Optional): Folder where PLUMED generated output files will be saved. File type: output. Accepted formats: directory (edam:format_1915)
+        output_tng_path (str) (Optional): Path to the GROMACS compressed trajectory file TNG, written instead of the XTC file (only one compressed trajectory can be written). File type: output. Accepted formats: tng (edam:format_3876).
         properties (dict - Python dictionary object containing the tool parameters, not input/output files):
             * **mpi_bin** (*str*) - (None) Path to the MPI runner. Usually "mpirun" or "srun".
             * **mpi_np** (*int*) - (0) [0~1000|1] Number of MPI processes. Usually an integer bigger than 1.
@@ -43,6 +48,14 @@ class MdrunPlumed(BiobbObject):
             * **use_gpu** (*bool*) - (False) Use settings appropriate for GPU. Adds: -nb gpu -pme gpu
             * **gpu_id** (*str*) - (None) list of unique GPU device IDs available to use.
             * **gpu_tasks** (*str*) - (None) list of GPU device IDs, mapping each PP task on each node to a device.
+            * **maxh** (*float*) - (0.0) [0~10000|0.01] Terminate the run and write a checkpoint at 99% of this number of hours, so it stops cleanly before the queue walltime. 0 runs all the steps.
+            * **dlb** (*str*) - ("auto") Dynamic load balancing of the domain decomposition cells. Values: auto (when the imbalance slows down the run), no (never), yes (always).
+            * **tunepme** (*bool*) - (True) Tune the PME grid and cut-off to balance the work between the PP and PME ranks or the GPU at the start of the run.
+            * **pin** (*str*) - ("auto") Pin the threads to the cores. Values: auto (only when mdrun uses all the cores of the node), on (always, needed to place several runs sharing a node), off (never).
+            * **pinoffset** (*int*) - (0) [0~1000|1] Logical core where the pinning of the threads starts, to keep them off the cores of other runs on the same node. Requires pin on.
+            * **pinstride** (*int*) - (0) [0~64|1] Distance between the logical cores of consecutive threads, eg: 2 to place one thread per physical core with 2 hardware threads per core. 0 selects it automatically. Requires pin on.
+            * **nstlist** (*int*) - (0) [0~1000|1] Neighbour list update interval overriding the one of the TPR (the Verlet buffer is adjusted to keep the accuracy). 0 lets mdrun choose.
+            * **resethway** (*bool*) - (False) Reset the performance counters halfway through the run, so the ns/day of the log excludes the setup and the load balancing.
             * **gmx_lib** (*str*) - (None) Path set GROMACS GMXLIB environment variable.
             * **binary_path** (*str*) - ("gmx") Path to the GROMACS executable binary.
             * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
@@ -84,7 +97,7 @@ class MdrunPlumed(BiobbObject):
                  output_xtc_path: Optional[str] = None, output_cpt_path: Optional[str] = None,
                  output_dhdl_path: Optional[str] = None, input_plumed_path: Optional[str] = None,
                  input_plumed_folder: Optional[str] = None, output_plumed_folder: Optional[str] = None,
-                 properties: Optional[dict] = None, **kwargs) -> None:
+                 output_tng_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> None:
         properties = properties or {}
 
         # Call parent class constructor
@@ -98,9 +111,14 @@ class MdrunPlumed(BiobbObject):
             "out": {"output_trr_path": output_trr_path, "output_gro_path": output_gro_path,
                     "output_edr_path": output_edr_path, "output_log_path": output_log_path,
                     "output_xtc_path": output_xtc_path, "output_cpt_path": output_cpt_path,
-                    "output_dhdl_path": output_dhdl_path, "output_plumed_folder": output_plumed_folder}
+                    "output_dhdl_path": output_dhdl_path, "output_plumed_folder": output_plumed_folder,
+                    "output_tng_path": output_tng_path}
         }
 
+        # mdrun writes a single compressed trajectory, in XTC or TNG format
+        if output_xtc_path and output_tng_path:
+            raise ValueError("output_xtc_path and output_tng_path are mutually exclusive: mdrun writes a single compressed trajectory")
+
         # Properties specific for BB
         # general mpi properties
         self.mpi_bin = properties.get('mpi_bin')
@@ -117,9 +135,20 @@ class MdrunPlumed(BiobbObject):
             'use_gpu', False)  # Adds: -nb gpu -pme gpu
         self.gpu_id = str(properties.get('gpu_id', ''))
         self.gpu_tasks = str(properties.get('gpu_tasks', ''))
+        # gromacs performance
+        self.maxh = properties.get('maxh', 0.0)
+        self.dlb = properties.get('dlb', 'auto')
+        self.tunepme = properties.get('tunepme', True)
+        self.pin = properties.get('pin', 'auto')
+        self.pinoffset = properties.get('pinoffset', 0)
+        self.pinstride = properties.get('pinstride', 0)
+        self.nstlist = properties.get('nstlist', 0)
+        self.resethway = properties.get('resethway', False)
         # gromacs
         self.checkpoint_time = properties.get('checkpoint_time')
         self.noappend = properties.get('noappend', False)
+        # Performance report parsed from the GROMACS log after the run
+        self.performance_report: dict = {}
 
         # Properties common in all GROMACS BB
         self.gmx_lib = properties.get('gmx_lib', None)
@@ -132,6 +161,16 @@ class MdrunPlumed(BiobbObject):
             self.binary_path += ' -nocopyright'
         if (not self.mpi_bin) and (not self.container_path):
             self.gmx_version = get_gromacs_version(self.binary_path)
+        if not self.container_path:
+            # Fail before staging any file if the settings are not supported by the GROMACS build
+            self.gmx_build_info = get_gromacs_build_info(self.binary_path)
+            check_mdrun_build(self.gmx_build_info, mpi_bin=self.mpi_bin, mpi_np=self.mpi_np,
+                              num_threads_mpi=self.num_threads_mpi, num_threads_omp=self.num_threads_omp,
+                              num_threads_omp_pme=self.num_threads_omp_pme, use_gpu=self.use_gpu,
+                              gpu_id=self.gpu_id, gpu_tasks=self.gpu_tasks)
+
+        # Fail before staging any file if the performance settings are wrong
+        self.performance_args()
 
         # Check the properties
         self.check_properties(properties)
@@ -175,6 +214,9 @@ class MdrunPlumed(BiobbObject):
         if self.stage_io_dict["out"].get("output_xtc_path"):
             self.cmd.append('-x')
             self.cmd.append(PurePath(self.stage_io_dict["out"]["output_xtc_path"]).name)
+        elif self.stage_io_dict["out"].get("output_tng_path"):
+            self.cmd.append('-x')
+            self.cmd.append(PurePath(self.stage_io_dict["out"]["output_tng_path"]).name)
         else:
             self.tmp_files.append('traj_comp.xtc')
         if self.stage_io_dict["out"].get("output_cpt_path"):
@@ -238,6 +280,12 @@ class MdrunPlumed(BiobbObject):
         if self.noappend:
             self.cmd.append('-noappend')
 
+        # GMX performance properties
+        performance_args = self.performance_args()
+        if performance_args:
+            fu.log(f'Adding mdrun performance settings: {" ".join(performance_args)}', self.out_log)
+            self.cmd += performance_args
+
         if self.gmx_lib:
             self.env_vars_dict['GMXLIB'] = self.gmx_lib
 
@@ -247,12 +295,25 @@ class MdrunPlumed(BiobbObject):
         # Copy files to host
         self.copy_to_host()
 
+        # Performance report of the GROMACS log
+        self.performance_report = write_performance_report(self.io_dict["out"].get("output_log_path", ""))
+        if self.performance_report:
+            ns_per_day = self.performance_report["performance"]["ns_per_day"]
+            if ns_per_day is not None:
+                fu.log(f'Performance: {ns_per_day} ns/day', self.out_log, self.global_log)
+            fu.log(f'Performance report written to: {performance_report_path(self.io_dict["out"]["output_log_path"])}', self.out_log, self.global_log)
+
         # Remove temporal files
         self.remove_tmp_files()
 
         self.check_arguments(output_files_created=True, raise_exception=False)
         return self.return_code
 
+    def performance_args(self, maxh: bool = True, resethway: bool = True) -> list[str]:
+        """ Validated mdrun flags of the performance properties. """
+        return mdrun_performance_args(maxh=self.maxh if maxh else 0, dlb=self.dlb, tunepme=self.tunepme, pin=self.pin, pinoffset=self.pinoffset,
+                                      pinstride=self.pinstride, nstlist=self.nstlist, resethway=self.resethway and resethway)
+
     def stage_files(self):
         """
         Stage the input/output files in a temporal unique directory aka sandbox.
@@ -361,7 +422,7 @@ def mdrun_plumed(input_tpr_path: str, output_gro_path: str, output_edr_path: str
                  output_xtc_path: Optional[str] = None, output_cpt_path: Optional[str] = None,
                  output_dhdl_path: Optional[str] = None, input_plumed_path: Optional[str] = None,
                  input_plumed_folder: Optional[str] = None, output_plumed_folder: Optional[str] = None,
-                 properties: Optional[dict] = None, **kwargs) -> int:
+                 output_tng_path: Optional[str] = None, properties: Optional[dict] = None, **kwargs) -> int:
     """Create :class:`MdrunPlumed <gromacs.mdrun_plumed.MdrunPlumed>` class and
     execute the :meth:`launch() <gromacs.mdrun_plumed.MdrunPlumed.launch>` method."""
     return MdrunPlumed(**dict(locals())).launch()
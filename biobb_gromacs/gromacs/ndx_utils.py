@@ -0,0 +1,227 @@
+""" NumPy model of the GROMACS index file format NDX """
+import re
+import warnings
+from collections.abc import MutableMapping
+from typing import Iterator, Mapping, Optional, Union
+import numpy as np
+from numpy.typing import ArrayLike
+from biobb_gromacs.gromacs.gro_utils import _format_int
+
+
+NDX_ATOMS_PER_LINE = 15
+NDX_ATOM_WIDTH = 4
+# Groups with at least this number of atoms are stored as runs of consecutive atoms when it saves memory
+NDX_RLE_MIN_ATOMS = 1024
+# Group headers are the only text with brackets, searching for the bracket is much faster than anchoring to the lines
+_GROUP_HEADER_RE = re.compile(r"\[[ \t]*([^\]\n]*?)[ \t]*\]")
+
+
+class NdxGroup:
+    """ Atoms of an index group: 1-based atom numbers in the order of the file. Large groups made of long runs
+    of consecutive atoms (eg: System, Protein, SOL) are stored run-length encoded as (start, length) pairs and
+    only expanded when the atoms are requested. Set operations return sorted groups without duplicates.
+
+    Args:
+        atoms (ArrayLike): 1-based atom numbers.
+    """
+
+    def __init__(self, atoms: ArrayLike = ()) -> None:
+        atoms = np.asarray(atoms, dtype=np.int32).ravel()
+        self._atoms: Optional[np.ndarray] = atoms
+        self._starts: Optional[np.ndarray] = None
+        self._lengths: Optional[np.ndarray] = None
+        if len(atoms) >= NDX_RLE_MIN_ATOMS:
+            breaks = np.flatnonzero(np.diff(atoms) != 1) + 1
+            # Each run takes two numbers
+            if 2 * (len(breaks) + 1) < len(atoms):
+                bounds = np.concatenate(([0], breaks, [len(atoms)]))
+                self._starts, self._lengths = atoms[bounds[:-1]], np.diff(bounds).astype(np.int32)
+                self._atoms = None
+
+    @classmethod
+    def from_runs(cls, starts: ArrayLike, lengths: ArrayLike) -> "NdxGroup":
+        """ Group made of runs of consecutive atoms. """
+        group = cls()
+        group._atoms, group._starts, group._lengths = None, np.asarray(starts, dtype=np.int32), np.asarray(lengths, dtype=np.int32)
+        return group
+
+    @property
+    def is_run_length_encoded(self) -> bool:
+        return self._atoms is None
+
+    @property
+    def atoms(self) -> np.ndarray:
+        """ 1-based atom numbers as an int32 array (expanded on every call for run-length encoded groups). """
+        if self._atoms is not None:
+            return self._atoms
+        assert self._starts is not None and self._lengths is not None
+        if not len(self._starts):
+            return np.empty(0, dtype=np.int32)
+        # Every atom is the previous one plus one, except the first atom of each run
+        steps = np.ones(int(self._lengths.sum()), dtype=np.int32)
+        run_heads = np.concatenate(([0], np.cumsum(self._lengths[:-1])))
+        steps[run_heads] = self._starts - np.concatenate(([0], self._starts[:-1] + self._lengths[:-1] - 1))
+        return np.cumsum(steps, dtype=np.int32)
+
+    @property
+    def indices(self) -> np.ndarray:
+        """ 0-based atom indices. """
+        return self.atoms.astype(np.int64) - 1
+
+    @property
+    def runs(self) -> tuple[np.ndarray, np.ndarray]:
+        """ Starts and lengths of the runs of consecutive atoms. """
+        if self._starts is not None and self._lengths is not None:
+            return self._starts, self._lengths
+        return NdxGroup._compute_runs(self.atoms)
+
+    @staticmethod
+    def _compute_runs(atoms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(atoms) != 1) + 1, [len(atoms)])) if len(atoms) else np.zeros(1, dtype=np.int64)
+        return atoms[bounds[:-1]], np.diff(bounds).astype(np.int32)
+
+    def __len__(self) -> int:
+        return int(self._lengths.sum()) if self._lengths is not None else len(self._atoms) if self._atoms is not None else 0
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, NdxGroup):
+            return NotImplemented
+        return len(self) == len(other) and bool(np.array_equal(self.atoms, other.atoms))
+
+    def __repr__(self) -> str:
+        return f"NdxGroup({len(self)} atoms{', run-length encoded' if self.is_run_length_encoded else ''})"
+
+    def union(self, other: Union["NdxGroup", ArrayLike]) -> "NdxGroup":
+        return NdxGroup(np.union1d(self.atoms, _atoms(other)))
+
+    def intersection(self, other: Union["NdxGroup", ArrayLike]) -> "NdxGroup":
+        return NdxGroup(np.intersect1d(self.atoms, _atoms(other)))
+
+    def difference(self, other: Union["NdxGroup", ArrayLike]) -> "NdxGroup":
+        return NdxGroup(np.setdiff1d(self.atoms, _atoms(other)))
+
+    def renumber(self, mapping: ArrayLike) -> "NdxGroup":
+        """ Renumbers the atoms with an array of the new 1-based number of every old atom (mapping[old - 1]).
+        Atoms mapped to 0 (eg: removed atoms) are dropped. """
+        new_atoms = np.asarray(mapping, dtype=np.int32)[self.indices]
+        return NdxGroup(new_atoms[new_atoms > 0])
+
+    def positions(self, atoms: Union["NdxGroup", ArrayLike]) -> np.ndarray:
+        """ 1-based positions in this group of the given atoms (eg: the molecule-local numbers of atoms of the
+        system when this group contains all the atoms of the molecule). Raises ValueError if an atom is missing. """
+        atoms = _atoms(atoms)
+        own = self.atoms
+        order = np.argsort(own, kind='stable')
+        found = np.searchsorted(own, atoms, sorter=order)
+        found = np.minimum(found, len(own) - 1) if len(own) else found
+        missing = ~np.isin(atoms, own)
+        if missing.any():
+            raise ValueError(f"Atoms {atoms[missing][:10].tolist()} are not in the group")
+        return order[found].astype(np.int64) + 1
+
+
+def _atoms(group: Union[NdxGroup, ArrayLike]) -> np.ndarray:
+    return group.atoms if isinstance(group, NdxGroup) else np.asarray(group, dtype=np.int32).ravel()
+
+
+class Ndx(MutableMapping):
+    """ Ordered model of the groups of a GROMACS NDX index file. Group names are unique: when a file defines
+    the same name twice the first group is kept, as GROMACS tools select groups by the first matching name.
+
+    Args:
+        groups (Mapping): (None) Initial groups as name: NdxGroup or array of 1-based atom numbers.
+    """
+
+    def __init__(self, groups: Optional[Mapping] = None) -> None:
+        self._groups: dict[str, NdxGroup] = {}
+        if groups:
+            self.update(groups)
+
+    @classmethod
+    def from_file(cls, input_ndx_path: str) -> "Ndx":
+        return read_ndx(input_ndx_path)
+
+    def __setitem__(self, name: str, group: Union[NdxGroup, ArrayLike]) -> None:
+        self._groups[str(name).strip()] = group if isinstance(group, NdxGroup) else NdxGroup(group)
+
+    def __getitem__(self, name: str) -> NdxGroup:
+        return self._groups[str(name).strip()]
+
+    def __delitem__(self, name: str) -> None:
+        del self._groups[str(name).strip()]
+
+    def __contains__(self, name) -> bool:
+        return str(name).strip() in self._groups
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._groups)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Ndx):
+            return NotImplemented
+        return list(self._groups) == list(other._groups) and all(group == other[name] for name, group in self._groups.items())
+
+    def __repr__(self) -> str:
+        return f"Ndx({', '.join(f'{name!r}: {len(group)}' for name, group in self._groups.items())})"
+
+    def names(self) -> list[str]:
+        return list(self._groups)
+
+    def write(self, output_ndx_path: str) -> str:
+        return write_ndx(output_ndx_path, self)
+
+
+def read_ndx(input_ndx_path: str) -> Ndx:
+    """ Reads an NDX file. The atom numbers of every group are parsed at once by NumPy. """
+    with open(input_ndx_path) as ndx_file:
+        return parse_ndx(ndx_file.read(), input_ndx_path)
+
+
+def parse_ndx(ndx_content: str, source: str = 'NDX content') -> Ndx:
+    """ Parses the content of an NDX file (the atoms before the first group header are ignored). """
+    ndx = Ndx()
+    # Split in: preamble, name, atoms, name, atoms...
+    sections = _GROUP_HEADER_RE.split(ndx_content)
+    for name, body in zip(sections[1::2], sections[2::2]):
+        if name in ndx:
+            continue
+        with warnings.catch_warnings():
+            # NumPy only warns when it can not parse the whole text
+            warnings.simplefilter('error', DeprecationWarning)
+            try:
+                atoms = np.fromstring(body, dtype=np.int32, sep=' ') if body and not body.isspace() else np.empty(0, dtype=np.int32)
+            except (DeprecationWarning, ValueError):
+                # NumPy 2 raises ValueError instead of the warning
+                raise ValueError(f"Wrong atom number in group {name} of {source}")
+        ndx[name] = NdxGroup(atoms)
+    return ndx
+
+
+def write_ndx(output_ndx_path: str, groups: Union[Ndx, Mapping]) -> str:
+    """ Writes an NDX file in the format of the GROMACS tools: atom numbers right aligned in 4 columns (wider if they do
+    not fit), separated by a space and 15 per line. Every group is formatted at once as a byte matrix. Returns the output path. """
+    with open(output_ndx_path, 'wb') as ndx_file:
+        for name, group in groups.items():
+            ndx_file.write(f"[ {name} ]\n".encode())
+            atoms = _atoms(group)
+            if len(atoms):
+                ndx_file.write(_format_atoms(atoms))
+    return output_ndx_path
+
+
+def _format_atoms(atoms: np.ndarray) -> bytes:
+    width = max(NDX_ATOM_WIDTH, len(str(int(atoms.max()))))
+    matrix = np.empty((len(atoms), width + 1), dtype=np.uint8)
+    matrix[:, :width] = _format_int(atoms, width)
+    matrix[:, width] = ord(' ')
+    matrix[NDX_ATOMS_PER_LINE - 1::NDX_ATOMS_PER_LINE, width] = ord('\n')
+    matrix[-1, width] = ord('\n')
+    # Every number takes its own width (at least 4 characters): drop the extra padding of the narrower ones
+    atom_widths = np.full(len(atoms), NDX_ATOM_WIDTH)
+    for digits in range(NDX_ATOM_WIDTH, width):
+        atom_widths += atoms >= 10 ** digits
+    keep = np.arange(width + 1) >= (width - atom_widths)[:, None]
+    return matrix[keep].tobytes()
@@ -0,0 +1,198 @@
+""" Packer of concurrent mdrun runs on disjoint, NUMA aware slices of the cores of a node """
+import multiprocessing
+import os
+import sys
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Any, NamedTuple, Optional, Sequence
+
+
+SYS_CPU_DIR = Path('/sys/devices/system/cpu')
+SYS_NODE_DIR = Path('/sys/devices/system/node')
+
+
+class NodeCore(NamedTuple):
+    """ Physical core of the node: its logical CPUs (hardware threads), NUMA node and the logical core number
+    of its first hardware thread in the mdrun numbering (cores in order, the hardware threads of a core together). """
+    cpus: tuple[int, ...]
+    numa_node: int
+    offset: int
+
+
+class CoreSlice(NamedTuple):
+    """ Set of cores assigned to a run. """
+    cores: tuple[NodeCore, ...]
+
+    @property
+    def cpus(self) -> list[int]:
+        return sorted(cpu for core in self.cores for cpu in core.cpus)
+
+    @property
+    def nthreads(self) -> int:
+        return sum(len(core.cpus) for core in self.cores)
+
+    @property
+    def numa_nodes(self) -> list[int]:
+        return sorted({core.numa_node for core in self.cores})
+
+    @property
+    def pinoffset(self) -> Optional[int]:
+        """ mdrun -pinoffset of the slice, None if its hardware threads are not consecutive in the mdrun numbering. """
+        offsets = [core.offset for core in self.cores]
+        consecutive = all(core.offset + len(core.cpus) == next_offset for core, next_offset in zip(self.cores, offsets[1:]))
+        return offsets[0] if offsets and consecutive else None
+
+
+class PackedRun(NamedTuple):
+    """ Run of a packed job: its position in the job list, the cores it used and its exit code. """
+    job_index: int
+    core_slice: CoreSlice
+    returncode: Optional[int]
+
+
+def parse_cpulist(cpulist: str) -> list[int]:
+    """ CPUs of a Linux CPU list, eg: "0-3,8,10-11". """
+    cpus: list[int] = []
+    for item in cpulist.strip().split(','):
+        if not item:
+            continue
+        first, _, last = item.partition('-')
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def _read_cpulist(path: Path) -> Optional[list[int]]:
+    try:
+        return parse_cpulist(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def node_cores(cpus: Optional[Sequence[int]] = None) -> list[NodeCore]:
+    """ Physical cores of the node (only the ones whose CPUs are all in cpus if given) read from /sys, in the order
+    mdrun numbers them for pinning: by package and core id. Without topology information every CPU is a core
+    of NUMA node 0. """
+    online = _read_cpulist(SYS_CPU_DIR.joinpath('online')) or list(range(os.cpu_count() or 1))
+    numa_of_cpu = {}
+    for node_dir in sorted(SYS_NODE_DIR.glob('node[0-9]*')):
+        for cpu in _read_cpulist(node_dir.joinpath('cpulist')) or []:
+            numa_of_cpu[cpu] = int(node_dir.name[4:])
+    threads: dict[tuple[int, int], list[int]] = {}
+    for cpu in online:
+        topology_dir = SYS_CPU_DIR.joinpath(f'cpu{cpu}', 'topology')
+        try:
+            key = (int(topology_dir.joinpath('physical_package_id').read_text()), int(topology_dir.joinpath('core_id').read_text()))
+        except (OSError, ValueError):
+            key = (0, cpu)
+        threads.setdefault(key, []).append(cpu)
+    cores, offset = [], 0
+    for key in sorted(threads):
+        core_cpus = tuple(sorted(threads[key]))
+        cores.append(NodeCore(core_cpus, numa_of_cpu.get(core_cpus[0], 0), offset))
+        offset += len(core_cpus)
+    if cpus is not None:
+        allowed = set(cpus)
+        cores = [core for core in cores if allowed.issuperset(core.cpus)]
+    return cores
+
+
+def core_slices(cores: Sequence[NodeCore], cores_per_slice: int) -> list[CoreSlice]:
+    """ Splits the cores in disjoint slices of cores_per_slice consecutive cores. Slices that fit in a NUMA node
+    never span two of them (the remaining cores of a node are left unused), larger slices take whole nodes. """
+    if cores_per_slice < 1:
+        raise ValueError(f"The number of cores per slice ({cores_per_slice}) must be positive")
+    by_node: dict[int, list[NodeCore]] = {}
+    for core in cores:
+        by_node.setdefault(core.numa_node, []).append(core)
+    if cores_per_slice > min((len(node) for node in by_node.values()), default=0):
+        groups = [list(cores)]
+    else:
+        groups = list(by_node.values())
+    return [CoreSlice(tuple(group[start:start + cores_per_slice]))
+            for group in groups for start in range(0, len(group) - cores_per_slice + 1, cores_per_slice)]
+
+
+def _join_cgroup(cgroup_dir: Path, memory_limit: int) -> None:
+    cgroup_dir.mkdir(exist_ok=True)
+    cgroup_dir.joinpath('memory.max').write_text(str(memory_limit))
+    cgroup_dir.joinpath('cgroup.procs').write_text(str(os.getpid()))
+
+
+def _run_job(job, core_slice: CoreSlice, memory_limit: Optional[int], cgroup_dir: Optional[Path]) -> None:
+    """ Runs a job in the child process restricted to the slice cores and memory. """
+    if memory_limit and cgroup_dir:
+        _join_cgroup(cgroup_dir, memory_limit)
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, core_slice.cpus)
+    job.num_threads = str(core_slice.nthreads)
+    pinoffset = core_slice.pinoffset
+    if pinoffset is not None:
+        job.pin, job.pinoffset, job.pinstride = 'on', pinoffset, 1
+    else:
+        # mdrun follows the affinity mask of the process when it does not pin the threads itself
+        job.pin, job.pinoffset, job.pinstride = 'auto', 0, 0
+    sys.exit(job.launch() or 0)
+
+
+def run_packed(jobs: Sequence, cores_per_job: int = 0, memory_limit: Optional[float] = None,
+               cgroup_path: Optional[str] = None, cpus: Optional[Sequence[int]] = None) -> list[PackedRun]:
+    """ Runs the mdrun jobs (Mdrun or MdrunPlumed objects not launched yet) concurrently on disjoint slices of the
+    cores available to the process, starting the queued jobs as the slices are released. Every job runs in its
+    own process restricted to its slice: -nt with all its hardware threads and -pin on -pinoffset -pinstride 1.
+
+    Args:
+        jobs (Sequence): Mdrun or MdrunPlumed objects.
+        cores_per_job (int): (0) Physical cores of every job. 0 splits the cores evenly between all the jobs.
+        memory_limit (float): (None) Memory limit of every job in GB, set as the cgroup v2 memory.max of its cgroup. Requires cgroup_path: an address space ulimit would cap the virtual memory, not the resident one, and kill runs that reserve more than they use.
+        cgroup_path (str): (None) cgroup v2 directory delegated to the user where a child cgroup is created for every job.
+        cpus (Sequence): (None) Logical CPUs to use. By default the CPU affinity of the process.
+
+    Returns:
+        list: :class:`PackedRun` of every job in the order of jobs.
+    """
+    if not jobs:
+        return []
+    for job in jobs:
+        if not hasattr(job, 'pinoffset') or not hasattr(job, 'launch'):
+            raise ValueError(f"{type(job).__name__} is not an mdrun job: only Mdrun and MdrunPlumed objects can be packed")
+    if cpus is None and hasattr(os, 'sched_getaffinity'):
+        cpus = sorted(os.sched_getaffinity(0))
+    cores = node_cores(cpus)
+    slices = core_slices(cores, cores_per_job or max(len(cores) // len(jobs), 1))
+    if not slices:
+        raise ValueError(f"{cores_per_job} cores per job do not fit in the {len(cores)} cores available")
+    if memory_limit and not cgroup_path:
+        raise ValueError("The memory limit of the jobs requires a cgroup_path to set their cgroup v2 memory.max")
+    memory_bytes = int(memory_limit * 1024 ** 3) if memory_limit else None
+    cgroup_root = Path(cgroup_path) if cgroup_path else None
+    if cgroup_root and not os.access(cgroup_root, os.W_OK):
+        raise ValueError(f"The cgroup {cgroup_root} is not writable: it must be a cgroup v2 directory delegated to the user")
+
+    # Fork so the jobs do not need to be pickled
+    context = multiprocessing.get_context('fork')
+    queue = list(enumerate(jobs))
+    free = list(slices)
+    running: dict[int, tuple[CoreSlice, Optional[Path], Any]] = {}
+    runs: dict[int, PackedRun] = {}
+    while queue or running:
+        while queue and free:
+            job_index, job = queue.pop(0)
+            core_slice = free.pop(0)
+            cgroup_dir = cgroup_root.joinpath(f'biobb_mdrun_{os.getpid()}_{job_index}') if cgroup_root else None
+            process = context.Process(target=_run_job, args=(job, core_slice, memory_bytes, cgroup_dir))
+            process.start()
+            running[job_index] = (core_slice, cgroup_dir, process)
+        wait([process.sentinel for _, _, process in running.values()])
+        for job_index in [job_index for job_index, (_, _, process) in running.items() if not process.is_alive()]:
+            core_slice, cgroup_dir, process = running.pop(job_index)
+            process.join()
+            runs[job_index] = PackedRun(job_index, core_slice, process.exitcode)
+            if cgroup_dir and cgroup_dir.exists():
+                try:
+                    cgroup_dir.rmdir()
+                except OSError:
+                    pass
+            free.append(core_slice)
+        # Keep the slices in node order so the next job starts on the first free cores
+        free.sort(key=lambda free_slice: free_slice.cores[0].offset)
+    return [runs[job_index] for job_index in range(len(jobs))]
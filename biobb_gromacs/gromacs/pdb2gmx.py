@@ -7,6 +7,7 @@ from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
 from biobb_gromacs.gromacs.common import get_gromacs_version
+from biobb_gromacs.gromacs.pdb_utils import read_pdb, select_altloc, pdb_summary
 
 
 class Pdb2gmx(BiobbObject):
@@ -131,6 +132,13 @@ class Pdb2gmx(BiobbObject):
         if self.check_restart():
             return 0
 
+        # Native check of the input structure before running GROMACS
+        if PurePath(self.io_dict["in"]["input_pdb_path"]).suffix.lower() == '.pdb':
+            try:
+                self.preflight()
+            except (OSError, ValueError) as error:
+                fu.log(f"WARNING: The input structure can not be checked: {error}", self.out_log, self.global_log)
+
         # Create stdin file if needed
         stdin_content = ''
         num_chains = self.find_length(self.lys, self.arg, self.asp, self.glu, self.gln, self.his)
@@ -219,6 +227,36 @@ class Pdb2gmx(BiobbObject):
         self.check_arguments(output_files_created=True, raise_exception=False)
         return self.return_code
 
+    def preflight(self) -> dict:
+        """
+        Log a summary of the input PDB and warn about alternate locations and protonation lists not matching the residues of each chain
+        """
+        all_locations = read_pdb(self.io_dict["in"]["input_pdb_path"], altloc=None)
+        pdb = select_altloc(all_locations)
+        summary = pdb_summary(pdb)
+        fu.log(f"Input structure: {summary['natoms']} atoms ({summary['hydrogens']} hydrogens), "
+               f"{len(summary['chains'])} chains, {sum(summary['chains'].values())} residues", self.out_log, self.global_log)
+        if summary['hetero_residues']:
+            fu.log(f"Hetero residues: {' '.join(summary['hetero_residues'])}", self.out_log, self.global_log)
+        if all_locations.natoms != pdb.natoms:
+            fu.log(f"WARNING: {all_locations.natoms - pdb.natoms} atoms with alternate locations, GROMACS will use the first location",
+                   self.out_log, self.global_log)
+
+        chains = list(summary['residue_counts'].values())
+        for prop, resnames in PROTONATION_RESIDUES.items():
+            states = getattr(self, prop)
+            if not states or self.merge:
+                continue
+            if len(states) != len(chains):
+                fu.log(f"WARNING: {prop} has {len(states)} strings but the input structure has {len(chains)} chains", self.out_log, self.global_log)
+                continue
+            for chain_id, chain_counts, chain_states in zip(summary['residue_counts'], chains, states):
+                n_residues = sum(chain_counts.get(resname, 0) for resname in resnames)
+                if len(chain_states.split()) != n_residues:
+                    fu.log(f"WARNING: {prop} has {len(chain_states.split())} protonation states for chain '{chain_id}' but it has {n_residues} residues",
+                           self.out_log, self.global_log)
+        return summary
+
     def check_lengths(self, *lists):
         """
         Make sure all lists are the same length
@@ -249,6 +287,17 @@ class Pdb2gmx(BiobbObject):
             return 0
 
 
+# Residue names prompted by each protonation property of pdb2gmx
+PROTONATION_RESIDUES = {
+    'lys': ('LYS', 'LYN', 'LYSH'),
+    'arg': ('ARG', 'ARGN'),
+    'asp': ('ASP', 'ASH', 'ASPH'),
+    'glu': ('GLU', 'GLH', 'GLUH'),
+    'gln': ('GLN', 'GLNH'),
+    'his': ('HIS', 'HID', 'HIE', 'HIP', 'HISD', 'HISE', 'HISH', 'HIS1'),
+}
+
+
 def pdb2gmx(input_pdb_path: str, output_gro_path: str, output_top_zip_path: str,
             properties: Optional[dict] = None, **kwargs) -> int:
     """Create :class:`Pdb2gmx <gromacs.pdb2gmx.Pdb2gmx>` class and
@@ -0,0 +1,156 @@
+""" Native vectorized reader for the PDB format """
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from biobb_gromacs.gromacs.gro_utils import _parse_decimal, _parse_int, _parse_str
+
+
+PDB_LINE_LENGTH = 80
+PDB_ATOM_RECORDS = (b'ATOM  ', b'HETATM')
+# Base 36 digit values of the hybrid-36 characters (0-9, A-Z and a-z)
+_BASE36 = np.zeros(256, dtype=np.int64)
+_BASE36[ord('0'):ord('9') + 1] = np.arange(10)
+_BASE36[ord('A'):ord('Z') + 1] = np.arange(10, 36)
+_BASE36[ord('a'):ord('z') + 1] = np.arange(10, 36)
+
+
+@dataclass
+class PdbStructure:
+    """ Columnar representation of the ATOM and HETATM records of a model of a PDB file.
+
+    Args:
+        record (np.ndarray): (N,) Record name: ATOM or HETATM.
+        serial (np.ndarray): (N,) Atom serial numbers (hybrid-36 decoded).
+        name (np.ndarray): (N,) Atom names.
+        altloc (np.ndarray): (N,) Alternate location indicators ('' if blank).
+        resname (np.ndarray): (N,) Residue names.
+        chain (np.ndarray): (N,) Chain identifiers ('' if blank).
+        resid (np.ndarray): (N,) Residue sequence numbers (hybrid-36 decoded).
+        icode (np.ndarray): (N,) Residue insertion codes ('' if blank).
+        xyz (np.ndarray): (N, 3) Coordinates in Angstrom.
+        occupancy (np.ndarray): (N,) Occupancies.
+        bfactor (np.ndarray): (N,) Temperature factors.
+        element (np.ndarray): (N,) Element symbols ('' if blank).
+    """
+    record: np.ndarray
+    serial: np.ndarray
+    name: np.ndarray
+    altloc: np.ndarray
+    resname: np.ndarray
+    chain: np.ndarray
+    resid: np.ndarray
+    icode: np.ndarray
+    xyz: np.ndarray
+    occupancy: np.ndarray
+    bfactor: np.ndarray
+    element: np.ndarray
+
+    @property
+    def natoms(self) -> int:
+        return len(self.serial)
+
+    def residue_starts(self) -> np.ndarray:
+        """ Indices of the first atom of every residue (a change of chain, residue number, insertion code or name). """
+        if not self.natoms:
+            return np.empty(0, dtype=np.int64)
+        change = ((self.chain[1:] != self.chain[:-1]) | (self.resid[1:] != self.resid[:-1])
+                  | (self.icode[1:] != self.icode[:-1]) | (self.resname[1:] != self.resname[:-1]))
+        return np.concatenate(([0], np.flatnonzero(change) + 1))
+
+    def select(self, mask: np.ndarray) -> "PdbStructure":
+        """ Returns the atoms selected by a boolean mask or an index array. """
+        return PdbStructure(**{field: getattr(self, field)[mask] for field in self.__dataclass_fields__})
+
+
+def read_pdb(input_pdb_path: str, model: int = 1, altloc: Optional[str] = 'first') -> PdbStructure:
+    """ Reads the ATOM and HETATM records of a model (1-based, the records before the first MODEL
+    belong to model 1) of a PDB file at once as a (natoms, 80) byte matrix.
+
+    Alternate locations: with altloc 'first' the first location of every atom is kept (and the blank ones),
+    with a location identifier (eg: 'B') only that location is kept, with None all of them are kept.
+    Raises ValueError if the model has no atoms. """
+    with open(input_pdb_path, 'rb') as pdb_file:
+        lines = pdb_file.read().split(b'\n')
+    atom_lines = []
+    current_model = 1
+    for line in lines:
+        record = line[:6]
+        if record in PDB_ATOM_RECORDS:
+            if current_model == model:
+                atom_lines.append(line.rstrip(b'\r'))
+        elif record == b'MODEL ':
+            current_model = int(line[10:14]) if line[10:14].strip() else current_model + 1
+        elif record == b'ENDMDL' and current_model == model:
+            break
+    if not atom_lines:
+        raise ValueError(f"No ATOM or HETATM records found in model {model} of {input_pdb_path}")
+    pdb = parse_pdb_atom_lines(atom_lines)
+    return select_altloc(pdb, altloc) if altloc is not None else pdb
+
+
+def parse_pdb_atom_lines(atom_lines: list[bytes]) -> PdbStructure:
+    """ Parses ATOM/HETATM lines padded to 80 columns as a byte matrix. """
+    natoms = len(atom_lines)
+    rows = np.array(atom_lines, dtype=f'S{PDB_LINE_LENGTH}').view(np.uint8).reshape(natoms, PDB_LINE_LENGTH)
+    # Short lines are padded with zeros: treat them as blanks
+    rows = np.where(rows == 0, ord(' '), rows).astype(np.uint8)
+    return PdbStructure(record=_parse_str(rows[:, 0:6]),
+                        serial=hybrid36_decode(rows[:, 6:11]),
+                        name=_parse_str(rows[:, 12:16]),
+                        altloc=_parse_str(rows[:, 16:17]),
+                        resname=_parse_str(rows[:, 17:21]),
+                        chain=_parse_str(rows[:, 21:22]),
+                        resid=hybrid36_decode(rows[:, 22:26]),
+                        icode=_parse_str(rows[:, 26:27]),
+                        xyz=_parse_decimal(rows[:, 30:54].reshape(natoms, 3, 8), 3),
+                        occupancy=_parse_decimal(rows[:, 54:60], 2),
+                        bfactor=_parse_decimal(rows[:, 60:66], 2),
+                        element=_parse_str(rows[:, 76:78]))
+
+
+def hybrid36_decode(columns: np.ndarray) -> np.ndarray:
+    """ Decodes fixed width hybrid-36 numbers: decimal up to 10**width - 1, then base 36 starting
+    with an uppercase letter (A000 = 10**width) and then with a lowercase letter. """
+    width = columns.shape[1]
+    decimal = _parse_int(columns)
+    first = columns[:, 0]
+    upper = (first >= ord('A')) & (first <= ord('Z'))
+    lower = (first >= ord('a')) & (first <= ord('z'))
+    if not (upper.any() or lower.any()):
+        return decimal
+    base36 = _BASE36[columns] @ (36 ** np.arange(width - 1, -1, -1, dtype=np.int64))
+    offset = 10 ** width - 10 * 36 ** (width - 1)
+    return np.where(upper, base36 + offset, np.where(lower, base36 + offset + 26 * 36 ** (width - 1), decimal))
+
+
+def select_altloc(pdb: PdbStructure, altloc: str = 'first') -> PdbStructure:
+    """ Keeps the atoms without alternate locations and the selected location ('first' or a location identifier). """
+    blank = pdb.altloc == ''
+    if blank.all():
+        return pdb
+    if altloc != 'first':
+        return pdb.select(blank | (pdb.altloc == altloc))
+    # Keep the first alternate location of every atom
+    keys = np.char.add(np.char.add(np.char.add(pdb.chain, '|'), np.char.add(pdb.resid.astype(str), pdb.icode)), np.char.add('|', pdb.name))
+    _, first_index = np.unique(keys, return_index=True)
+    first = np.zeros(pdb.natoms, dtype=bool)
+    first[first_index] = True
+    return pdb.select(blank | first)
+
+
+def pdb_summary(pdb: PdbStructure) -> dict:
+    """ Number of atoms, hydrogens, residues per chain, residue name counts per chain and hetero residues. """
+    starts = pdb.residue_starts()
+    chains = pdb.chain[starts]
+    resnames = pdb.resname[starts]
+    chain_order = list(dict.fromkeys(chains.tolist()))
+    hetero = sorted(set(pdb.resname[pdb.record == 'HETATM'].tolist()))
+    hydrogen = (pdb.element == 'H') | ((pdb.element == '') & np.char.startswith(np.char.lstrip(pdb.name, '0123456789'), 'H'))
+    return {
+        'natoms': pdb.natoms,
+        'hydrogens': int(hydrogen.sum()),
+        'chains': {chain: int((chains == chain).sum()) for chain in chain_order},
+        'residue_counts': {chain: dict(zip(*[array.tolist() for array in np.unique(resnames[chains == chain], return_counts=True)]))
+                           for chain in chain_order},
+        'hetero_residues': hetero,
+    }
@@ -0,0 +1,261 @@
+""" Object model of the GROMACS topology formats TOP and ITP """
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence
+import numpy as np
+
+
+@dataclass
+class TopNode:
+    """ Block of consecutive lines of a topology starting with a directive ([ name ]) or a preprocessor line (#keyword argument)
+    and followed by its data, comment and blank lines up to the next directive or preprocessor line. The lines are kept verbatim.
+
+    Args:
+        kind (str): 'directive', the preprocessor keyword (include, ifdef, ifndef, else, endif, define...) or 'text' for the lines before the first head.
+        name (str): Directive name (lowercase) or preprocessor argument (the path for includes, without quotes).
+        lines (list): Raw lines including the head line and the line endings.
+    """
+    kind: str
+    name: str
+    lines: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_head(cls, head: str) -> "TopNode":
+        """ Node from a directive or preprocessor line. """
+        stripped = head.strip()
+        if stripped.startswith('['):
+            return cls('directive', stripped[1:stripped.find(']')].strip().lower(), [head])
+        keyword, _, argument = stripped[1:].strip().partition(' ')
+        argument = argument.split(';')[0].strip()
+        if keyword == 'include':
+            argument = argument.strip('"<>')
+        return cls(keyword, argument, [head])
+
+    def data_lines(self) -> Iterator[tuple[int, list[str]]]:
+        """ Yields the position in lines and the tokens (without comments) of every data line. """
+        for position, line in enumerate(self.lines):
+            if position == 0 and self.kind != 'text':
+                continue
+            tokens = line.split(';')[0].split()
+            if tokens:
+                yield position, tokens
+
+    def insert_data(self, lines: Iterable[str], after_line: Optional[int] = None) -> None:
+        """ Inserts lines after the given position (by default after the last data line, before trailing comments and blanks). """
+        if after_line is None:
+            after_line = max((position for position, _ in self.data_lines()), default=0)
+        if self.lines and not self.lines[after_line].endswith('\n'):
+            self.lines[after_line] += '\n'
+        self.lines[after_line + 1:after_line + 1] = list(lines)
+
+
+@dataclass
+class TopAtoms:
+    """ Columns of the [ atoms ] directive of a molecule type.
+
+    Args:
+        nr (np.ndarray): (N,) Atom numbers.
+        type (np.ndarray): (N,) Atom types.
+        resnr (np.ndarray): (N,) Residue numbers.
+        residue (np.ndarray): (N,) Residue names.
+        atom (np.ndarray): (N,) Atom names.
+        cgnr (np.ndarray): (N,) Charge group numbers.
+        charge (np.ndarray): (N,) Charges (e).
+        mass (np.ndarray): (N,) Masses (amu, NaN if taken from the atom type).
+    """
+    nr: np.ndarray
+    type: np.ndarray
+    resnr: np.ndarray
+    residue: np.ndarray
+    atom: np.ndarray
+    cgnr: np.ndarray
+    charge: np.ndarray
+    mass: np.ndarray
+
+    @property
+    def natoms(self) -> int:
+        return len(self.nr)
+
+    @classmethod
+    def from_tokens(cls, rows: Sequence[list[str]]) -> "TopAtoms":
+        columns = [row[:8] + ['nan'] * (8 - len(row[:8])) for row in rows]
+        table = np.array(columns, dtype=str).reshape(len(rows), 8)
+        return cls(nr=table[:, 0].astype(np.int64), type=table[:, 1], resnr=table[:, 2].astype(np.int64), residue=table[:, 3],
+                   atom=table[:, 4], cgnr=table[:, 5].astype(np.int64), charge=table[:, 6].astype(np.float64), mass=table[:, 7].astype(np.float64))
+
+
+@dataclass
+class MoleculeType:
+    """ Molecule type of a topology: its name, number of excluded neighbours, atom table and the nodes that define it. """
+    name: str
+    nrexcl: int
+    atoms: TopAtoms
+    nodes: list[TopNode]
+
+
+class Topology:
+    """ Ordered model of a GROMACS TOP or ITP file as a list of :class:`TopNode`. Included files are only read
+    when requested, looking for them next to the including file and then in the include directories (eg: GMXLIB).
+    Edits are made by inserting or removing whole nodes, so any change is a single linear pass over the file.
+
+    Args:
+        nodes (list): (None) Nodes of the topology.
+        path (str): (None) Path of the file, used to resolve relative includes.
+        include_dirs (list): (None) Directories where included files are searched. By default the GMXLIB directories.
+    """
+
+    def __init__(self, nodes: Optional[list[TopNode]] = None, path: Optional[str] = None,
+                 include_dirs: Optional[Sequence[str]] = None) -> None:
+        self.nodes: list[TopNode] = nodes if nodes is not None else []
+        self.path = path
+        if include_dirs is None:
+            include_dirs = [directory for directory in os.getenv('GMXLIB', '').split(os.pathsep) if directory]
+        self.include_dirs = list(include_dirs)
+        self._includes: dict[str, Optional["Topology"]] = {}
+
+    @classmethod
+    def from_file(cls, input_top_path: str, include_dirs: Optional[Sequence[str]] = None) -> "Topology":
+        with open(input_top_path) as top_file:
+            return cls(parse_top_lines(top_file), path=input_top_path, include_dirs=include_dirs)
+
+    def __iter__(self) -> Iterator[TopNode]:
+        return iter(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def find(self, kind: str, name: Optional[str] = None, start: int = 0) -> Optional[int]:
+        """ Index of the first node of the given kind (and name, directive names are case insensitive) from start. """
+        if kind == 'directive' and name is not None:
+            name = name.lower()
+        for index in range(start, len(self.nodes)):
+            node = self.nodes[index]
+            if node.kind == kind and (name is None or node.name == name):
+                return index
+        return None
+
+    def find_include(self, suffix: str, start: int = 0) -> Optional[int]:
+        """ Index of the first #include of a file whose path ends with suffix (eg: 'forcefield.itp'). """
+        for index in range(start, len(self.nodes)):
+            if self.nodes[index].kind == 'include' and self.nodes[index].name.endswith(suffix):
+                return index
+        return None
+
+    def find_moleculetype(self, name: str) -> Optional[int]:
+        """ Index of the [ moleculetype ] directive node of the molecule type with the given name. """
+        for index, node in enumerate(self.nodes):
+            if node.kind == 'directive' and node.name == 'moleculetype':
+                if next((tokens[0] for _, tokens in node.data_lines()), None) == name:
+                    return index
+        return None
+
+    def directives(self, name: str) -> list[TopNode]:
+        return [node for node in self.nodes if node.kind == 'directive' and node.name == name.lower()]
+
+    def insert(self, index: int, nodes: Iterable[TopNode]) -> int:
+        """ Inserts nodes before index. Returns the index after the inserted nodes. """
+        nodes = list(nodes)
+        self.nodes[index:index] = nodes
+        return index + len(nodes)
+
+    def remove(self, node: TopNode) -> None:
+        self.nodes.remove(node)
+
+    def resolve_include(self, include: str) -> Optional[Path]:
+        """ Path of an included file: next to this file or in the include directories. None if it can not be found. """
+        directories = ([str(Path(self.path).parent)] if self.path else []) + self.include_dirs
+        for directory in directories:
+            candidate = Path(directory).joinpath(include)
+            if candidate.is_file():
+                return candidate
+        return None
+
+    def include(self, node: TopNode) -> Optional["Topology"]:
+        """ Parsed topology of an #include node (read on first use and cached). None if the file can not be found. """
+        if node.name not in self._includes:
+            path = self.resolve_include(node.name)
+            self._includes[node.name] = Topology.from_file(str(path), include_dirs=self.include_dirs) if path else None
+        return self._includes[node.name]
+
+    def walk(self, recursive: bool = False) -> Iterator[tuple["Topology", TopNode]]:
+        """ Yields every node with the topology that contains it. With recursive the included files are walked
+        in place (regardless of the #ifdef conditions), skipping the ones that can not be found. """
+        for node in self.nodes:
+            yield self, node
+            if recursive and node.kind == 'include':
+                included = self.include(node)
+                if included is not None:
+                    yield from included.walk(recursive=True)
+
+    def moleculetypes(self, recursive: bool = False) -> list[MoleculeType]:
+        """ Molecule types defined in this file (and in the included ones with recursive). The data lines of a directive
+        continue after preprocessor nodes until the next directive (eg: atoms inside #ifdef blocks). """
+        molecules: list[MoleculeType] = []
+        current: Optional[MoleculeType] = None
+        directive = ''
+        atom_rows: list[list[str]] = []
+        for _, node in self.walk(recursive):
+            if node.kind == 'directive':
+                directive = node.name
+                if directive == 'moleculetype':
+                    if current is not None:
+                        current.atoms = TopAtoms.from_tokens(atom_rows)
+                    current, atom_rows = MoleculeType(name='', nrexcl=0, atoms=TopAtoms.from_tokens([]), nodes=[]), []
+                    molecules.append(current)
+                elif directive in ('system', 'molecules'):
+                    if current is not None:
+                        current.atoms = TopAtoms.from_tokens(atom_rows)
+                    current, atom_rows = None, []
+            if current is None:
+                continue
+            current.nodes.append(node)
+            for _, tokens in node.data_lines():
+                if directive == 'moleculetype' and not current.name:
+                    current.name, current.nrexcl = tokens[0], int(tokens[1]) if len(tokens) > 1 else 0
+                elif directive == 'atoms':
+                    atom_rows.append(tokens)
+        if current is not None:
+            current.atoms = TopAtoms.from_tokens(atom_rows)
+        return molecules
+
+    @property
+    def molecules(self) -> list[tuple[str, int]]:
+        """ Molecule names and counts of the [ molecules ] directive. """
+        return [(tokens[0], int(tokens[1])) for node in self.directives('molecules') for _, tokens in node.data_lines()]
+
+    def lines(self) -> Iterator[str]:
+        for node in self.nodes:
+            yield from node.lines
+
+    def write(self, output_top_path: str) -> str:
+        """ Writes the topology streaming the lines of its nodes. Returns the output path. """
+        with open(output_top_path, 'w') as top_file:
+            top_file.writelines(self.lines())
+        return output_top_path
+
+
+def parse_top_lines(lines: Iterable[str]) -> list[TopNode]:
+    """ Splits the lines of a topology in nodes in a single pass. """
+    nodes = [TopNode('text', '')]
+    for line in lines:
+        stripped = line.lstrip()
+        if stripped.startswith('[') or stripped.startswith('#'):
+            nodes.append(TopNode.from_head(line))
+        else:
+            nodes[-1].lines.append(line)
+    if not nodes[0].lines:
+        nodes.pop(0)
+    return nodes
+
+
+def include_nodes(include: str, define: Optional[str] = None, comment: Optional[str] = None) -> list[TopNode]:
+    """ Nodes of an #include (inside an #ifdef define block if given) preceded by a comment line and followed by a blank line. """
+    nodes = [TopNode('text', '', ['\n'] + ([f'; {comment}\n'] if comment else []))]
+    if define:
+        nodes.append(TopNode('ifdef', define, [f'#ifdef {define}\n']))
+    nodes.append(TopNode('include', include, [f'#include "{include}"\n']))
+    if define:
+        nodes.append(TopNode('endif', '', ['#endif\n']))
+    nodes[-1].lines.append('\n')
+    return nodes
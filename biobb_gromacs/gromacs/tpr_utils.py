@@ -0,0 +1,169 @@
+""" Native reader for the header of the GROMACS portable binary run input file TPR """
+import shlex
+import struct
+import subprocess
+from typing import BinaryIO, Callable, Iterable, Mapping, NamedTuple, Optional
+import numpy as np
+
+
+# Oldest file version with the layout of the header read here (GROMACS 4.0)
+TPR_MIN_FILE_VERSION = 58
+# Since this file version the header is followed by the size of the body
+_TPR_BODY_SIZE_FILE_VERSION = 119
+_TPR_BODY_SIZE_FILE_GENERATION = 27
+# Inputrec fields read from the gmx dump output
+_RUN_CONTROL_FIELDS = {'integrator': str, 'tinit': float, 'dt': float, 'nsteps': int, 'init_step': int}
+TPR_CUTOFF_FIELDS = {'nstlist': int, 'rlist': float, 'coulombtype': str, 'rcoulomb': float, 'rvdw': float}
+
+
+class TprHeader(NamedTuple):
+    """ Header of a TPR file and its simulation box (nm, None if the file has no box). """
+    gromacs_version: str
+    precision: int
+    file_version: int
+    file_generation: int
+    file_tag: str
+    natoms: int
+    ngtc: int
+    fep_state: int
+    lambda_: float
+    has_inputrec: bool
+    has_topology: bool
+    has_x: bool
+    has_v: bool
+    has_f: bool
+    body_size: Optional[int]
+    box: Optional[np.ndarray]
+
+
+def read_tpr_header(input_tpr_path: str) -> TprHeader:
+    """ Reads the header of a TPR file (version, precision, number of atoms, lambda and contents) and the box
+    that follows it. Only the first few hundred bytes of the file are read. """
+    with open(input_tpr_path, 'rb') as tpr_file:
+        try:
+            return _read_header(tpr_file)
+        except struct.error:
+            raise ValueError(f"Truncated TPR header in {input_tpr_path}")
+
+
+def _read_int(tpr_file: BinaryIO) -> int:
+    return struct.unpack('>i', tpr_file.read(4))[0]
+
+
+def _read_string(tpr_file: BinaryIO) -> str:
+    # Strings are stored with their length including the null character before the XDR string
+    _read_int(tpr_file)
+    length = _read_int(tpr_file)
+    return tpr_file.read((length + 3) // 4 * 4)[:length].decode(errors='replace')
+
+
+def _read_reals(tpr_file: BinaryIO, precision: int, count: int) -> tuple:
+    return struct.unpack(f">{count}{'d' if precision == 8 else 'f'}", tpr_file.read(count * precision))
+
+
+def _read_header(tpr_file: BinaryIO) -> TprHeader:
+    version = _read_string(tpr_file)
+    if not version.startswith('VERSION '):
+        raise ValueError(f"{tpr_file.name} is not a TPR file")
+    precision, file_version = _read_int(tpr_file), _read_int(tpr_file)
+    if precision not in (4, 8):
+        raise ValueError(f"Unknown TPR precision ({precision} bytes per real) in {tpr_file.name}")
+    if file_version < TPR_MIN_FILE_VERSION:
+        raise ValueError(f"TPR file version {file_version} of {tpr_file.name} is not supported, convert it with a recent GROMACS version")
+    file_tag = ''
+    if 77 <= file_version <= 79:
+        _read_int(tpr_file)
+        file_tag = _read_string(tpr_file)
+    file_generation = _read_int(tpr_file)
+    if file_version >= 81:
+        file_tag = _read_string(tpr_file)
+    natoms, ngtc = _read_int(tpr_file), _read_int(tpr_file)
+    if file_version < 62:
+        _read_int(tpr_file)
+        _read_reals(tpr_file, precision, 1)
+    fep_state = _read_int(tpr_file) if file_version >= 79 else 0
+    (lambda_,) = _read_reals(tpr_file, precision, 1)
+    has_inputrec, has_topology, has_x, has_v, has_f, has_box = (bool(_read_int(tpr_file)) for _ in range(6))
+    body_size = None
+    if file_version >= _TPR_BODY_SIZE_FILE_VERSION and file_generation >= _TPR_BODY_SIZE_FILE_GENERATION:
+        (body_size,) = struct.unpack('>q', tpr_file.read(8))
+    # The body starts with the box, the relative box and the box velocities
+    box = np.array(_read_reals(tpr_file, precision, 9), dtype=np.float64).reshape(3, 3) if has_box else None
+    return TprHeader(gromacs_version=version[len('VERSION '):], precision=precision, file_version=file_version,
+                     file_generation=file_generation, file_tag=file_tag, natoms=natoms, ngtc=ngtc, fep_state=fep_state,
+                     lambda_=float(lambda_), has_inputrec=has_inputrec, has_topology=has_topology, has_x=has_x,
+                     has_v=has_v, has_f=has_f, body_size=body_size, box=box)
+
+
+def parse_inputrec(lines: Iterable[str], fields: Mapping[str, Callable], description: str = 'Inputrec parameters') -> dict:
+    """ Parses the given parameters (name with underscores: type) of an inputrec dump (gmx dump -s output or the
+    parameters section of an mdrun log), stopping as soon as all of them are found. """
+    inputrec: dict = {}
+    for line in lines:
+        name, separator, value = line.partition('=')
+        name = name.strip().replace('-', '_')
+        if separator and name in fields and name not in inputrec:
+            inputrec[name] = fields[name](value.strip())
+            if len(inputrec) == len(fields):
+                break
+    missing = [name for name in fields if name not in inputrec]
+    if missing:
+        raise ValueError(f"{description} {', '.join(missing)} not found")
+    return inputrec
+
+
+def parse_run_control(lines: Iterable[str]) -> dict:
+    """ Parses the run control parameters (integrator, tinit, dt, nsteps and init-step) of an inputrec dump
+    (see :func:`parse_inputrec`). Adds the start_time and end_time (ps) of the run. """
+    run_control = parse_inputrec(lines, _RUN_CONTROL_FIELDS, 'Run control parameters')
+    run_control['start_time'] = run_control['tinit'] + run_control['init_step'] * run_control['dt']
+    # A negative number of steps means an infinite run
+    run_control['end_time'] = run_control['start_time'] + run_control['nsteps'] * run_control['dt'] if run_control['nsteps'] >= 0 else None
+    return run_control
+
+
+def _read_tpr_dump(input_tpr_path: str, parser: Callable[[Iterable[str]], dict], gmx: str, description: str) -> dict:
+    """ Parses the streamed output of gmx dump, which is stopped as soon as the parser returns. """
+    process = subprocess.Popen(shlex.split(gmx) + ['dump', '-s', input_tpr_path], stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True, errors='replace')
+    try:
+        return parser(process.stdout or [])
+    except ValueError:
+        raise ValueError(f"{description} not found in the gmx dump output of {input_tpr_path}")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def read_tpr_run_control(input_tpr_path: str, gmx: str = 'gmx') -> dict:
+    """ Reads the run control parameters of a TPR file (see :func:`parse_run_control`). The inputrec is stored
+    after the topology and the coordinates, so it is read from the streamed output of gmx dump, which is
+    stopped as soon as the parameters are found instead of dumping the whole topology. """
+    return _read_tpr_dump(input_tpr_path, parse_run_control, gmx, 'Run control parameters')
+
+
+def read_tpr_cutoffs(input_tpr_path: str, gmx: str = 'gmx') -> dict:
+    """ Reads the neighbour searching and cut-off parameters (nstlist, rlist, coulombtype, rcoulomb and rvdw)
+    of a TPR file from the streamed output of gmx dump (see :func:`read_tpr_run_control`). """
+    return _read_tpr_dump(input_tpr_path, lambda lines: parse_inputrec(lines, TPR_CUTOFF_FIELDS, 'Cut-off parameters'),
+                          gmx, 'Cut-off parameters')
+
+
+def convert_tpr_nsteps(run_control: dict, extend: Optional[float] = None, until: Optional[float] = None,
+                       nsteps: Optional[int] = None) -> int:
+    """ Number of steps of the run after gmx convert-tpr with the given -nsteps, -extend (ps) or -until (ps)
+    (in this order of precedence). Raises ValueError if the run would end before it starts. """
+    dt = run_control['dt']
+    if nsteps:
+        return int(nsteps)
+    if extend:
+        if run_control['nsteps'] < 0:
+            raise ValueError("The run has an infinite number of steps and can not be extended")
+        new_nsteps = run_control['nsteps'] + round(extend / dt)
+    elif until:
+        new_nsteps = round((until - run_control['start_time']) / dt)
+    else:
+        return run_control['nsteps']
+    if new_nsteps < 0:
+        raise ValueError(f"The run would end before it starts at {run_control['start_time']} ps")
+    return new_nsteps
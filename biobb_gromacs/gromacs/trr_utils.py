@@ -0,0 +1,154 @@
+""" Native memory-mapped reader for the GROMACS full precision trajectory format TRR """
+import struct
+from pathlib import Path
+from typing import NamedTuple, Optional
+import numpy as np
+
+
+TRR_MAGIC = 1993
+TRR_VERSION = b'GMX_trn_file'
+# Sizes in the frame header: ir, e, box, vir, pres, top, sym, x, v, f
+TRR_DATA_BLOCKS = ('box', 'vir', 'pres', 'x', 'v', 'f')
+_SIZES_FORMAT = '>13i'
+# Magic, version string and sizes, followed by time and lambda in single or double precision
+_MIN_HEADER_SIZE = 24 + 13 * 4 + 8
+
+
+class TrrFrameHeader(NamedTuple):
+    """ Layout of a TRR frame: byte offset of the frame and of each data block (None if not present). """
+    offset: int
+    size: int
+    natoms: int
+    step: int
+    time: float
+    lambda_: float
+    double: bool
+    box: Optional[int]
+    vir: Optional[int]
+    pres: Optional[int]
+    x: Optional[int]
+    v: Optional[int]
+    f: Optional[int]
+
+
+class TrrFrame(NamedTuple):
+    """ Frame of a TRR trajectory. Arrays are read-only views of the memory-mapped file (nm, nm/ps and kJ/mol/nm). """
+    step: int
+    time: float
+    lambda_: float
+    box: Optional[np.ndarray]
+    x: Optional[np.ndarray]
+    v: Optional[np.ndarray]
+    f: Optional[np.ndarray]
+
+
+class TrrFile:
+    """ Memory-mapped TRR trajectory. The frame headers are scanned once on opening and the coordinates,
+    velocities and forces are exposed as big endian NumPy views of the file without copying, both for
+    single and double precision files.
+
+    Args:
+        input_trr_path (str): Path to the TRR file.
+    """
+
+    def __init__(self, input_trr_path: str) -> None:
+        self.path = input_trr_path
+        # Empty files can not be memory-mapped
+        self._data: np.ndarray = np.memmap(input_trr_path, dtype=np.uint8, mode='r') if Path(input_trr_path).stat().st_size else np.empty(0, dtype=np.uint8)
+        self.headers: list[TrrFrameHeader] = []
+        offset = 0
+        while len(self._data) - offset >= _MIN_HEADER_SIZE:
+            header = _read_frame_header(self._data, offset)
+            if header.offset + header.size > len(self._data):
+                # Truncated last frame (eg: a trajectory still being written)
+                break
+            self.headers.append(header)
+            offset += header.size
+
+    def __len__(self) -> int:
+        return len(self.headers)
+
+    def __enter__(self) -> "TrrFile":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """ Releases the memory map. Views obtained before closing keep it alive until they are released. """
+        self._data = np.empty(0, dtype=np.uint8)
+        self.headers = []
+
+    @property
+    def steps(self) -> np.ndarray:
+        return np.array([header.step for header in self.headers], dtype=np.int64)
+
+    @property
+    def times(self) -> np.ndarray:
+        return np.array([header.time for header in self.headers], dtype=np.float64)
+
+    def __getitem__(self, index: int) -> TrrFrame:
+        header = self.headers[index]
+        return TrrFrame(step=header.step, time=header.time, lambda_=header.lambda_,
+                        box=self._block(header, 'box', (3, 3)), x=self._block(header, 'x', (header.natoms, 3)),
+                        v=self._block(header, 'v', (header.natoms, 3)), f=self._block(header, 'f', (header.natoms, 3)))
+
+    def array(self, block: str) -> np.ndarray:
+        """ Returns a (frames, natoms, 3) strided view of the x, v or f block of every frame (or (frames, 3, 3)
+        for box). Every frame must have the same layout and contain the block, otherwise use the frames one by one. """
+        if block not in TRR_DATA_BLOCKS:
+            raise ValueError(f"Unknown TRR data block {block}, use one of: {', '.join(TRR_DATA_BLOCKS)}")
+        if not self.headers:
+            return np.empty((0, 0, 3), dtype=np.float32)
+        first = self.headers[0]
+        relative = getattr(first, block)
+        for header in self.headers:
+            block_offset = getattr(header, block)
+            if block_offset is None or header.size != first.size or block_offset - header.offset != relative - first.offset:
+                raise ValueError(f"The {block} block of {self.path} is not stored in every frame with the same layout")
+        dtype = np.dtype('>f8' if first.double else '>f4')
+        shape = (len(self.headers),) + ((3, 3) if block in ('box', 'vir', 'pres') else (first.natoms, 3))
+        strides = (first.size, 3 * dtype.itemsize, dtype.itemsize)
+        return np.ndarray(shape, dtype=dtype, buffer=self._data, offset=relative, strides=strides)
+
+    def _block(self, header: TrrFrameHeader, block: str, shape: tuple) -> Optional[np.ndarray]:
+        block_offset = getattr(header, block)
+        if block_offset is None:
+            return None
+        return np.ndarray(shape, dtype='>f8' if header.double else '>f4', buffer=self._data, offset=block_offset)
+
+
+def _read_frame_header(data: np.ndarray, offset: int) -> TrrFrameHeader:
+    """ Parses the XDR frame header: magic, version string, block sizes, natoms, step, nre, time and lambda. """
+    raw = bytes(data[offset:offset + _MIN_HEADER_SIZE + 8])
+    if len(raw) < _MIN_HEADER_SIZE:
+        raise ValueError(f"Truncated TRR frame header at byte {offset}")
+    magic, string_size, version_length = struct.unpack('>3i', raw[:12])
+    if magic != TRR_MAGIC:
+        raise ValueError(f"Wrong TRR magic number {magic} at byte {offset}")
+    version_end = 12 + (version_length + 3) // 4 * 4
+    if raw[12:12 + version_length] != TRR_VERSION:
+        raise ValueError(f"Unknown TRR version {raw[12:12 + version_length]!r} at byte {offset}")
+    sizes = struct.unpack(_SIZES_FORMAT, raw[version_end:version_end + 52])
+    ir_size, e_size, box_size, vir_size, pres_size, top_size, sym_size, x_size, v_size, f_size, natoms, step, _ = sizes
+    # The real size is deduced from the size of any present block
+    if box_size:
+        real_size = box_size // 9
+    elif natoms:
+        real_size = (x_size or v_size or f_size) // (natoms * 3)
+    else:
+        real_size = 4
+    if real_size not in (4, 8):
+        raise ValueError(f"Unknown TRR precision ({real_size} bytes per real) at byte {offset}")
+    double = real_size == 8
+    time, lambda_ = struct.unpack('>2d' if double else '>2f', raw[version_end + 52:version_end + 52 + 2 * real_size])
+
+    position = offset + version_end + 52 + 2 * real_size + ir_size + e_size
+    block_offsets = {}
+    for block, block_size in zip(TRR_DATA_BLOCKS, (box_size, vir_size, pres_size, x_size, v_size, f_size)):
+        if block == 'x':
+            position += top_size + sym_size
+        block_offsets[block] = position if block_size else None
+        position += block_size
+    return TrrFrameHeader(offset=offset, size=position - offset, natoms=natoms, step=step, time=float(time),
+                          lambda_=float(lambda_), double=double, **block_offsets)
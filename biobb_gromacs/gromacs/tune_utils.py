@@ -0,0 +1,201 @@
+""" Empirical tuner of the mdrun thread-MPI rank, OpenMP thread and PME rank layout with an on-disk cache of the results """
+import hashlib
+import json
+import os
+import platform
+import shlex
+import subprocess
+from pathlib import Path
+from typing import NamedTuple, Optional, Sequence
+import numpy as np
+from biobb_gromacs.gromacs.common import gmx_cache_dir
+from biobb_gromacs.gromacs.log_utils import read_mdrun_log
+
+
+TUNING_CACHE_FILE = 'mdrun_tuning.json'
+# OpenMP threads per rank beyond this number rarely scale, these layouts are not tried
+TUNING_MAX_OMP_THREADS = 16
+# Separate PME ranks only pay off with enough ranks to share the work
+TUNING_MIN_PME_RANKS_SPLIT = 4
+
+
+class MdrunLayout(NamedTuple):
+    """ Parallel layout of an mdrun run: thread-MPI ranks, OpenMP threads per rank and separate PME ranks. """
+    ntmpi: int
+    ntomp: int
+    npme: int
+
+    def args(self) -> list[str]:
+        return ['-ntmpi', str(self.ntmpi), '-ntomp', str(self.ntomp), '-npme', str(self.npme)]
+
+
+class TuningTrial(NamedTuple):
+    """ Result of a tuning trial: its performance (None if it failed) and the error of failed trials. """
+    layout: MdrunLayout
+    ns_per_day: Optional[float]
+    error: Optional[str] = None
+
+
+def available_cores() -> int:
+    """ Number of cores this process can run on (its CPU affinity, eg: the cores allocated by the queue system). """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class CpuTopology(NamedTuple):
+    """ Logical CPUs available to the process grouped by physical core (the hardware threads of each core). """
+    cores: tuple[tuple[int, ...], ...]
+
+    @property
+    def ncores(self) -> int:
+        return len(self.cores)
+
+    @property
+    def threads_per_core(self) -> int:
+        return max((len(core) for core in self.cores), default=1)
+
+    @property
+    def cpus(self) -> list[int]:
+        return sorted(cpu for core in self.cores for cpu in core)
+
+
+def cpu_topology(cpus: Optional[Sequence[int]] = None) -> CpuTopology:
+    """ Physical cores of the logical CPUs available to the process (or the given ones) read from /sys.
+    Every CPU is its own core if the topology can not be read. """
+    if cpus is None:
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    cores: dict[tuple, list[int]] = {}
+    for cpu in cpus:
+        topology_dir = Path(f'/sys/devices/system/cpu/cpu{cpu}/topology')
+        try:
+            key: tuple = (int(topology_dir.joinpath('physical_package_id').read_text()), int(topology_dir.joinpath('core_id').read_text()))
+        except (OSError, ValueError):
+            key = ('cpu', cpu)
+        cores.setdefault(key, []).append(cpu)
+    return CpuTopology(tuple(tuple(core) for core in cores.values()))
+
+
+def host_cpu_signature() -> str:
+    """ CPU model and number of logical cores of the host, eg: "AMD EPYC 7742 64-Core Processor x256". """
+    model = ''
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            for line in cpuinfo:
+                name, _, value = line.partition(':')
+                if name.strip() in ('model name', 'Processor', 'cpu model'):
+                    model = value.strip()
+                    break
+    except OSError:
+        pass
+    return f"{model or platform.processor() or platform.machine()} x{os.cpu_count() or 1}"
+
+
+def tuning_layouts(ncores: int, separate_pme: bool = True, max_omp_threads: int = TUNING_MAX_OMP_THREADS,
+                   gpu_pme: bool = False) -> list[MdrunLayout]:
+    """ Candidate layouts using all the ncores cores: every split in ranks x OpenMP threads (the single rank
+    layout is always tried) and, with enough ranks, no separate PME ranks or a quarter or a third of the ranks
+    doing PME. With gpu_pme (mdrun -pme gpu) multi-rank layouts have the single separate PME rank GROMACS requires. """
+    layouts: list[MdrunLayout] = []
+    for ntmpi in range(1, ncores + 1):
+        if ncores % ntmpi or (ntmpi > 1 and ncores // ntmpi > max_omp_threads):
+            continue
+        pme_ranks = [0]
+        if gpu_pme:
+            pme_ranks = [1 if ntmpi > 1 else 0]
+        elif separate_pme and ntmpi >= TUNING_MIN_PME_RANKS_SPLIT:
+            pme_ranks += sorted({ntmpi // 4, ntmpi // 3} - {0})
+        layouts.extend(MdrunLayout(ntmpi, ncores // ntmpi, npme) for npme in pme_ranks)
+    return layouts
+
+
+def tuning_key(natoms: int, box: Optional[np.ndarray], cutoffs: dict, ncores: int, cpu_signature: str,
+               gmx_version: str = '', mdrun_args: Sequence[str] = ()) -> str:
+    """ Key of the tuning cache. Systems with the same number of atoms (3 significant digits), box (0.1 nm),
+    cut-offs and mdrun options on the same host and GROMACS version share the best layout. """
+    key = {
+        'natoms': float(f"{natoms:.3g}"),
+        'box': np.round(np.asarray(box, dtype=float), 1).ravel().tolist() if box is not None else None,
+        'cutoffs': {name: cutoffs[name] for name in sorted(cutoffs)},
+        'ncores': ncores,
+        'cpu': cpu_signature,
+        'gmx_version': gmx_version,
+        'mdrun_args': list(mdrun_args),
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def _tuning_cache_path() -> Path:
+    return gmx_cache_dir().joinpath(TUNING_CACHE_FILE)
+
+
+def _load_tuning_cache() -> dict:
+    try:
+        with open(_tuning_cache_path()) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def read_tuned_layout(key: str) -> Optional[MdrunLayout]:
+    """ Best layout stored in the tuning cache for the key, None if the key is not cached. """
+    entry = _load_tuning_cache().get(key)
+    try:
+        return MdrunLayout(*(int(entry['layout'][name]) for name in MdrunLayout._fields))  # type: ignore[index]
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def write_tuned_layout(key: str, layout: MdrunLayout, ns_per_day: float, description: Optional[dict] = None) -> None:
+    """ Stores the best layout of the key in the tuning cache. Failures to write the cache are ignored. """
+    cache_path = _tuning_cache_path()
+    cache = _load_tuning_cache()
+    cache[key] = {'layout': layout._asdict(), 'ns_per_day': ns_per_day, 'system': description or {}}
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and rename it so concurrent steps never read a partial cache
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(cache, cache_file, indent=2)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def run_tuning_trial(input_tpr_path: str, layout: MdrunLayout, work_dir: str, nsteps: int = 2000, gmx: str = 'gmx',
+                     mdrun_args: Sequence[str] = (), timeout: Optional[float] = None) -> TuningTrial:
+    """ Runs a short mdrun with the layout, resetting the timers halfway so the setup and the load balancing
+    do not count, and reads its ns/day from the log. Failed trials (eg: no domain decomposition is possible)
+    are returned with the error reported by GROMACS. """
+    name = f"trial_{layout.ntmpi}x{layout.ntomp}_pme{layout.npme}"
+    cmd = shlex.split(gmx) + ['mdrun', '-s', str(Path(input_tpr_path).resolve()), '-deffnm', name, '-nsteps', str(nsteps),
+                              '-resethway', '-noconfout', *layout.args(), *mdrun_args]
+    try:
+        process = subprocess.run(cmd, cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                                 errors='replace', timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return TuningTrial(layout, None, f"Timeout after {timeout} s")
+    log_path = Path(work_dir).joinpath(f"{name}.log")
+    ns_per_day = read_mdrun_log(str(log_path))['performance']['ns_per_day'] if log_path.exists() else None
+    if process.returncode or ns_per_day is None:
+        return TuningTrial(layout, None, _fatal_error(process.stderr) or f"mdrun exit code {process.returncode}")
+    return TuningTrial(layout, ns_per_day)
+
+
+def _fatal_error(stderr: str) -> str:
+    """ First line of the GROMACS fatal error message. """
+    lines = stderr.splitlines()
+    for number, line in enumerate(lines):
+        if line.startswith('Fatal error:'):
+            return next((message.strip() for message in lines[number + 1:] if message.strip()), '')
+    return ''
+
+
+def autotune_mdrun(input_tpr_path: str, layouts: Sequence[MdrunLayout], work_dir: str, nsteps: int = 2000, gmx: str = 'gmx',
+                   mdrun_args: Sequence[str] = (), timeout: Optional[float] = None) -> tuple[Optional[TuningTrial], list[TuningTrial]]:
+    """ Runs a trial for every layout and returns the fastest one (None if all of them failed) and all the trials. """
+    Path(work_dir).mkdir(parents=True, exist_ok=True)
+    trials = [run_tuning_trial(input_tpr_path, layout, work_dir, nsteps, gmx, mdrun_args, timeout) for layout in layouts]
+    successful = [trial for trial in trials if trial.ns_per_day is not None]
+    return max(successful, key=lambda trial: trial.ns_per_day or 0.0, default=None), trials
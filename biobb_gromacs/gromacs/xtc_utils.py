@@ -0,0 +1,342 @@
+""" Native reader for the GROMACS compressed trajectory format XTC """
+import os
+import struct
+from pathlib import Path
+from typing import BinaryIO, Iterator, NamedTuple, Optional, Sequence, Union
+import numpy as np
+
+
+XTC_MAGIC = 1995
+# Magic number of the XTC frames with 64 bit compressed data sizes (GROMACS 2023 and later)
+XTC_MAGIC_LARGE = 2023
+# Systems with up to this number of atoms are stored uncompressed
+XTC_MAX_UNCOMPRESSED_ATOMS = 9
+
+_FIRSTIDX = 9
+_MAGICINTS = (
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 8, 10, 12, 16, 20, 25, 32, 40, 50, 64,
+    80, 101, 128, 161, 203, 256, 322, 406, 512, 645, 812, 1024, 1290,
+    1625, 2048, 2580, 3250, 4096, 5060, 6501, 8192, 10321, 13003,
+    16384, 20642, 26007, 32768, 41285, 52015, 65536, 82570, 104031,
+    131072, 165140, 208063, 262144, 330280, 416127, 524287, 660561,
+    832255, 1048576, 1321122, 1664510, 2097152, 2642245, 3329021,
+    4194304, 5284491, 6658042, 8388607, 10568983, 13316085, 16777216)
+
+
+class XtcFrame(NamedTuple):
+    """ Frame of an XTC trajectory. Coordinates and box are in nm. """
+    step: int
+    time: float
+    box: np.ndarray
+    coords: np.ndarray
+
+
+class XtcIndex(NamedTuple):
+    """ Byte offsets, steps and times of the complete frames of an XTC file. The file size and modification
+    time (ns) it was built from and the end offset of the last complete frame are kept to validate and extend it. """
+    offsets: np.ndarray
+    steps: np.ndarray
+    times: np.ndarray
+    size: int
+    mtime_ns: int
+    end: int
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+
+def read_xtc(input_xtc_path: str, start: int = 0, stop: Optional[int] = None, stride: int = 1,
+             atom_indices: Union[Sequence[int], np.ndarray, slice, None] = None,
+             index: Optional[XtcIndex] = None) -> Iterator[XtcFrame]:
+    """ Yields the frames of an XTC trajectory file from start to stop (0-based, stop excluded) every stride
+    frames, keeping only the atoms in atom_indices. Frames are read one at a time, so memory does not depend
+    on the length of the trajectory, and the compressed data of the frames not yielded is skipped without decoding.
+    With an index (see :func:`xtc_index`) the file is positioned directly at each yielded frame. """
+    if start < 0 or stride < 1:
+        raise ValueError(f"Wrong XTC frame range: start {start} must be 0 or bigger and stride {stride} 1 or bigger")
+    with open(input_xtc_path, 'rb') as xtc_file:
+        if index is not None:
+            for offset in index.offsets[start:stop:stride]:
+                xtc_file.seek(int(offset))
+                frame = read_xtc_frame(xtc_file, atom_indices)
+                if frame is None:
+                    return
+                yield frame
+            return
+        frame_number = 0
+        while stop is None or frame_number < stop:
+            if frame_number >= start and (frame_number - start) % stride == 0:
+                frame = read_xtc_frame(xtc_file, atom_indices)
+                if frame is None:
+                    return
+                yield frame
+            elif not skip_xtc_frame(xtc_file):
+                return
+            frame_number += 1
+
+
+def xtc_index_path(input_xtc_path: str) -> str:
+    """ Path of the sidecar offsets file of an XTC file: a hidden .<name>_offsets.npz file in the same directory. """
+    xtc_path = Path(input_xtc_path)
+    return str(xtc_path.with_name(f".{xtc_path.stem}_offsets.npz"))
+
+
+def xtc_index(input_xtc_path: str, sidecar: bool = True) -> XtcIndex:
+    """ Returns the frame index of an XTC file. With sidecar the index is loaded from the sidecar file
+    (see :func:`xtc_index_path`) if it is still valid, the frames appended since it was written are
+    scanned and the updated index is written back. A sidecar file that can not be written is ignored. """
+    stat = os.stat(input_xtc_path)
+    index_path = xtc_index_path(input_xtc_path)
+    index = _load_xtc_index(index_path) if sidecar else None
+    if index is not None and (index.size, index.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+        return index
+    if index is not None and not _is_xtc_index_prefix(input_xtc_path, index, stat.st_size):
+        index = None
+    index = _scan_xtc_index(input_xtc_path, stat, index)
+    if sidecar:
+        try:
+            _save_xtc_index(index_path, index)
+        except OSError:
+            pass
+    return index
+
+
+def _scan_xtc_index(input_xtc_path: str, stat: os.stat_result, previous: Optional[XtcIndex] = None) -> XtcIndex:
+    """ Scans the frame headers from the end of the previous index (or from the start). A truncated last
+    frame (eg: a trajectory still being written) is left out of the index. """
+    offsets: list[int] = []
+    steps: list[int] = []
+    times: list[float] = []
+    end = previous.end if previous is not None else 0
+    with open(input_xtc_path, 'rb') as xtc_file:
+        xtc_file.seek(end)
+        while stat.st_size - end >= 16:
+            header = _read_header(xtc_file)
+            if header is None:
+                break
+            magic, natoms, step, time = header
+            try:
+                _skip_coords(xtc_file, magic, natoms)
+            except ValueError:
+                break
+            if xtc_file.tell() > stat.st_size:
+                break
+            offsets.append(end)
+            steps.append(step)
+            times.append(time)
+            end = xtc_file.tell()
+    index = XtcIndex(offsets=np.asarray(offsets, dtype=np.int64), steps=np.asarray(steps, dtype=np.int64),
+                     times=np.asarray(times, dtype=np.float32), size=stat.st_size, mtime_ns=stat.st_mtime_ns, end=end)
+    if previous is not None:
+        index = index._replace(offsets=np.concatenate((previous.offsets, index.offsets)),
+                               steps=np.concatenate((previous.steps, index.steps)),
+                               times=np.concatenate((previous.times, index.times)))
+    return index
+
+
+def _is_xtc_index_prefix(input_xtc_path: str, index: XtcIndex, size: int) -> bool:
+    """ An index can be extended if the file has grown and its last indexed frame header is unchanged. """
+    if size < index.end:
+        return False
+    if not len(index):
+        return True
+    with open(input_xtc_path, 'rb') as xtc_file:
+        xtc_file.seek(int(index.offsets[-1]))
+        try:
+            header = _read_header(xtc_file)
+        except ValueError:
+            return False
+    return header is not None and header[2] == index.steps[-1] and np.float32(header[3]) == index.times[-1]
+
+
+def _load_xtc_index(index_path: str) -> Optional[XtcIndex]:
+    if not Path(index_path).exists():
+        return None
+    try:
+        with np.load(index_path) as data:
+            return XtcIndex(offsets=data['offsets'], steps=data['steps'], times=data['times'],
+                            size=int(data['size']), mtime_ns=int(data['mtime_ns']), end=int(data['end']))
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save_xtc_index(index_path: str, index: XtcIndex) -> None:
+    # Write and rename so concurrent readers never load a partial index
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as index_file:
+        np.savez(index_file, offsets=index.offsets, steps=index.steps, times=index.times,
+                 size=index.size, mtime_ns=index.mtime_ns, end=index.end)
+    os.replace(tmp_path, index_path)
+
+
+def read_xtc_natoms(input_xtc_path: str) -> int:
+    """ Returns the number of atoms of the first frame of an XTC file. """
+    with open(input_xtc_path, 'rb') as xtc_file:
+        header = _read_header(xtc_file)
+    if header is None:
+        raise ValueError(f"Empty XTC file {input_xtc_path}")
+    return header[1]
+
+
+def read_xtc_frame(xtc_file: BinaryIO, atom_indices: Union[Sequence[int], np.ndarray, slice, None] = None) -> Optional[XtcFrame]:
+    """ Reads the frame at the current position of an open XTC file. Returns None at the end of the file. """
+    header = _read_header(xtc_file)
+    if header is None:
+        return None
+    magic, natoms, step, time = header
+    box = np.frombuffer(_read_exactly(xtc_file, 36), dtype='>f4').astype(np.float32).reshape(3, 3)
+    coords = _read_coords(xtc_file, natoms, magic)
+    if atom_indices is not None:
+        coords = coords[atom_indices]
+    return XtcFrame(step=step, time=float(time), box=box, coords=coords)
+
+
+def skip_xtc_frame(xtc_file: BinaryIO) -> bool:
+    """ Moves an open XTC file to the start of the next frame reading only the frame and data size headers.
+    Returns False at the end of the file. """
+    header = _read_header(xtc_file)
+    if header is None:
+        return False
+    _skip_coords(xtc_file, *header[:2])
+    return True
+
+
+def _skip_coords(xtc_file: BinaryIO, magic: int, natoms: int) -> None:
+    xtc_file.seek(36 + 4, 1)
+    if natoms <= XTC_MAX_UNCOMPRESSED_ATOMS:
+        xtc_file.seek(natoms * 12, 1)
+        return
+    xtc_file.seek(4 + 28, 1)
+    if magic == XTC_MAGIC_LARGE:
+        (nbytes,) = struct.unpack('>q', _read_exactly(xtc_file, 8))
+    else:
+        (nbytes,) = struct.unpack('>i', _read_exactly(xtc_file, 4))
+    xtc_file.seek((nbytes + 3) // 4 * 4, 1)
+
+
+def _read_header(xtc_file: BinaryIO) -> Optional[tuple[int, int, int, float]]:
+    header = xtc_file.read(16)
+    if not header:
+        return None
+    if len(header) < 16:
+        raise ValueError(f"Truncated XTC frame header in {xtc_file.name}")
+    magic, natoms, step, time = struct.unpack('>iiif', header)
+    if magic not in (XTC_MAGIC, XTC_MAGIC_LARGE):
+        raise ValueError(f"Wrong XTC magic number {magic} in {xtc_file.name}")
+    return magic, natoms, step, time
+
+
+def _read_exactly(xtc_file: BinaryIO, size: int) -> bytes:
+    data = xtc_file.read(size)
+    if len(data) < size:
+        raise ValueError(f"Truncated XTC frame in {xtc_file.name}")
+    return data
+
+
+def _read_coords(xtc_file: BinaryIO, natoms: int, magic: int) -> np.ndarray:
+    (lsize,) = struct.unpack('>i', _read_exactly(xtc_file, 4))
+    if lsize != natoms:
+        raise ValueError(f"Inconsistent number of atoms in XTC frame of {xtc_file.name}: {natoms} != {lsize}")
+    if natoms <= XTC_MAX_UNCOMPRESSED_ATOMS:
+        return np.frombuffer(_read_exactly(xtc_file, natoms * 12), dtype='>f4').astype(np.float32).reshape(natoms, 3)
+
+    precision, = struct.unpack('>f', _read_exactly(xtc_file, 4))
+    int_header = struct.unpack('>7i', _read_exactly(xtc_file, 28))
+    minint, maxint, smallidx = int_header[0:3], int_header[3:6], int_header[6]
+    if magic == XTC_MAGIC_LARGE:
+        (nbytes,) = struct.unpack('>q', _read_exactly(xtc_file, 8))
+    else:
+        (nbytes,) = struct.unpack('>i', _read_exactly(xtc_file, 4))
+    # XDR opaque data is padded to a multiple of 4 bytes
+    data = _read_exactly(xtc_file, (nbytes + 3) // 4 * 4)
+    int_coords = _decompress_coords(data, natoms, minint, maxint, smallidx)
+    return (int_coords / np.float32(precision)).astype(np.float32)
+
+
+def _decompress_coords(data: bytes, natoms: int, minint: tuple, maxint: tuple, smallidx: int) -> np.ndarray:
+    """ Port of the xdr3dfcoord decompression of the GROMACS xdrfile library. Returns the integer coordinates. """
+    bits = _BitReader(data)
+    sizeint = [maxint[k] - minint[k] + 1 for k in range(3)]
+    if any(size > 0xffffff for size in sizeint):
+        # Large systems: each coordinate is stored with its own number of bits
+        bitsizeint = [min(size.bit_length(), 32) for size in sizeint]
+        bitsize = 0
+    else:
+        bitsizeint = [0, 0, 0]
+        bitsize = (sizeint[0] * sizeint[1] * sizeint[2]).bit_length()
+
+    smaller = _MAGICINTS[max(_FIRSTIDX, smallidx - 1)] // 2
+    smallnum = _MAGICINTS[smallidx] // 2
+    sizesmall = _MAGICINTS[smallidx]
+
+    coords = np.empty((natoms, 3), dtype=np.int64)
+    i = 0
+    run = 0
+    while i < natoms:
+        if bitsize == 0:
+            this = [bits.read(bitsizeint[k]) + minint[k] for k in range(3)]
+        else:
+            this = [v + minint[k] for k, v in enumerate(bits.read_ints(bitsize, sizeint))]
+        prev = this
+        if bits.read(1):
+            run = bits.read(5)
+            is_smaller = run % 3
+            run -= is_smaller
+            is_smaller -= 1
+        else:
+            is_smaller = 0
+        if run > 0:
+            for k in range(0, run, 3):
+                small = bits.read_ints(smallidx, (sizesmall, sizesmall, sizesmall))
+                this = [small[n] + prev[n] - smallnum for n in range(3)]
+                if k == 0:
+                    # The first two atoms of a run are interchanged for a better compression of water molecules
+                    coords[i] = this
+                    this, prev = prev, this
+                    i += 1
+                else:
+                    prev = this
+                coords[i] = this
+                i += 1
+        else:
+            coords[i] = this
+            i += 1
+        smallidx += is_smaller
+        if is_smaller < 0:
+            smallnum = smaller
+            smaller = _MAGICINTS[smallidx - 1] // 2 if smallidx > _FIRSTIDX else 0
+        elif is_smaller > 0:
+            smaller = smallnum
+            smallnum = _MAGICINTS[smallidx] // 2
+        sizesmall = _MAGICINTS[smallidx]
+    return coords
+
+
+class _BitReader:
+    """ Reads big endian bit fields from a bytes buffer. """
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def read(self, nbits: int) -> int:
+        start = self.pos >> 3
+        end = (self.pos + nbits + 7) >> 3
+        value = int.from_bytes(self.data[start:end], 'big') >> (end * 8 - self.pos - nbits)
+        self.pos += nbits
+        return value & ((1 << nbits) - 1)
+
+    def read_ints(self, nbits: int, sizes) -> list[int]:
+        """ Reads three integers packed as a single number in mixed radix (sizes) stored as little endian bytes. """
+        value = 0
+        shift = 0
+        while nbits > 8:
+            value |= self.read(8) << shift
+            shift += 8
+            nbits -= 8
+        if nbits > 0:
+            value |= self.read(nbits) << shift
+        z = value % sizes[2]
+        value //= sizes[2]
+        y = value % sizes[1]
+        return [value // sizes[1], y, z]
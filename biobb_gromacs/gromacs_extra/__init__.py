@@ -1,5 +1,6 @@
 from . import append_ligand
+from . import mass_repartition
 from . import ndx2resttop
 
 name = "gromacs_extra"
-__all__ = ["append_ligand", "ndx2resttop"]
+__all__ = ["append_ligand", "mass_repartition", "ndx2resttop"]
@@ -2,7 +2,6 @@
 
 """Module containing the AppendLigand class and the command line interface."""
 
-import re
 import shutil
 from pathlib import Path
 from typing import Optional
@@ -10,6 +9,7 @@ from typing import Optional
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
+from biobb_gromacs.gromacs.top_utils import Topology, TopNode, include_nodes
 
 
 class AppendLigand(BiobbObject):
@@ -95,17 +95,10 @@ class AppendLigand(BiobbObject):
         top_dir = str(Path(top_file).parent)
         itp_name = str(Path(str(self.io_dict["in"].get("input_itp_path"))).name)
 
-        with open(top_file) as top_f:
-            top_lines = top_f.readlines()
-            top_f.close()
+        top = Topology.from_file(top_file)
         fu.rm(top_file)
 
-        forcefield_pattern = r"#include.*forcefield.itp\""
-        if top_lines:
-            for ff_index, line in enumerate(top_lines):
-                if re.search(forcefield_pattern, line):
-                    break
-        else:
+        if not len(top):
             fu.log(
                 f'FATAL: Input topfile {top_file} from input_top_zip_path {self.io_dict["in"].get("input_top_zip_path")} is empty.',
                 self.out_log,
@@ -113,128 +106,71 @@ class AppendLigand(BiobbObject):
             )
             return 1
 
-        ligand_itp_path = self.io_dict["in"].get("input_itp_path")
-
-        # Read ligand itp contents
-        with open(ligand_itp_path, 'r') as itp_file:
-            ligand_itp_contents = itp_file.readlines()
-
-        # Separate ligand [ atomtypes ] section from the rest
-        lig_atomtypes_section = []
-        remaining_itp_contents = []
-        in_atomtypes_section = False
-        for line in ligand_itp_contents:
-            if line.strip().startswith("[ atomtypes ]"):
-                in_atomtypes_section = True
-                lig_atomtypes_section.append(line)
-            elif in_atomtypes_section:
-                if line.strip() == "" or line.startswith("["):
-                    in_atomtypes_section = False
-                    remaining_itp_contents.append(line)
-                else:
-                    lig_atomtypes_section.append(line)
-            else:
-                remaining_itp_contents.append(line)
-
-        # If the ligand itp contains an [ atomtypes ] section, merge it into the main topology
-        if lig_atomtypes_section:
-
-            # Look for the [ atomtypes ] section in the main topology
-            top_atomtypes_section = []
-            in_atomtypes_section = False
-            for line in top_lines:
-                if line.strip().startswith("[ atomtypes ]"):
-                    in_atomtypes_section = True
-                    top_atomtypes_section.append(line)
-                elif in_atomtypes_section:
-                    if line.strip() == "" or line.startswith("["):
-                        in_atomtypes_section = False
-                    else:
-                        top_atomtypes_section.append(line)
-
-            # If there is already an [ atomtypes ] section in the main topology
-            if top_atomtypes_section:
-
-                # Remove the header and comments of the ligand [ atomtypes ] section
-                lig_atomtypes_section = lig_atomtypes_section[2:]
-
-                # Remove the [ atomtypes ] section from top_lines
-                top_lines = [line for line in top_lines if line not in top_atomtypes_section]
-
+        # Read ligand itp, its [ atomtypes ] section is merged into the main topology
+        ligand = Topology.from_file(str(self.io_dict["in"].get("input_itp_path")))
+        lig_atomtypes_sections = ligand.directives("atomtypes")
+        for lig_atomtypes in lig_atomtypes_sections:
+            ligand.remove(lig_atomtypes)
+
+        # The [ atomtypes ] of the main topology and the ligand are written after the forcefield include
+        top_atomtypes_sections = top.directives("atomtypes") if lig_atomtypes_sections else []
+        for top_atomtypes in top_atomtypes_sections:
+            top.remove(top_atomtypes)
+        ff_index = top.find_include("forcefield.itp")
+        if ff_index is None:
+            raise ValueError(f"Forcefield include not found in {top_file}")
+        # The new sections go right after the include line, before the comments and blank lines that follow it
+        ff_tail = TopNode("text", "", top.nodes[ff_index].lines[1:])
+        del top.nodes[ff_index].lines[1:]
+        top.insert(ff_index + 1, [ff_tail])
+        index = ff_index + 1
+
+        if lig_atomtypes_sections:
             # NOTE: Check for repeated atoms in the [ atomtypes ] section
             # NOTE: raise error if there are conflicts - atoms named equally with different parameters
             # NOTE: raise error if there are different number of columns in the atomtypes sections
-
-            top_lines.insert(ff_index + 1, "\n")
-
-            # Merge both [ atomtypes ] sections
-            atomtype_section = top_atomtypes_section + lig_atomtypes_section
-
-            # Write the merged [ atomtypes ] section into the main topology after the forcefield include
-            for atomtype_index in range(len(atomtype_section)):
-                top_lines.insert(ff_index + atomtype_index + 2, atomtype_section[atomtype_index])
-
-            # Update the index for the remaining directives
-            at_index = ff_index + atomtype_index + 2
-        else:
-            at_index = ff_index
-
-        top_lines.insert(at_index + 1, "\n")
-        top_lines.insert(at_index + 2, "; Including ligand ITP\n")
-        top_lines.insert(at_index + 3, '#include "' + itp_name + '"\n')
-        top_lines.insert(at_index + 4, "\n")
+            if top_atomtypes_sections:
+                # Keep the header and comments of the main topology and only the data lines of the ligand
+                atomtype_section = top_atomtypes_sections[0]
+                for extra_section in top_atomtypes_sections[1:] + lig_atomtypes_sections:
+                    atomtype_section.insert_data(extra_section.lines[position] for position, _ in extra_section.data_lines())
+            else:
+                atomtype_section = lig_atomtypes_sections[0]
+                for extra_section in lig_atomtypes_sections[1:]:
+                    atomtype_section.insert_data(extra_section.lines[position] for position, _ in extra_section.data_lines())
+            # Drop the trailing blank lines, the ligand include starts with one
+            last_data_line = max((position for position, _ in atomtype_section.data_lines()), default=0)
+            del atomtype_section.lines[last_data_line + 1:]
+            index = top.insert(index, [TopNode("text", "", ["\n"]), atomtype_section])
+
+        index = top.insert(index, include_nodes(itp_name, comment="Including ligand ITP"))
         if self.io_dict["in"].get("input_posres_itp_path"):
-            top_lines.insert(at_index + 5, "; Ligand position restraints" + "\n")
-            top_lines.insert(at_index + 6, "#ifdef " + self.posres_name + "\n")
-            top_lines.insert(
-                at_index + 7,
-                '#include "' + str(Path(self.io_dict["in"].get("input_posres_itp_path", "")).name) + '"\n'
-            )
-            top_lines.insert(at_index + 8, "#endif" + "\n")
-            top_lines.insert(at_index + 9, "\n")
-
-        inside_moleculetype_section = False
-        with open(self.io_dict["in"].get("input_itp_path", "")) as itp_file:
-            moleculetype_pattern = r"\[ moleculetype \]"
-            for line in itp_file:
-                if re.search(moleculetype_pattern, line):
-                    inside_moleculetype_section = True
-                    continue
-                if inside_moleculetype_section and not line.startswith(";"):
-                    moleculetype = line.strip().split()[0].strip()
-                    break
-
-        molecules_pattern = r"\[ molecules \]"
-        inside_molecules_section = False
-        index_molecule = None
+            posres_nodes = include_nodes(str(Path(self.io_dict["in"].get("input_posres_itp_path", "")).name),
+                                         define=self.posres_name, comment="Ligand position restraints")
+            # The blank line after the ligand include separates both blocks
+            posres_nodes[0].lines.pop(0)
+            top.insert(index, posres_nodes)
+
+        moleculetype = ligand.moleculetypes()[0].name
         molecule_string = (
             str(moleculetype) + int(20 - len(moleculetype)) * " " + "1" + "\n"
         )
-        for index, line in enumerate(top_lines):
-            if re.search(molecules_pattern, line):
-                inside_molecules_section = True
-                continue
-            if (
-                inside_molecules_section and not line.startswith(";") and line.upper().startswith("PROTEIN")
-            ):
-                index_molecule = index
-
-        if index_molecule:
-            top_lines.insert(index_molecule + 1, molecule_string)
+        # Add the ligand after the last protein molecule or at the end of the [ molecules ] section
+        molecules_sections = top.directives("molecules")
+        if molecules_sections:
+            protein_lines = [position for position, _ in molecules_sections[-1].data_lines()
+                             if molecules_sections[-1].lines[position].upper().startswith("PROTEIN")]
+            molecules_sections[-1].insert_data([molecule_string], protein_lines[-1] if protein_lines else None)
         else:
-            top_lines.append(molecule_string)
+            top.insert(len(top), [TopNode("text", "", [molecule_string])])
 
         new_top = fu.create_name(
             path=top_dir, prefix=self.prefix, step=self.step, name="ligand.top"
         )
-
-        with open(new_top, "w") as new_top_f:
-            new_top_f.write("".join(top_lines))
+        top.write(new_top)
 
         # Create a new itp ligand file without the [ atomtypes ] section
-        new_ligand_tip_path = str(Path(top_dir) / itp_name)
-        with open(new_ligand_tip_path, 'w') as new_itp_file:
-            new_itp_file.write("".join(remaining_itp_contents))
+        ligand.write(str(Path(top_dir) / itp_name))
 
         if self.io_dict["in"].get("input_posres_itp_path"):
             shutil.copy2(self.io_dict["in"].get("input_posres_itp_path", ""), top_dir)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""Module containing the MassRepartition class and the command line interface."""
+import re
+from pathlib import Path
+from typing import Optional
+from biobb_common.generic.biobb_object import BiobbObject
+from biobb_common.tools import file_utils as fu
+from biobb_common.tools.file_utils import launchlogger
+
+
+class MassRepartition(BiobbObject):
+    """
+    | biobb_gromacs MassRepartition
+    | Hydrogen mass repartitioning of a GROMACS topology.
+    | This module rewrites the masses of the [ atoms ] section of every molecule type in a compressed GROMACS topology, moving mass from each heavy atom to its bonded hydrogens while conserving the total mass of the molecule. Together with constraints on the bonds involving hydrogens it allows 4 fs time steps (see the nvt_hmr, npt_hmr and free_hmr simulation types of the Grompp building block). Molecule types with a [ settles ] section (rigid water) are left untouched.
+
+    Args:
+        input_top_zip_path (str): Path the input GROMACS topology TOP and ITP files in zip format. File type: input. `Sample file <https://github.com/bioexcel/biobb_gromacs/raw/master/biobb_gromacs/test/data/gromacs/genion.zip>`_. Accepted formats: zip (edam:format_3987).
+        output_top_zip_path (str): Path the output GROMACS topology TOP and ITP files in zip format. File type: output. `Sample file <https://github.com/bioexcel/biobb_gromacs/raw/master/biobb_gromacs/test/reference/gromacs_extra/ref_mass_repartition.zip>`_. Accepted formats: zip (edam:format_3987).
+        properties (dict - Python dictionary object containing the tool parameters, not input/output files):
+            * **hydrogen_mass_factor** (*float*) - (3.0) [1~5|0.1] Factor applied to the mass of every hydrogen bonded to a heavy atom. The added mass is subtracted from the bonded heavy atom.
+            * **remove_tmp** (*bool*) - (True) [WF property] Remove temporal files.
+            * **restart** (*bool*) - (False) [WF property] Do not execute if output files exist.
+            * **sandbox_path** (*str*) - ("./") [WF property] Parent path to the sandbox directory.
+
+    Examples:
+        This is a use example of how to use the building block from Python::
+
+            from biobb_gromacs.gromacs_extra.mass_repartition import mass_repartition
+            prop = { 'hydrogen_mass_factor': 3.0 }
+            mass_repartition(input_top_zip_path='/path/to/myTopology.zip',
+                             output_top_zip_path='/path/to/newTopology.zip',
+                             properties=prop)
+
+    Info:
+        * wrapped_software:
+            * name: In house
+            * license: Apache-2.0
+        * ontology:
+            * name: EDAM
+            * schema: http://edamontology.org/EDAM.owl
+    """
+
+    def __init__(self, input_top_zip_path: str, output_top_zip_path: str,
+                 properties: Optional[dict] = None, **kwargs) -> None:
+        properties = properties or {}
+
+        # Call parent class constructor
+        super().__init__(properties)
+        self.locals_var_dict = locals().copy()
+
+        # Input/Output files
+        self.io_dict = {
+            "in": {"input_top_zip_path": input_top_zip_path},
+            "out": {"output_top_zip_path": output_top_zip_path}
+        }
+
+        # Properties specific for BB
+        self.hydrogen_mass_factor = float(properties.get('hydrogen_mass_factor', 3.0))
+
+        # Check the properties
+        self.check_properties(properties)
+        self.check_arguments()
+
+    @launchlogger
+    def launch(self) -> int:
+        """Execute the :class:`MassRepartition <gromacs_extra.mass_repartition.MassRepartition>` object."""
+        # Setup Biobb
+        if self.check_restart():
+            return 0
+
+        if self.hydrogen_mass_factor < 1.0:
+            raise ValueError(f"hydrogen_mass_factor must be 1.0 or bigger: {self.hydrogen_mass_factor}")
+
+        # Unzip topology
+        top_file = fu.unzip_top(zip_file=self.io_dict["in"].get("input_top_zip_path", ""), out_log=self.out_log,
+                                unique_dir=self.stage_io_dict.get("unique_dir", ""))
+        top_dir = Path(top_file).parent
+
+        for topology_file in sorted(top_dir.iterdir()):
+            if topology_file.suffix not in ('.top', '.itp'):
+                continue
+            with open(topology_file) as top_f:
+                lines = top_f.readlines()
+            repartitioned = repartition_topology_lines(lines, self.hydrogen_mass_factor)
+            for molecule_name, n_hydrogens in repartitioned:
+                fu.log(f'{topology_file.name}: {molecule_name} {n_hydrogens} hydrogen masses repartitioned', self.out_log, self.global_log)
+            if repartitioned:
+                with open(topology_file, 'w') as top_f:
+                    top_f.writelines(lines)
+
+        # zip topology
+        fu.log(f'Compressing topology to: {self.io_dict["out"].get("output_top_zip_path")}', self.out_log, self.global_log)
+        fu.zip_top(zip_file=self.io_dict["out"].get("output_top_zip_path", ""), top_file=top_file,
+                   out_log=self.out_log, remove_original_files=self.remove_tmp)
+
+        # Remove temporal files
+        self.tmp_files.append(str(top_dir))
+        self.remove_tmp_files()
+
+        self.check_arguments(output_files_created=True, raise_exception=False)
+        return 0
+
+
+DIRECTIVE_RE = re.compile(r"^\s*\[\s*(\w+)\s*\]")
+# Hydrogen atoms are detected by mass so already repartitioned topologies are not modified twice
+HYDROGEN_MASS_RANGE = (0.9, 1.2)
+
+
+def repartition_topology_lines(lines: list[str], hydrogen_mass_factor: float = 3.0) -> list[tuple[str, int]]:
+    """ Repartitions in place the hydrogen masses of every molecule type defined in
+    the lines of a TOP or ITP file. Returns a list of (molecule name, number of
+    repartitioned hydrogens) tuples. Raises ValueError if a heavy atom mass
+    becomes non positive. """
+    molecules: list[dict] = []
+    directive = ''
+    molecule: dict = {}
+    for index, line in enumerate(lines):
+        stripped = line.split(';')[0].strip()
+        directive_match = DIRECTIVE_RE.match(stripped)
+        if directive_match:
+            directive = directive_match.group(1).lower()
+            if directive == 'moleculetype':
+                molecule = {'name': '', 'atoms': {}, 'bonds': set(), 'settles': False}
+                molecules.append(molecule)
+            continue
+        if not stripped or stripped.startswith('#') or not molecule:
+            continue
+        fields = stripped.split()
+        if directive == 'moleculetype' and not molecule['name']:
+            molecule['name'] = fields[0]
+        elif directive == 'atoms':
+            molecule['atoms'][int(fields[0])] = index
+        elif directive in ('bonds', 'constraints') and len(fields) >= 2:
+            molecule['bonds'].add(tuple(sorted((int(fields[0]), int(fields[1])))))
+        elif directive == 'settles':
+            molecule['settles'] = True
+
+    repartitioned = []
+    for molecule in molecules:
+        if molecule['settles'] or not molecule['atoms']:
+            continue
+        n_hydrogens = _repartition_molecule(lines, molecule, hydrogen_mass_factor)
+        if n_hydrogens:
+            repartitioned.append((molecule['name'], n_hydrogens))
+    return repartitioned
+
+
+def _repartition_molecule(lines: list[str], molecule: dict, hydrogen_mass_factor: float) -> int:
+    atoms: dict[int, int] = molecule['atoms']
+    n_hydrogens = 0
+    # Mass columns of the [ atoms ] lines: mass and the optional B state mass
+    for mass_column in (7, 10):
+        masses = {}
+        for atom, index in atoms.items():
+            fields = lines[index].split(';')[0].split()
+            if len(fields) <= mass_column:
+                # Masses not defined in [ atoms ] are taken from the atom types and can not be repartitioned
+                return n_hydrogens
+            masses[atom] = float(fields[mass_column])
+
+        new_masses = dict(masses)
+        repartitioned_hydrogens = 0
+        for atom_i, atom_j in sorted(molecule['bonds']):
+            if atom_i not in masses or atom_j not in masses:
+                continue
+            if _is_hydrogen(masses[atom_i]) == _is_hydrogen(masses[atom_j]):
+                continue
+            hydrogen, heavy = (atom_i, atom_j) if _is_hydrogen(masses[atom_i]) else (atom_j, atom_i)
+            delta = masses[hydrogen] * (hydrogen_mass_factor - 1.0)
+            new_masses[hydrogen] += delta
+            new_masses[heavy] -= delta
+            repartitioned_hydrogens += 1
+
+        for atom, mass in new_masses.items():
+            if mass <= 0:
+                raise ValueError(f"Repartitioning {molecule['name']} atom {atom} leaves it with a non positive mass ({mass:.5f}). Use a smaller hydrogen_mass_factor.")
+            if mass != masses[atom]:
+                lines[atoms[atom]] = _replace_field(lines[atoms[atom]], mass_column, _format_mass(mass))
+        if mass_column == 7:
+            n_hydrogens = repartitioned_hydrogens
+    return n_hydrogens
+
+
+def _is_hydrogen(mass: float) -> bool:
+    return HYDROGEN_MASS_RANGE[0] < mass < HYDROGEN_MASS_RANGE[1]
+
+
+def _format_mass(mass: float) -> str:
+    return f"{mass:.5f}".rstrip('0').rstrip('.')
+
+
+def _replace_field(line: str, column: int, value: str) -> str:
+    """ Replaces the whitespace separated field in column keeping the right alignment of the line. """
+    data_end = line.find(';') if ';' in line else len(line.rstrip('\n'))
+    spans = [match.span() for match in re.finditer(r"\S+", line[:data_end])]
+    start = spans[column - 1][1] if column else 0
+    end = spans[column][1]
+    width = end - start
+    field = value.rjust(width) if len(value) < width else ' ' + value
+    return line[:start] + field + line[end:]
+
+
+def mass_repartition(input_top_zip_path: str, output_top_zip_path: str,
+                     properties: Optional[dict] = None, **kwargs) -> int:
+    """Create :class:`MassRepartition <gromacs_extra.mass_repartition.MassRepartition>` class and
+    execute the :meth:`launch() <gromacs_extra.mass_repartition.MassRepartition.launch>` method."""
+    return MassRepartition(**dict(locals())).launch()
+
+
+mass_repartition.__doc__ = MassRepartition.__doc__
+main = MassRepartition.get_main(mass_repartition, "Hydrogen mass repartitioning of a GROMACS topology.")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,12 @@
 """Module containing the Ndx2resttop class and the command line interface."""
 import fnmatch
 from typing import Optional
-from typing import Any
 from pathlib import Path
 from biobb_common.generic.biobb_object import BiobbObject
 from biobb_common.tools import file_utils as fu
 from biobb_common.tools.file_utils import launchlogger
+from biobb_gromacs.gromacs.ndx_utils import read_ndx
+from biobb_gromacs.gromacs.top_utils import Topology, include_nodes
 
 
 class Ndx2resttop(BiobbObject):
@@ -69,66 +70,6 @@ class Ndx2resttop(BiobbObject):
 
     # --- Private helpers ---
 
-    def _parse_ndx_groups(self, ndx_lines: list) -> dict:
-        """Parse a GROMACS NDX file into a lookup table of group line ranges.
-
-        NDX format: each named group starts with a ``[ group_name ]`` header line,
-        followed by one or more rows of whitespace-separated global atom indices.
-
-        Returns a dict mapping the raw header string (e.g. ``'[ System ]'``) to a
-        two-element list ``[start_line, end_line]`` where the range is **half-open**
-        (matching Python slice semantics): ``ndx_lines[start_line:end_line]`` yields
-        the data rows for that group (the header line itself at ``start_line - 1`` is
-        excluded).
-
-        Edge cases handled:
-
-        - **Last group**: the final group has no successor header to trigger the end
-          assignment, so it is closed explicitly with ``index + 1`` (not ``index``)
-          to include the very last data line.
-        - **Single-content-line groups**: when a header is immediately followed by
-          another header (no trailing blank line), the default range would be
-          ``[H, H+1]`` giving an empty slice. The post-loop fix increments end by 1
-          to capture that single data line.
-        """
-        groups_dic: dict[str, Any] = {}
-        current_group = ''
-        previous_group = ''
-
-        for index, line in enumerate(ndx_lines):
-            if line.startswith('['):
-                current_group = line
-                groups_dic[current_group] = [index, 0]
-                if previous_group:
-                    groups_dic[previous_group][1] = index
-                previous_group = current_group
-
-            if index == len(ndx_lines) - 1:
-                groups_dic[current_group][1] = index + 1
-
-        # Fix single-content-line groups
-        for group_name in groups_dic:
-            if groups_dic[group_name][0] + 1 == groups_dic[group_name][1]:
-                groups_dic[group_name][1] += 1
-
-        return groups_dic
-
-    def _read_ndx_atoms(self, ndx_lines: list, groups_dic: dict, group_name: str) -> list:
-        """Return the flat list of global atom indices for a named NDX group.
-
-        Slices the group's data rows from ndx_lines using the half-open range
-        stored in groups_dic, then flattens all whitespace-separated tokens into
-        a single list of integers.
-
-        Returned integers are **global** (system-wide) GROMACS atom numbers, 1-based.
-        """
-        key = f'[ {group_name} ]'
-        start = groups_dic[key][0] + 1
-        stop = groups_dic[key][1]
-        fu.log(f'{group_name}: start_closed={start} stop_open={stop}', self.out_log, self.global_log)
-        atoms = [int(atom) for line in ndx_lines[start:stop] for atom in line.split()]
-        return atoms
-
     def _write_posre_itp(self, itp_path: str, selected_atoms: list) -> None:
         """Write a GROMACS position restraint ITP file.
 
@@ -147,71 +88,28 @@ class Ndx2resttop(BiobbObject):
     def _insert_posres_in_top(self, top_file: str, molecule_name: str, posre_name: str, itp_name: str) -> None:
         """Splice the #ifdef posres block into the .top file for single-chain topologies.
 
-        Uses a two-phase scan over the topology lines:
-
-        Phase 1 – locate the target moleculetype:
-          For each ``[ moleculetype ]`` directive, read the first non-comment
-          content line and compare its first token against ``molecule_name``.
-          Set ``found_molecule = True`` when matched.
-
-        Phase 2 – find the insertion point (only after found_molecule):
-          Scan forward for the earliest of:
+        The block is inserted after the ``[ moleculetype ]`` of ``molecule_name``,
+        just before the earliest of:
           - another top-level section (``[ moleculetype ]``, ``[ system ]``,
             ``[ molecules ]``)
           - an existing ``#include`` or ``#ifdef POSRES`` line
-          Insert immediately before that line. Fall back to EOF if none found.
-
-        Important: the insertion-point check (Phase 2) runs *before* the
-        ``[ moleculetype ]`` detector within the same loop iteration. Without this
-        ordering, a new ``[ moleculetype ]`` that should trigger insertion would
-        instead be consumed by the ``continue`` in the detector, causing the block
-        to be placed in the wrong molecule section.
+        Fall back to EOF if none found.
         """
-        with open(top_file, 'r') as f:
-            lines = f.readlines()
-
-        in_moleculetype = False
-        found_molecule = False
-        index = None
-
-        for i, line in enumerate(lines):
-            stripped = line.strip()
-
-            # Find insertion point: just before the next top-level section or existing restraint block
-            if found_molecule:
-                is_next_section = stripped.startswith('[') and (
-                    'system' in stripped or 'molecules' in stripped or 'moleculetype' in stripped)
-                if is_next_section or line.startswith('#include ') or line.startswith('#ifdef POSRES'):
-                    index = i
-                    break
-
-            # Detect [ moleculetype ] directive
-            if stripped.startswith('[') and 'moleculetype' in stripped:
-                in_moleculetype = True
-                continue
-
-            # Find the molecule name line inside the [ moleculetype ] block
-            if in_moleculetype:
-                if stripped and not stripped.startswith(';'):
-                    in_moleculetype = False
-                    if not stripped.startswith('[') and stripped.split()[0] == molecule_name:
-                        found_molecule = True
-
-        if not found_molecule:
+        top = Topology.from_file(top_file)
+        molecule_index = top.find_moleculetype(molecule_name)
+        if molecule_index is None:
             raise ValueError(f"Molecule type '{molecule_name}' not found in the topology file")
 
-        if index is None:
-            index = len(lines)
-
-        lines.insert(index, '\n')
-        lines.insert(index + 1, '; Include Position restraint file\n')
-        lines.insert(index + 2, f'#ifdef {posre_name}\n')
-        lines.insert(index + 3, f'#include "{itp_name}"\n')
-        lines.insert(index + 4, '#endif\n')
-        lines.insert(index + 5, '\n')
+        index = len(top)
+        for node_index in range(molecule_index + 1, len(top)):
+            node = top.nodes[node_index]
+            if (node.kind == 'directive' and node.name in ('moleculetype', 'system', 'molecules')) or \
+                    node.kind == 'include' or (node.kind == 'ifdef' and node.name.startswith('POSRES')):
+                index = node_index
+                break
 
-        with open(top_file, 'w') as f:
-            f.writelines(lines)
+        top.insert(index, include_nodes(itp_name, define=posre_name, comment='Include Position restraint file'))
+        top.write(top_file)
 
     # --- Main entry point ---
 
@@ -223,9 +121,8 @@ class Ndx2resttop(BiobbObject):
 
         top_file = fu.unzip_top(zip_file=self.io_dict['in'].get("input_top_zip_path", ""), out_log=self.out_log, unique_dir=self.stage_io_dict.get("unique_dir", ""))
 
-        ndx_lines = open(self.io_dict['in'].get("input_ndx_path", "")).read().splitlines()
-        groups_dic = self._parse_ndx_groups(ndx_lines)
-        fu.log(f'Parsed NDX groups: {list(groups_dic.keys())}', self.out_log, self.global_log)
+        ndx = read_ndx(self.io_dict['in'].get("input_ndx_path", ""))
+        fu.log(f'Parsed NDX groups: {ndx.names()}', self.out_log, self.global_log)
 
         # Parse triplet string: "(ref, restrain, mol), ..." -> list of 3-tuples
         raw_triplets = str(self.ref_rest_mol_triplet_list).split('),')
@@ -262,13 +159,14 @@ class Ndx2resttop(BiobbObject):
             self.io_dict['out']["output_itp_path"] = itp_path
 
             # Map global NDX indices -> molecule-local 1-based indices.
-            # reference_atoms.index(atom) gives the 0-based position of each global
-            # restrain atom within the reference group list. Adding 1 converts to
-            # GROMACS 1-based local numbering, which matches the atom order in the
+            # The 1-based position of each global restrain atom within the reference
+            # group is the GROMACS local numbering, which matches the atom order in the
             # [ atoms ] section of each moleculetype block.
-            reference_atoms = self._read_ndx_atoms(ndx_lines, groups_dic, reference_group)
-            restrain_atoms = self._read_ndx_atoms(ndx_lines, groups_dic, restrain_group)
-            selected_atoms = [reference_atoms.index(atom) + 1 for atom in restrain_atoms]
+            for group_name in (reference_group, restrain_group):
+                if group_name not in ndx:
+                    raise ValueError(f"Group {group_name} not found in {self.io_dict['in'].get('input_ndx_path')}")
+                fu.log(f'{group_name}: {len(ndx[group_name])} atoms', self.out_log, self.global_log)
+            selected_atoms = ndx[reference_group].positions(ndx[restrain_group]).tolist()
 
             self._write_posre_itp(itp_path, selected_atoms)
             itp_name = Path(itp_path).name
@@ -287,12 +185,7 @@ class Ndx2resttop(BiobbObject):
                         multi_chain = True
                         with open(str(file_dir), 'a') as f:
                             fu.log(f'Opening {file_dir} and adding ifdef include', self.out_log, self.global_log)
-                            f.write('\n')
-                            f.write('; Include Position restraint file\n')
-                            f.write(f'#ifdef {posre_name}\n')
-                            f.write(f'#include "{itp_name}"\n')
-                            f.write('#endif\n')
-                            f.write('\n')
+                            f.writelines(Topology(include_nodes(itp_name, define=posre_name, comment='Include Position restraint file')).lines())
 
             # Single-chain: splice ifdef block into the .top file
             if not multi_chain:
@@ -0,0 +1,113 @@
+# type: ignore
+import hashlib
+import shutil
+import struct
+from pathlib import Path
+import pytest
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.tpr_utils import read_tpr_header
+from biobb_gromacs.gromacs.mdrun import Mdrun
+from biobb_gromacs.gromacs.cpt_utils import CPT_MAGIC, find_resume_checkpoint, read_cpt_header, read_cpt_output_files, verify_cpt_output_file
+
+
+def _string(value):
+    data = value.encode()
+    return struct.pack('>i', len(data)) + data + b'\0' * (-len(data) % 4)
+
+
+def _vector(element_type, values):
+    return struct.pack(f">2i{len(values)}{'f' if element_type == 1 else 'd' if element_type == 2 else 'i'}", len(values), element_type, *values)
+
+
+def write_cpt(path, natoms=5, files=(('md.log', 12345), ('md.edr', 2 ** 33 + 7)), step=250000, checksums=None):
+    """ Writes a single precision MD checkpoint with box, x, v, kinetic energy and energy history entries. """
+    header = struct.pack('>i', CPT_MAGIC) + b''.join(_string(value) for value in ('VERSION 2024.5', '', '', '', 'gmx mdrun', 'Mon Jan  1 00:00:00 2024'))
+    header += struct.pack('>2i', 22, 0) + _string('host')
+    # natoms, ngtc, nhchainlength, nnhpres, nlambda, integrator, simulation part, step, time, PP ranks, DD grid, PME ranks
+    header += struct.pack('>7iqd5i', natoms, 1, 10, 1, 0, 0, 3, step, step / 500, 4, 2, 2, 1, 0)
+    # state, kinetic energy, energy history, df, ED, swap, AWH and pull flags and modular simulator
+    header += struct.pack('>9i', 0b111, 0b1111, 0b11111111, 0, 0, 0, 0, 0, 0)
+    state = _vector(1, [3.0, 0, 0, 0, 3.0, 0, 0, 0, 3.0]) + _vector(1, [0.1] * natoms * 3) + _vector(1, [0.2] * natoms * 3)
+    ekin = _vector(0, [1]) + struct.pack('>i', 1) + _vector(1, [0.0] * 9) + _vector(1, [0.0]) + _vector(1, [0.0])
+    energy_history = (_vector(0, [2]) + _vector(2, [1.0, 2.0]) + _vector(2, [3.0, 4.0]) + struct.pack('>q', 10)
+                      + _vector(2, [5.0, 6.0]) + struct.pack('>3q', 20, 30, 40))
+    output_files = struct.pack('>i', len(files))
+    for filename, offset in files:
+        output_files += _string(filename) + struct.pack('>iIi', offset >> 32, offset & 0xFFFFFFFF, min(offset, 1048576))
+        output_files += struct.pack('>16I', *(checksums or {}).get(filename, range(16)))
+    with open(path, 'wb') as cpt_file:
+        cpt_file.write(header + state + ekin + energy_history + output_files + struct.pack('>i', 171819))
+
+
+class TestCptUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'cpt_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_read_cpt_header(self):
+        write_cpt(self.paths['output_cpt_path'])
+        header = read_cpt_header(self.paths['output_cpt_path'])
+        assert header.gromacs_version == '2024.5' and header.generating_program == 'gmx mdrun' and header.file_version == 22
+        assert header.natoms == 5 and header.integrator == 'md' and header.double is False
+        assert header.step == 250000 and header.time == 500.0 and header.simulation_part == 3
+        assert header.pp_ranks == 4 and header.dd_grid == (2, 2, 1) and header.pme_ranks == 0
+
+    def test_read_cpt_output_files(self):
+        write_cpt(self.paths['output_cpt_path'])
+        output_files = read_cpt_output_files(self.paths['output_cpt_path'])
+        assert [output_file.filename for output_file in output_files] == ['md.log', 'md.edr']
+        assert output_files[1].offset == 2 ** 33 + 7 and output_files[1].checksum_size == 1048576
+        assert output_files[0].checksum == bytes(range(16)).hex()
+
+    def test_truncated_cpt(self):
+        write_cpt(self.paths['output_cpt_path'])
+        with open(self.paths['output_cpt_path'], 'r+b') as cpt_file:
+            cpt_file.truncate(200)
+        with pytest.raises(ValueError):
+            read_cpt_output_files(self.paths['output_cpt_path'])
+
+    def test_find_resume_checkpoint(self):
+        cpt_dir = Path(self.paths['output_cpt_path']).parent
+        log_content = b'Step Time\n' * 20
+        cpt_dir.joinpath('md.log').write_bytes(log_content)
+        checksums = {'md.log': hashlib.md5(log_content[:150]).digest()}
+        write_cpt(self.paths['output_cpt_path'], files=[('md.log', 150)], step=1000, checksums=checksums)
+        prev_cpt_path = str(cpt_dir.joinpath('output_prev.cpt'))
+        write_cpt(prev_cpt_path, files=[('md.log', 150)], step=500, checksums=checksums)
+        output_file = read_cpt_output_files(self.paths['output_cpt_path'])[0]
+        assert verify_cpt_output_file(output_file, str(cpt_dir.joinpath('md.log')))
+
+        resume = find_resume_checkpoint([prev_cpt_path, self.paths['output_cpt_path']], natoms=5, required_files=['md.log'])
+        assert resume.cpt_path == self.paths['output_cpt_path'] and resume.header.step == 1000 and resume.append
+        assert find_resume_checkpoint([self.paths['output_cpt_path']], natoms=6) is None
+        assert find_resume_checkpoint([self.paths['output_cpt_path']], required_files=['other.log']) is None
+
+        # Log modified before the checkpoint offset: continue in new files
+        cpt_dir.joinpath('md.log').write_bytes(b'X' + log_content[1:])
+        assert not verify_cpt_output_file(output_file, str(cpt_dir.joinpath('md.log')))
+        resume = find_resume_checkpoint([self.paths['output_cpt_path']], natoms=5)
+        assert not resume.append and resume.missing_files == ['md.log']
+
+    def test_mdrun_resume_sandbox(self):
+        natoms = read_tpr_header(self.paths['input_tpr_path']).natoms
+        sandbox_path = Path(self.paths['output_cpt_path']).parent.joinpath('workflow')
+        log_content = b'Step Time\n' * 20
+        checksums = {'output.log': hashlib.md5(log_content[:150]).digest()}
+        # Killed sandboxes of this step and of another step sharing the sandbox_path, with the same output names
+        for sandbox_name, step in (('sandbox_own', 500), ('sandbox_other', 50000)):
+            sandbox_dir = sandbox_path.joinpath(sandbox_name)
+            sandbox_dir.mkdir(parents=True, exist_ok=True)
+            sandbox_dir.joinpath('output.log').write_bytes(log_content)
+            write_cpt(str(sandbox_dir.joinpath('output.cpt')), natoms=natoms, files=[('output.log', 150)], step=step, checksums=checksums)
+        shutil.copy2(self.paths['input_tpr_path'], sandbox_path.joinpath('sandbox_own'))
+        sandbox_path.joinpath('sandbox_other', Path(self.paths['input_tpr_path']).name).write_bytes(b'other step TPR')
+        # A gmx that can not be started only leaves the last step of the run unknown
+        mdrun_obj = Mdrun(input_tpr_path=self.paths['input_tpr_path'], output_gro_path=str(sandbox_path.joinpath('output.gro')),
+                          output_edr_path=str(sandbox_path.joinpath('output.edr')), output_log_path=str(sandbox_path.joinpath('output.log')),
+                          output_cpt_path=str(sandbox_path.joinpath('output.cpt')),
+                          properties={'auto_resume': True, 'sandbox_path': str(sandbox_path), 'binary_path': 'gmx_not_installed'})
+        resume = mdrun_obj.find_resume_checkpoint()
+        assert resume.cpt_path == str(sandbox_path.joinpath('sandbox_own', 'output.cpt')) and resume.header.step == 500 and resume.append
@@ -0,0 +1,45 @@
+# type: ignore
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.dd_utils import DD_DLB_CELL_SCALING, dd_grids, feasible_rank_counts, max_cutoff, plan_layout, plan_layouts
+from biobb_gromacs.gromacs.tpr_utils import read_tpr_header
+from biobb_gromacs.gromacs.tune_utils import cpu_topology
+
+
+class TestDdUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'dd_utils')
+        self.box = read_tpr_header(self.paths['input_tpr_path']).box
+        self.cutoff = max_cutoff({'nstlist': 10, 'rlist': 1.0, 'rcoulomb': 1.0, 'rvdw': 0.9})
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_dd_grids(self):
+        for grid, halo in dd_grids(12, self.box, self.cutoff):
+            assert grid[0] * grid[1] * grid[2] == 12
+            for length, cells in zip(self.box.diagonal(), grid):
+                assert cells == 1 or length / cells * DD_DLB_CELL_SCALING >= self.cutoff
+        assert not dd_grids(128, self.box, self.cutoff)
+
+    def test_plan_layout(self):
+        plan = plan_layout(8, 2, self.box, self.cutoff, npme=2)
+        assert plan.pp_ranks == 6 and plan.grid in ((1, 2, 3), (1, 3, 2), (2, 1, 3), (2, 3, 1), (3, 1, 2), (3, 2, 1))
+        # 5 cells at most along each dimension: more than 125 PP ranks can not be decomposed
+        assert plan_layout(200, 1, self.box, self.cutoff) is None
+        feasible = feasible_rank_counts(self.box, self.cutoff, 40)
+        assert 28 not in feasible and 32 in feasible
+
+    def test_plan_layouts(self):
+        plans = plan_layouts(64, self.box, self.cutoff, threads_per_core=2)
+        assert plans and plans == sorted(plans, key=lambda plan: plan.score)
+        # Every layout uses all the hardware threads without splitting a core
+        assert all(64 % plan.ranks == 0 and plan.ranks * plan.ntomp == 128 for plan in plans)
+        assert all(plan.ntomp <= 16 for plan in plans)
+        assert all(plan.npme == 0 for plan in plan_layouts(64, self.box, self.cutoff, threads_per_core=2, separate_pme=False))
+        assert all(plan.npme == (1 if plan.ranks > 1 else 0) for plan in plan_layouts(64, self.box, self.cutoff, gpu_pme=True))
+
+    def test_cpu_topology(self):
+        topology = cpu_topology()
+        assert topology.ncores >= 1 and topology.threads_per_core >= 1
+        assert len(topology.cpus) == len(set(topology.cpus))
@@ -0,0 +1,57 @@
+# type: ignore
+import struct
+import threading
+import numpy as np
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.edr_utils import EDR_FRAME_MAGIC, iter_edr, read_edr, read_edr_terms
+
+
+class TestEdrUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'edr_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_read_edr(self):
+        terms = read_edr_terms(self.paths['input_edr_path'])
+        assert len(terms) == 50
+        assert ('Temperature', 'K') in terms
+        energies = read_edr(self.paths['input_edr_path'], ['Temperature', 'pressure', 'Density', 'Potential'])
+        assert energies['Step'].tolist() == [0, 5000, 10000, 15000]
+        assert np.allclose(energies['Time'], [0, 10, 20, 30])
+        assert np.allclose(energies['Temperature'], [304.22968, 300.54544, 298.10715, 300.31644])
+        assert np.all((energies['Density'] > 1000) & (energies['Density'] < 1050))
+
+    def test_follow_edr(self):
+        with open(self.paths['input_edr_path'], 'rb') as edr_file:
+            data = edr_file.read()
+        # Header, two frames and part of the third one: an mdrun still writing
+        written = 2160 + 100
+        with open(self.paths['output_edr_path'], 'wb') as edr_file:
+            edr_file.write(data[:written])
+        assert len(list(iter_edr(self.paths['output_edr_path']))) == 2
+
+        def append():
+            with open(self.paths['output_edr_path'], 'ab') as edr_file:
+                edr_file.write(data[written:])
+
+        writer = threading.Timer(0.2, append)
+        writer.start()
+        frames = list(iter_edr(self.paths['output_edr_path'], terms=['Temperature'], follow=True, poll_interval=0.05, timeout=1.0))
+        writer.join()
+        assert [frame.step for frame in frames] == [0, 5000, 10000, 15000]
+        assert frames[-1].energies.shape == (1,)
+
+    def test_skip_frames_without_energies(self):
+        with open(self.paths['input_edr_path'], 'rb') as edr_file:
+            data = edr_file.read()
+        # Single precision frame at step 2500 with no energy terms and a block of 4 dH/dl floats
+        dhdl_frame = (data[1216:1220] + struct.pack('>2idqiqd3i', EDR_FRAME_MAGIC, 5, 5.0, 2500, 0, 0, 0.002, 0, 0, 1)
+                      + struct.pack('>4i', 0, 1, 4, 1) + bytes(12) + struct.pack('>4f', 0.5, 1.0, 1.5, 2.0))
+        with open(self.paths['output_edr_path'], 'wb') as edr_file:
+            edr_file.write(data[:1488] + dhdl_frame + data[1488:])
+        energies = read_edr(self.paths['output_edr_path'], ['Temperature'])
+        assert energies['Step'].tolist() == [0, 5000, 10000, 15000]
+        assert np.allclose(energies['Temperature'], [304.22968, 300.54544, 298.10715, 300.31644])
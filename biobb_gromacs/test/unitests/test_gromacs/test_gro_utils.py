@@ -0,0 +1,58 @@
+# type: ignore
+import numpy as np
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.gro_utils import GroStructure, GroView, iter_gro, read_gro, read_gro_header, write_gro
+
+
+class TestGroUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'gro_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_gro_round_trip(self):
+        gro = read_gro(self.paths['input_gro_path'])
+        assert gro.natoms == 1196
+        assert gro.v is None
+        assert (gro.resname[0], gro.atomname[0], gro.resid[0], gro.atomid[-1]) == ('SER', 'N', 1, 1196)
+        assert np.allclose(gro.xyz[0], [2.270, 1.214, 5.506])
+        write_gro(self.paths['output_gro_path'], gro, precision=self.properties['precision'])
+        assert fx.equal(self.paths['output_gro_path'], self.paths['input_gro_path'])
+
+    def test_gro_velocities_round_trip(self):
+        gro = read_gro(self.paths['input_velocities_gro_path'])
+        assert np.allclose(gro.v[0], [-0.4940, -0.2488, 0.8606])
+        write_gro(self.paths['output_gro_path'], gro, precision=self.properties['precision'])
+        with open(self.paths['output_gro_path']) as output_file, open(self.paths['input_velocities_gro_path']) as input_file:
+            assert output_file.read() == input_file.read()
+
+    def test_gro_wraparound(self):
+        natoms = 5
+        gro = GroStructure(title='wrap', resid=np.arange(natoms) + 99998, resname=np.array(['SOL'] * natoms),
+                           atomname=np.array(['OW'] * natoms), atomid=np.arange(natoms) + 99998,
+                           xyz=np.array([[-0.0004, 1.5, -123.456]] * natoms), box=np.array([1.0, 1.0, 1.0]))
+        write_gro(self.paths['output_gro_path'], gro)
+        with open(self.paths['output_gro_path']) as output_file:
+            lines = output_file.readlines()
+        assert lines[4] == '    0SOL     OW    0  -0.000   1.500-123.456\n'
+        frames = list(iter_gro(self.paths['output_gro_path']))
+        assert len(frames) == 1
+        assert np.array_equal(frames[0].resid, gro.resid)
+        assert np.array_equal(frames[0].atomid, gro.atomid)
+        assert np.allclose(frames[0].xyz[:, 2], -123.456)
+
+    def test_gro_view(self):
+        header = read_gro_header(self.paths['input_velocities_gro_path'])
+        assert header.natoms == 33838
+        assert np.allclose(header.box, [6.94633, 6.94633, 6.94633])
+        gro = read_gro(self.paths['input_velocities_gro_path'])
+        with GroView(self.paths['input_velocities_gro_path']) as view:
+            assert len(view) == gro.natoms
+            atom = view[-1]
+            assert atom.atomid[0] == gro.atomid[-1]
+            assert atom.atomname[0] == gro.atomname[-1]
+            assert np.array_equal(atom.v, gro.v[-1:])
+            assert np.array_equal(view.column('xyz', slice(100, 200)), gro.xyz[100:200])
+            assert np.array_equal(view.column('resname'), gro.resname)
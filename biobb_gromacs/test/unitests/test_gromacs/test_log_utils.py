@@ -0,0 +1,43 @@
+# type: ignore
+import json
+import shutil
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.log_utils import performance_report_path, read_mdrun_log, write_performance_report
+
+
+class TestLogUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'log_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_read_mdrun_log(self):
+        report = read_mdrun_log(self.paths['input_log_path'])
+        assert report['finished']
+        assert report['performance'] == {'ns_per_day': 15.146, 'hours_per_ns': 1.585}
+        assert report['time']['wall_s'] == 171.144
+        assert report['neighbor_search'] == {'nstlist_input': 10, 'rlist_input': 1.0, 'nstlist': 40, 'rlist': 1.096}
+        assert report['parallelization']['openmp_threads'] == 8
+        assert report['hardware']['logical_cores'] == 8
+        tasks = {task['task']: task for task in report['accounting']['tasks']}
+        assert tasks['Force']['calls'] == 15001 and tasks['Force']['percent'] == 76.3
+        assert tasks['Rest']['ranks'] is None
+        assert [task['task'] for task in report['accounting']['breakdowns']['PME mesh computation']][0] == 'PME spread'
+
+    def test_load_balance(self):
+        shutil.copy(self.paths['input_log_path'], self.paths['output_log_path'])
+        with open(self.paths['output_log_path'], 'a') as log_file:
+            log_file.write("Domain decomposition grid 3 x 1 x 1, separate PME ranks 1\n"
+                           "              optimal pme grid 48 48 48, coulomb cutoff 1.187\n"
+                           " Average load imbalance: 2.3%.\n"
+                           " Part of the total run time spent waiting due to load imbalance: 1.4%.\n"
+                           " Average PME mesh/force load: 0.877\n"
+                           " Part of the total run time spent waiting due to PP/PME imbalance: 1.7 %\n")
+        report = write_performance_report(self.paths['output_log_path'])
+        with open(performance_report_path(self.paths['output_log_path'])) as report_file:
+            assert json.load(report_file) == report
+        assert report['parallelization']['dd_grid'] == [3, 1, 1] and report['parallelization']['pme_ranks'] == 1
+        assert report['load_balance'] == {'dd_average_imbalance_percent': 2.3, 'dd_time_lost_percent': 1.4, 'pme_mesh_force_load': 0.877,
+                                          'pme_time_lost_percent': 1.7, 'pme_tuning': {'grid': [48, 48, 48], 'coulomb_cutoff': 1.187}}
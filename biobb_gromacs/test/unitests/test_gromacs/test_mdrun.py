@@ -1,6 +1,7 @@
 # type: ignore
+import pytest
 from biobb_common.tools import test_fixtures as fx
-from biobb_gromacs.gromacs.mdrun import mdrun
+from biobb_gromacs.gromacs.mdrun import Mdrun, mdrun
 from biobb_gromacs.gromacs.common import gmx_rms
 
 
@@ -20,3 +21,18 @@ class TestMdrun():
         assert fx.not_empty(self.paths['output_edr_path'])
         assert fx.not_empty(self.paths['output_log_path'])
         assert fx.exe_success(returncode)
+
+    def test_mdrun_single_compressed_trajectory(self):
+        with pytest.raises(ValueError):
+            Mdrun(properties=self.properties, output_xtc_path='output.xtc', output_tng_path='output.tng',
+                  **{key: value for key, value in self.paths.items() if not key.startswith('ref_')})
+
+    def test_mdrun_performance_flags(self):
+        paths = {key: value for key, value in self.paths.items() if not key.startswith('ref_')}
+        mdrun_obj = Mdrun(properties={**self.properties, 'maxh': 23.5, 'dlb': 'yes', 'pin': 'on', 'pinoffset': 8, 'pinstride': 1, 'tunepme': False}, **paths)
+        assert mdrun_obj.performance_args() == ['-maxh', '23.5', '-dlb', 'yes', '-notunepme', '-pin', 'on', '-pinoffset', '8', '-pinstride', '1']
+        # Pinning offsets are ignored by mdrun unless pinning is forced
+        with pytest.raises(ValueError):
+            Mdrun(properties={**self.properties, 'pinoffset': 8}, **paths)
+        with pytest.raises(ValueError):
+            Mdrun(properties={**self.properties, 'dlb': 'always'}, **paths)
@@ -0,0 +1,39 @@
+# type: ignore
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.common import compare_files, gmx_check
+
+
+class TestNativeCheck:
+    def setup_class(self):
+        fx.test_setup(self, 'native_check')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_native_check_gro(self):
+        assert gmx_check(self.paths['input_gro_path'], self.paths['ref_gro_path'])
+        diff = compare_files(self.paths['input_gro_path'], self.paths['other_gro_path'])
+        assert not diff['equal']
+        assert diff['differences'][0]['field'] == 'natoms'
+
+    def test_native_check_ndx(self):
+        assert gmx_check(self.paths['input_ndx_path'], self.paths['input_ndx_path'])
+        diff = compare_files(self.paths['input_ndx_path'], self.paths['ref_ndx_path'], early_exit=self.properties['early_exit'])
+        assert not diff['equal']
+        assert diff['differences'][0]['field'] == 'names'
+
+    def test_native_check_itp(self):
+        assert gmx_check(self.paths['input_itp_path'], self.paths['input_itp_path'])
+        assert not gmx_check(self.paths['input_itp_path'], self.paths['ref_itp_path'])
+
+    def test_native_check_mdp(self):
+        with open('a.mdp', 'w') as mdp_file:
+            mdp_file.write('dt = 0.002\nnsteps = 100\ntc_grps = Protein Non-Protein\n')
+        with open('b.mdp', 'w') as mdp_file:
+            mdp_file.write('; same parameters\ndt=2e-3\nnsteps = 100\ntc-grps = protein non-protein\n')
+        assert gmx_check('a.mdp', 'b.mdp')
+        with open('b.mdp', 'a') as mdp_file:
+            mdp_file.write('ref-t = 300\n')
+        diff = compare_files('a.mdp', 'b.mdp', early_exit=self.properties['early_exit'])
+        assert diff['differences'] == [{'location': 'parameter ref-t', 'field': 'ref-t', 'a': None, 'b': '300'}]
@@ -0,0 +1,30 @@
+# type: ignore
+import numpy as np
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.common import gmx_rms, kabsch_rmsd, native_rms, read_trajectory_coords
+
+
+class TestNativeRms:
+    def setup_class(self):
+        fx.test_setup(self, 'native_rms')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_kabsch_rmsd_rotation(self):
+        _, frames = read_trajectory_coords(self.paths['input_gro_path'])
+        angle = np.pi / 3
+        rotation = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+        rotated = frames[0] @ rotation.T + 1.5
+        assert np.allclose(kabsch_rmsd(frames[0], rotated), 0, atol=1e-6)
+
+    def test_native_rms_gro(self):
+        assert native_rms(self.paths['input_gro_path'], self.paths['ref_gro_path'])
+
+    def test_native_rms_xtc(self):
+        _, frames = read_trajectory_coords(self.paths['input_xtc_path'])
+        assert frames.shape == (4, 1196, 3)
+        assert gmx_rms(self.paths['input_xtc_path'], self.paths['input_xtc_path'], self.paths['input_gro_path'], tolerance=1e-6)
+        assert not native_rms(self.paths['input_xtc_path'], self.paths['input_gro_path'], tolerance=self.properties['tolerance'])
+        assert native_rms(self.paths['input_xtc_path'], self.paths['input_gro_path'])
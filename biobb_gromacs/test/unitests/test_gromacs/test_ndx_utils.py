@@ -0,0 +1,49 @@
+# type: ignore
+import filecmp
+import numpy as np
+import pytest
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.ndx_utils import Ndx, NdxGroup, parse_ndx, read_ndx
+
+
+class TestNdxUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'ndx_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_read_write_ndx(self):
+        ndx = read_ndx(self.paths['input_ndx_path'])
+        assert ndx.names()[:3] == ['System', 'Protein', 'Protein-H']
+        assert len(ndx['System']) == 31633 and ndx['System'].is_run_length_encoded
+        assert np.array_equal(ndx['System'].atoms, np.arange(1, 31634))
+        assert ndx['C-alpha'].atoms.dtype == np.int32 and ndx['C-alpha'].atoms[0] == 5
+        ndx.write(self.paths['output_ndx_path'])
+        assert filecmp.cmp(self.paths['output_ndx_path'], self.paths['input_ndx_path'], shallow=False)
+
+    def test_set_operations(self):
+        ndx = read_ndx(self.paths['input_ndx_path'])
+        side_chain = ndx['SideChain'].intersection(ndx['Protein-H'])
+        assert side_chain == ndx['SideChain-H']
+        assert ndx['MainChain+Cb'].difference(ndx['MainChain']).union(ndx['MainChain']) == ndx['MainChain+Cb']
+        assert np.array_equal(NdxGroup([4, 5, 9]).renumber([0, 0, 0, 1, 2, 0, 0, 0, 3]).atoms, [1, 2, 3])
+        assert np.array_equal(ndx['Protein'].positions([7, 3]), [7, 3])
+        with pytest.raises(ValueError):
+            NdxGroup([1, 2]).positions([3])
+
+    def test_run_length_encoding(self):
+        atoms = np.concatenate((np.arange(1, 3000), np.arange(5000, 9000), [12, 7]))
+        group = NdxGroup(atoms)
+        assert group.is_run_length_encoded and len(group) == len(atoms)
+        assert np.array_equal(group.atoms, atoms)
+        assert group == NdxGroup.from_runs(*group.runs)
+
+    def test_parse_ndx(self):
+        ndx = parse_ndx("[ A ]\n1 2 3\n[ B ]\n\n[ A ]\n4\n[C]\n  10   11\n")
+        assert ndx.names() == ['A', 'B', 'C'] and np.array_equal(ndx['A'].atoms, [1, 2, 3]) and len(ndx['B']) == 0
+        assert ndx == Ndx({'A': [1, 2, 3], 'B': [], 'C': [10, 11]})
+        assert ndx.setdefault(' A ', [5]) is ndx['A'] and len(ndx.setdefault('D', [5])) == 1 and list(ndx) == ['A', 'B', 'C', 'D']
+        with pytest.raises(ValueError, match='group A of NDX content'):
+            parse_ndx("[ A ]\n1 2 x\n")
@@ -0,0 +1,54 @@
+# type: ignore
+from pathlib import Path
+import pytest
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.pack_utils import NodeCore, core_slices, node_cores, parse_cpulist, run_packed
+
+
+class FakeMdrun:
+    """ Job recording the mdrun threads and pinning it would use """
+    def __init__(self, output_path, returncode=0):
+        self.output_path, self.returncode = output_path, returncode
+        self.num_threads, self.pin, self.pinoffset, self.pinstride = '', 'auto', 0, 0
+
+    def launch(self):
+        Path(self.output_path).write_text(f"{self.num_threads} {self.pin} {self.pinoffset} {self.pinstride}")
+        return self.returncode
+
+
+class TestPackUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'pack_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_core_slices(self):
+        assert parse_cpulist('0-3,8,10-11\n') == [0, 1, 2, 3, 8, 10, 11]
+        # 2 NUMA nodes of 3 cores with 2 hardware threads
+        cores = [NodeCore((core, core + 6), core // 3, 2 * core) for core in range(6)]
+        slices = core_slices(cores, 2)
+        # Slices do not span NUMA nodes: the last core of each node is left unused
+        assert [core_slice.cpus for core_slice in slices] == [[0, 1, 6, 7], [3, 4, 9, 10]]
+        assert [core_slice.pinoffset for core_slice in slices] == [0, 6]
+        assert all(core_slice.nthreads == 4 and len(core_slice.numa_nodes) == 1 for core_slice in slices)
+        # Larger slices than a NUMA node take whole nodes
+        assert [len(core_slice.cores) for core_slice in core_slices(cores, 4)] == [4]
+        assert not core_slices(cores, 7)
+
+    def test_run_packed(self):
+        cores = node_cores()
+        assert cores and len({cpu for core in cores for cpu in core.cpus}) == sum(len(core.cpus) for core in cores)
+        cpus = list(cores[0].cpus)
+        output_paths = [str(Path(self.paths['output_dir']).joinpath(f'job{index}.txt')) for index in range(3)]
+        Path(self.paths['output_dir']).mkdir(parents=True, exist_ok=True)
+        jobs = [FakeMdrun(output_paths[0]), FakeMdrun(output_paths[1], returncode=3), FakeMdrun(output_paths[2])]
+        # The three jobs share a single core slice, so they run one after the other
+        runs = run_packed(jobs, cores_per_job=1, cpus=cpus)
+        assert [run.returncode for run in runs] == [0, 3, 0]
+        for output_path in output_paths:
+            assert Path(output_path).read_text() == f"{len(cpus)} on {cores[0].offset} 1"
+        # Address space limits would cap the virtual memory: memory limits need a cgroup
+        with pytest.raises(ValueError):
+            run_packed(jobs, cores_per_job=1, cpus=cpus, memory_limit=1)
@@ -0,0 +1,52 @@
+# type: ignore
+import numpy as np
+import pytest
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.pdb_utils import hybrid36_decode, pdb_summary, read_pdb
+
+
+class TestPdbUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'pdb_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_read_pdb(self):
+        pdb = read_pdb(self.paths['input_pdb_path'])
+        with open(self.paths['input_pdb_path']) as pdb_file:
+            lines = [line for line in pdb_file if line.startswith(('ATOM  ', 'HETATM'))]
+        assert pdb.natoms == len(lines) == 31628
+        assert np.allclose(pdb.xyz, [[float(line[30 + 8 * k:38 + 8 * k]) for k in range(3)] for line in lines])
+        assert np.array_equal(pdb.resid, [int(line[22:26]) for line in lines])
+        assert (pdb.name[0], pdb.resname[0], pdb.chain[0]) == (lines[0][12:16].strip(), lines[0][17:21].strip(), lines[0][21])
+        summary = pdb_summary(pdb)
+        assert summary['chains'] == {'A': 517, 'B': 517, 'C': 517, 'D': 517}
+
+    def test_hybrid36(self):
+        columns = np.frombuffer(b'99999A0000A0001zzzzza0000', dtype=np.uint8).reshape(5, 5)
+        assert hybrid36_decode(columns).tolist() == [99999, 100000, 100001, 87440031, 43770016]
+        columns = np.frombuffer(b'9999A000a000', dtype=np.uint8).reshape(3, 4)
+        assert hybrid36_decode(columns).tolist() == [9999, 10000, 1223056]
+
+    def test_altloc_and_models(self):
+        atom = "{}{:>5} {:<4}{}ALA A{:>4}    {:8.3f}   1.000   2.000  0.50 10.00           C\n"
+        with open(self.paths['output_pdb_path'], 'w') as pdb_file:
+            pdb_file.write("MODEL        1\n")
+            pdb_file.write(atom.format('ATOM  ', 'A0000', 'N', ' ', 'A000', 0.0))
+            pdb_file.write(atom.format('ATOM  ', 'A0001', 'CA', 'A', 'A000', 1.0))
+            pdb_file.write(atom.format('ATOM  ', 'A0002', 'CA', 'B', 'A000', 2.0))
+            pdb_file.write("ENDMDL\nMODEL        2\n")
+            pdb_file.write(atom.format('HETATM', '1', 'N', ' ', '1', 3.0))
+            pdb_file.write("ENDMDL\n")
+        pdb = read_pdb(self.paths['output_pdb_path'])
+        assert pdb.serial.tolist() == [100000, 100001]
+        assert pdb.resid.tolist() == [10000, 10000]
+        assert pdb.xyz[:, 0].tolist() == [0.0, 1.0]
+        assert read_pdb(self.paths['output_pdb_path'], altloc='B').xyz[:, 0].tolist() == [0.0, 2.0]
+        assert read_pdb(self.paths['output_pdb_path'], altloc=None).natoms == 3
+        model = read_pdb(self.paths['output_pdb_path'], model=2)
+        assert model.record.tolist() == ['HETATM'] and model.occupancy[0] == 0.5 and model.bfactor[0] == 10.0
+        with pytest.raises(ValueError, match='No ATOM or HETATM records found in model 3'):
+            read_pdb(self.paths['output_pdb_path'], model=3)
@@ -0,0 +1,50 @@
+# type: ignore
+import filecmp
+import zipfile
+from pathlib import Path
+import numpy as np
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.top_utils import Topology, include_nodes
+
+
+class TestTopUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'top_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def extract_top(self):
+        top_dir = Path(self.paths['output_top_path']).parent / 'top'
+        with zipfile.ZipFile(self.paths['input_top_zip_path']) as top_zip:
+            top_zip.extractall(top_dir)
+        return str(next(top_dir.glob('*.top')))
+
+    def test_read_write_top(self):
+        top_path = self.extract_top()
+        top = Topology.from_file(top_path)
+        assert top.molecules == [('Protein_chain_A', 1), ('SOL', 23496), ('NA', 6)]
+        assert top.find_include('forcefield.itp') is not None
+        top.write(self.paths['output_top_path'])
+        assert filecmp.cmp(self.paths['output_top_path'], top_path, shallow=False)
+
+    def test_moleculetypes(self):
+        top = Topology.from_file(self.extract_top(), include_dirs=[])
+        (protein,) = top.moleculetypes()
+        assert protein.name == 'Protein_chain_A' and protein.nrexcl == 3
+        assert protein.atoms.natoms == len(set(protein.atoms.nr.tolist())) > 0
+        assert np.isclose(protein.atoms.charge.sum(), round(protein.atoms.charge.sum()), atol=1e-3)
+        # The force field files are not in the zip: unresolved includes are skipped
+        assert top.include(top.nodes[top.find_include('forcefield.itp')]) is None
+        ligand = Topology.from_file(self.paths['input_itp_path'])
+        assert ligand.moleculetypes()[0].name == 'PEP'
+
+    def test_insert_include(self):
+        top = Topology.from_file(self.extract_top())
+        index = top.find_moleculetype('Protein_chain_A')
+        top.insert(top.find('directive', 'system'), include_nodes('ligand.itp', define='POSRES_LIGAND', comment='Ligand'))
+        lines = list(top.lines())
+        position = lines.index('#ifdef POSRES_LIGAND\n')
+        assert lines[position - 1:position + 3] == ['; Ligand\n', '#ifdef POSRES_LIGAND\n', '#include "ligand.itp"\n', '#endif\n']
+        assert top.find_moleculetype('Protein_chain_A') == index
@@ -0,0 +1,49 @@
+# type: ignore
+import numpy as np
+import pytest
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.tpr_utils import TPR_CUTOFF_FIELDS, convert_tpr_nsteps, parse_inputrec, parse_run_control, read_tpr_header
+
+
+class TestTprUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'tpr_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_read_tpr_header(self):
+        header = read_tpr_header(self.paths['input_tpr_path'])
+        assert header.gromacs_version == '2018.1' and header.file_version == 112 and header.body_size is None
+        assert header.natoms == 33838 and header.precision == 4 and header.ngtc == 2
+        assert header.has_inputrec and header.has_topology and header.has_x and header.has_v and not header.has_f
+        assert np.allclose(np.diag(header.box), 6.95243)
+
+        grompp_header = read_tpr_header(self.paths['input_grompp_tpr_path'])
+        assert grompp_header.file_version == 134 and grompp_header.natoms == 71702 and grompp_header.body_size > 0
+        assert np.allclose(grompp_header.box, np.diag([9.00078] * 3))
+
+    def test_truncated_header(self):
+        with open(self.paths['input_tpr_path'], 'rb') as tpr_file, open(self.paths['output_tpr_path'], 'wb') as output_file:
+            output_file.write(tpr_file.read(48))
+        with pytest.raises(ValueError):
+            read_tpr_header(self.paths['output_tpr_path'])
+
+    def test_run_control(self):
+        with open(self.paths['input_log_path']) as log_file:
+            run_control = parse_run_control(log_file)
+        assert run_control['integrator'] == 'md' and run_control['nsteps'] == 15000 and run_control['dt'] == 0.002
+        assert run_control['start_time'] == 0 and run_control['end_time'] == 30
+        assert convert_tpr_nsteps(run_control, extend=10) == 20000
+        assert convert_tpr_nsteps(run_control, until=50) == 25000
+        assert convert_tpr_nsteps(run_control, nsteps=100, extend=10) == 100
+        with pytest.raises(ValueError):
+            convert_tpr_nsteps(dict(run_control, init_step=30000, start_time=60), until=50)
+
+    def test_cutoffs(self):
+        with open(self.paths['input_log_path']) as log_file:
+            cutoffs = parse_inputrec(log_file, TPR_CUTOFF_FIELDS)
+        assert cutoffs == {'nstlist': 10, 'rlist': 1.0, 'coulombtype': 'PME', 'rcoulomb': 1.0, 'rvdw': 1.0}
+        with pytest.raises(ValueError):
+            parse_inputrec(['nstlist = 10'], TPR_CUTOFF_FIELDS)
@@ -0,0 +1,47 @@
+# type: ignore
+import struct
+import numpy as np
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.trr_utils import TrrFile
+
+
+class TestTrrUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'trr_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_trr_views(self):
+        with TrrFile(self.paths['input_trr_path']) as trr:
+            assert len(trr) == 4
+            assert trr.steps.tolist() == [0, 5000, 10000, 15000]
+            x = trr.array('x')
+            assert x.shape == (4, 33838, 3)
+            assert not x.flags['OWNDATA'] and not x.flags['WRITEABLE']
+            frame = trr[2]
+            assert frame.f is None
+            assert np.array_equal(frame.x, x[2])
+            assert np.array_equal(frame.v, trr.array('v')[2])
+            assert np.allclose(frame.box, np.diag(np.diag(frame.box)))
+
+    def test_trr_double_precision(self):
+        natoms = 2
+        coords = np.array([[0.1, 0.2, 0.3], [1.0, 2.0, 3.0]])
+        forces = -coords
+        box = np.eye(3) * 4.0
+        frame = struct.pack('>3i12s', 1993, 13, 12, b'GMX_trn_file')
+        frame += struct.pack('>13i', 0, 0, 72, 0, 0, 0, 0, natoms * 24, 0, natoms * 24, natoms, 10, 0)
+        frame += struct.pack('>2d', 0.02, 0.0)
+        frame += box.astype('>f8').tobytes() + coords.astype('>f8').tobytes() + forces.astype('>f8').tobytes()
+        with open(self.paths['output_trr_path'], 'wb') as trr_file:
+            # The last frame is truncated
+            trr_file.write(frame * 2 + frame[:-8])
+        with TrrFile(self.paths['output_trr_path']) as trr:
+            assert len(trr) == 2
+            assert trr.headers[0].double
+            assert trr[1].time == 0.02 and trr[1].v is None
+            assert np.array_equal(trr.array('x')[1], coords)
+            assert np.array_equal(trr.array('f')[0], forces)
+            assert np.array_equal(trr.array('box')[0], box)
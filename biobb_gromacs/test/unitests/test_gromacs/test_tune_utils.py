@@ -0,0 +1,64 @@
+# type: ignore
+import os
+import stat
+import numpy as np
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.tune_utils import (MdrunLayout, autotune_mdrun, read_tuned_layout, tuning_key, tuning_layouts,
+                                              write_tuned_layout)
+
+
+# Fake mdrun: ns/day grows with the ranks and drops with the PME ranks, 8 ranks can not be decomposed
+FAKE_GMX = """#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        -deffnm) name=$2; shift ;;
+        -ntmpi) ntmpi=$2; shift ;;
+        -npme) npme=$2; shift ;;
+    esac
+    shift
+done
+if [ "$ntmpi" = 8 ]; then
+    printf 'Fatal error:\\nThere is no domain decomposition for 8 ranks\\n' >&2
+    exit 1
+fi
+printf 'Performance:      %s.000        1.000\\n' $((ntmpi * 10 - npme)) > "$name.log"
+"""
+
+
+class TestTuneUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'tune_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_tuning_layouts(self):
+        layouts = tuning_layouts(8)
+        assert all(layout.ntmpi * layout.ntomp == 8 for layout in layouts)
+        assert MdrunLayout(8, 1, 2) in layouts and MdrunLayout(2, 4, 0) in layouts
+        assert all(layout.npme == 0 for layout in tuning_layouts(8, separate_pme=False))
+        assert max(layout.ntomp for layout in tuning_layouts(64) if layout.ntmpi > 1) == 16
+        assert MdrunLayout(1, 32, 0) in tuning_layouts(32)
+        assert tuning_layouts(8, gpu_pme=True) == [MdrunLayout(1, 8, 0), MdrunLayout(2, 4, 1), MdrunLayout(4, 2, 1), MdrunLayout(8, 1, 1)]
+
+    def test_autotune(self):
+        with open(self.paths['output_gmx_path'], 'w') as gmx_file:
+            gmx_file.write(FAKE_GMX)
+        os.chmod(self.paths['output_gmx_path'], os.stat(self.paths['output_gmx_path']).st_mode | stat.S_IEXEC)
+        best, trials = autotune_mdrun(self.paths['input_tpr_path'], tuning_layouts(8), self.paths['output_trials_dir'],
+                                      nsteps=100, gmx=self.paths['output_gmx_path'])
+        assert best.layout == MdrunLayout(4, 2, 0) and best.ns_per_day == 40.0
+        failed = [trial for trial in trials if trial.ns_per_day is None]
+        assert len(failed) == 2 and failed[0].error == 'There is no domain decomposition for 8 ranks'
+
+    def test_tuning_cache(self, monkeypatch):
+        monkeypatch.setenv('BIOBB_GROMACS_CACHE_DIR', self.paths['output_cache_dir'])
+        cutoffs = {'rlist': 1.0, 'rcoulomb': 1.0, 'rvdw': 1.0}
+        key = tuning_key(33838, np.diag([6.95] * 3), cutoffs, 8, 'CPU x8', '2025.2')
+        # Similar systems share the key
+        assert key == tuning_key(33840, np.diag([6.96] * 3), cutoffs, 8, 'CPU x8', '2025.2')
+        assert key != tuning_key(33838, np.diag([6.95] * 3), cutoffs, 16, 'CPU x8', '2025.2')
+        assert read_tuned_layout(key) is None
+        write_tuned_layout(key, MdrunLayout(4, 2, 1), 40.0)
+        assert read_tuned_layout(key) == MdrunLayout(4, 2, 1)
@@ -0,0 +1,41 @@
+# type: ignore
+import shutil
+from pathlib import Path
+import numpy as np
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs.common import read_trajectory_coords
+from biobb_gromacs.gromacs.xtc_utils import read_xtc, xtc_index, xtc_index_path
+
+
+class TestXtcUtils:
+    def setup_class(self):
+        fx.test_setup(self, 'xtc_utils')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_read_xtc_stride_and_subset(self):
+        _, frames = read_trajectory_coords(self.paths['input_xtc_path'])
+        subset = np.array([0, 10, 1195])
+        strided = list(read_xtc(self.paths['input_xtc_path'], start=1, stride=2, atom_indices=subset))
+        assert len(strided) == 2
+        assert np.array_equal(strided[0].coords, frames[1][subset])
+        assert np.array_equal(strided[1].coords, frames[3][subset])
+        assert len(list(read_xtc(self.paths['input_xtc_path'], stop=3))) == 3
+
+    def test_xtc_index(self):
+        shutil.copy(self.paths['input_xtc_path'], self.paths['output_xtc_path'])
+        frames = list(read_xtc(self.paths['output_xtc_path']))
+        index = xtc_index(self.paths['output_xtc_path'])
+        assert Path(xtc_index_path(self.paths['output_xtc_path'])).exists()
+        assert index.steps.tolist() == [frame.step for frame in frames]
+        # Append the last two frames and a truncated frame: only the complete frames are indexed
+        with open(self.paths['output_xtc_path'], 'rb') as xtc_file:
+            data = xtc_file.read()
+        with open(self.paths['output_xtc_path'], 'ab') as xtc_file:
+            xtc_file.write(data[index.offsets[2]:] + data[:100])
+        index = xtc_index(self.paths['output_xtc_path'])
+        assert len(index) == 6
+        frame = next(read_xtc(self.paths['output_xtc_path'], start=5, index=index))
+        assert np.array_equal(frame.coords, frames[3].coords)
@@ -0,0 +1,18 @@
+# type: ignore
+from biobb_common.tools import test_fixtures as fx
+from biobb_gromacs.gromacs_extra.mass_repartition import mass_repartition
+
+
+class TestMassRepartition:
+    def setup_class(self):
+        fx.test_setup(self, 'mass_repartition')
+
+    def teardown_class(self):
+        # pass
+        fx.test_teardown(self)
+
+    def test_mass_repartition(self):
+        returncode = mass_repartition(properties=self.properties, **self.paths)
+        assert fx.not_empty(self.paths['output_top_zip_path'])
+        assert fx.equal(self.paths['output_top_zip_path'], self.paths['ref_output_top_zip_path'])
+        assert fx.exe_success(returncode)
@@ -19,7 +19,7 @@ setuptools.setup(
     },
     packages=setuptools.find_packages(exclude=["docs", "test"]),
     package_data={"biobb_gromacs": ["py.typed"]},
-    install_requires=["biobb_common==5.2.2"],
+    install_requires=["biobb_common==5.2.2", "numpy"],
     python_requires=">=3.10",
     entry_points={
         "console_scripts": [
@@ -36,6 +36,7 @@ setuptools.setup(
             "trjcat = biobb_gromacs.gromacs.trjcat:main",
             "ndx2resttop = biobb_gromacs.gromacs_extra.ndx2resttop:main",
             "append_ligand = biobb_gromacs.gromacs_extra.append_ligand:main",
+            "mass_repartition = biobb_gromacs.gromacs_extra.mass_repartition:main",
         ]
     },
     classifiers=[